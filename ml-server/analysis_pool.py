@@ -0,0 +1,633 @@
+"""
+CPU 바운드 분석을 여러 코어에 나눠 돌리는 프로세스 풀.
+
+- 워커 프로세스마다 모델을 한 번만 로드 (initializer)
+- 디코딩은 요청 프로세스(ffmpeg 는 어차피 별도 프로세스)에서, 후보 필터 / MFCC /
+  모델 점수 / 집계는 풀 워커에서 실행
+- 풀 크기 기본값은 컨테이너 CPU quota(cgroup) 기준
+- 임시 파일로 내린(spill) 긴 녹음은 배열 대신 파일 위치만 보내고 워커가 직접 mmap
+- ANALYSIS_CHUNK_MIN_SEC 이상인 긴 녹음은 청크로 나눠 여러 워커가 나눠 계산
+  (analyze_pcm_chunked). 발화 구간 / 적응형 임계값 / VAD / 후보 필터는 요청
+  프로세스에서 녹음 전체 기준으로 한 번만 하고(이 부분은 직렬), 후보 윈도우를 고른
+  크기로 잘라 청크별 MFCC + 모델 점수만 워커에 나눈 뒤, 점수를 이어 붙여 NMS / 병합 /
+  집계를 녹음 전체에 한 번 적용한다. 윈도우 확률은 행별로 같으므로(배치 구성 차이는
+  float 오차 수준) 결과는 한 번에 분석한 것과 같다
+- /analyze/batch 는 item 별 분할 / VAD / 후보 필터도 풀 워커에서 하고(plan_pcm. 요청
+  스레드는 디코딩과 기다리기만), 모든 item 의 후보를 이어 붙인 순서를 모델 배치 경계에서
+  풀 워커 수만큼 나눠 워커마다 공유 배치로 점수 계산한다 (score_plans). 배치 구성이
+  요청 프로세스의 score_window_plans 와 같다
+- 스트리밍 세션(stream_session)의 체크포인트 / close 점수 계산도 후보 윈도우와 그
+  구간 PCM 만 워커로 보낸다 (score_windows)
+- gunicorn 워커가 fork 한 뒤 처음 쓸 때 만들고, 워커는 spawn 으로 띄운다
+  (TF 스레드가 떠 있는 프로세스를 fork 하지 않도록)
+- 워커 하나가 죽으면(OOM kill 등) 풀 전체가 깨지므로(BrokenProcessPool) 그 풀은 버리고
+  새로 만들어 실패한 호출을 한 번만 다시 실행한다 (LazyPool). /ready 는 깨진 풀을 보고
+
+환경변수
+  ANALYSIS_EXECUTION  "inline"(기본, 요청 스레드에서 실행) | "process"(풀 사용)
+  ANALYSIS_POOL_SIZE  풀 워커 수 (기본: CPU quota, 없으면 사용 가능한 코어 수)
+  ANALYSIS_CHUNK_MIN_SEC  이 길이(초) 이상이면 청크 분할 분석 (기본 300, 0 이면 안 함.
+                          풀 워커가 1개면 나눌 이유가 없어 항상 한 번에 분석)
+  ANALYSIS_CHUNKS     청크 분할 분석의 최대 청크 수 (기본: 풀 워커 수)
+  ANALYSIS_WARMUP_TIMEOUT  warmup 에서 모든 풀 워커가 모델을 올릴 때까지 기다리는 최대
+                           초 (기본 600, 넘으면 /ready 는 failed)
+"""
+
+from __future__ import annotations
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EXECUTION = os.getenv("ANALYSIS_EXECUTION", "inline")
+
+_manager = None
+_pool_lock = threading.Lock()
+
+# ---- 워커 프로세스 전역 ----
+_worker_model = None
+
+
+def cpu_quota() -> int:
+    """컨테이너에 할당된 CPU 수 (cgroup v2/v1 quota, affinity 중 작은 값)"""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            q, period = f.read().split()[:2]
+            if q != "max":
+                quota = int(q) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                q = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if q > 0:
+                quota = q / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        n = min(n, max(1, math.floor(quota)))
+    return max(1, n)
+
+
+class LazyPool:
+    """
+    처음 쓸 때 만드는 spawn 프로세스 풀 (분석 풀 / PDF 풀 공용).
+
+    워커가 비정상 종료하면 ProcessPoolExecutor 는 깨진 상태로 남아 이후 모든 submit 이
+    BrokenProcessPool 로 실패한다. run() 은 그 풀을 버리고 새 풀에서 한 번만 다시 실행하고,
+    status() 는 /ready 용으로 깨진 상태 / 재시작 횟수를 알려준다.
+    """
+
+    def __init__(self, max_workers: int, initializer: Callable | None = None):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.restarts = 0
+        self.last_error: str | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def get(self, *initargs) -> ProcessPoolExecutor:
+        pool = self._pool
+        if pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=mp.get_context("spawn"),
+                        initializer=self.initializer,
+                        initargs=initargs,
+                    )
+                pool = self._pool
+        return pool
+
+    def discard(self, pool: ProcessPoolExecutor, error: BaseException | None = None):
+        """깨진 pool 을 버림 (다른 스레드가 이미 새로 만들었으면 그대로 둠)"""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.restarts += 1
+            self.last_error = str(error) if error is not None else "broken"
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def discard_if_broken(self) -> bool:
+        pool = self._pool
+        if pool is None or not self.broken():
+            return False
+        self.discard(pool)
+        return True
+
+    def broken(self) -> bool:
+        pool = self._pool
+        # 워커가 죽으면 executor 가 _broken 에 사유를 남긴다 (공개 API 가 없음)
+        return pool is not None and bool(getattr(pool, "_broken", False))
+
+    def run(self, call: Callable[[ProcessPoolExecutor], Any], *initargs) -> Any:
+        """call(pool) 실행. 풀이 깨져서 실패하면 새 풀에서 한 번만 다시"""
+        pool = self.get(*initargs)
+        try:
+            return call(pool)
+        except BrokenProcessPool as e:
+            self.discard(pool, e)
+            return call(self.get(*initargs))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "started": self._pool is not None,
+            "broken": self.broken(),
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+POOL_SIZE = int(os.getenv("ANALYSIS_POOL_SIZE", "0")) or cpu_quota()
+WARMUP_TIMEOUT = float(os.getenv("ANALYSIS_WARMUP_TIMEOUT", "600"))
+WARMUP_HOLD_SEC = 0.05  # ping 하나가 워커를 붙잡는 시간
+CHUNK_MIN_SEC = float(os.getenv("ANALYSIS_CHUNK_MIN_SEC", "300"))
+MAX_CHUNKS = int(os.getenv("ANALYSIS_CHUNKS", "0")) or POOL_SIZE
+
+
+def enabled() -> bool:
+    return EXECUTION == "process"
+
+
+def _init_worker(model_path: str):
+    global _worker_model
+    import inference_backend
+    import model_runtime
+
+    if inference_backend.BACKEND == "keras":
+        import tensorflow as tf
+
+        # 워커 하나 = 코어 하나. TF 내부 스레드 풀이 코어를 나눠 먹지 않게 1로 고정
+        # (tflite / onnx 는 INFER_THREADS 로 따로 지정)
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    # 모델 로드 + 워밍업까지 끝내야 첫 작업을 받음
+    _worker_model = model_runtime.load_filler_model(model_path)
+    model_runtime.warmup(_worker_model)
+
+
+def _ping(hold: float = 0.0) -> int:
+    """모델을 올린 워커의 pid. hold 초 동안 붙잡아 다른 워커가 다음 ping 을 받게 함"""
+    if _worker_model is None:
+        raise RuntimeError("pool worker has no model")
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _analyze_in_worker(
+    pcm: np.ndarray,
+    segmentation: str,
+    params: Optional[Dict[str, Any]],
+    gain_db: float,
+    progress_q=None,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    from convert import SpilledPcm
+    from core_filler import faster_run_filler_analysis_pcm
+
+    if isinstance(pcm, SpilledPcm):
+        pcm = pcm.open()
+    progress = None
+    if progress_q is not None:
+        progress = lambda stage, value=None, **info: progress_q.put(
+            (stage, value, info)
+        )
+    run = lambda: faster_run_filler_analysis_pcm(
+        pcm,
+        _worker_model,
+        segmentation=segmentation,
+        params=params,
+        gain_db=gain_db,
+        progress=progress,
+    )
+    if not profile:
+        return run()
+    import metrics
+
+    result, prof = metrics.profile_call(run)
+    result["diag"]["profile"] = prof
+    return result
+
+
+def _plan_in_worker(
+    pcm, segmentation: str, params: Optional[Dict[str, Any]], gain_db: float
+) -> Dict[str, Any]:
+    from convert import SpilledPcm
+    from core_filler import plan_filler_windows, plan_state
+
+    if isinstance(pcm, SpilledPcm):
+        pcm = pcm.open()
+    return plan_state(plan_filler_windows(pcm, segmentation, params, gain_db))
+
+
+def _score_chunk_in_worker(
+    pcm, lo: int, hi: int, offset_ms: int, candidates: list, params
+) -> Dict[str, Any]:
+    from convert import SpilledPcm
+    from core_filler import score_window_chunk
+
+    if isinstance(pcm, SpilledPcm):
+        # 파일 전체를 mmap 하고 청크 구간만 view 로 (읽는 부분만 페이지 인)
+        pcm = pcm.open()[lo:hi]
+    return score_window_chunk(pcm, offset_ms, candidates, _worker_model, params)
+
+
+def _score_plans_in_worker(parts: list, batch_size: int) -> Dict[str, Any]:
+    """parts: [(pcm, lo, hi, offset_ms, candidates, params)] 를 공유 배치로 점수 계산"""
+    from convert import SpilledPcm
+    from core_filler import chunk_result, chunk_window_plan, score_window_plans
+
+    plans = []
+    for pcm, lo, hi, offset_ms, candidates, params in parts:
+        if isinstance(pcm, SpilledPcm):
+            pcm = pcm.open()[lo:hi]
+        plans.append(chunk_window_plan(pcm, offset_ms, candidates, params))
+    probs, inference = score_window_plans(plans, _worker_model, batch_size)
+    return {
+        "parts": [chunk_result(plan, pr) for plan, pr in zip(plans, probs)],
+        "inference": inference,
+    }
+
+
+_pool = LazyPool(POOL_SIZE, _init_worker)
+
+
+def get_pool(model_path: str) -> ProcessPoolExecutor:
+    return _pool.get(model_path)
+
+
+def pool_status() -> Dict[str, Any]:
+    return _pool.status()
+
+
+def discard_broken_pool() -> bool:
+    """풀이 깨져 있으면 버림 (다음 사용 때 새로 만듦). 버렸으면 True"""
+    return _pool.discard_if_broken()
+
+
+def _get_manager():
+    global _manager
+    if _manager is None:
+        with _pool_lock:
+            if _manager is None:
+                _manager = mp.get_context("spawn").Manager()
+    return _manager
+
+
+def warmup(model_path: str, timeout: float | None = None) -> int:
+    """
+    모든 워커가 모델 로드를 끝낼 때까지 대기 (서로 다른 pid POOL_SIZE 개가 ping 에
+    답해야 끝남. 먼저 뜬 워커 하나가 ping 을 다 받아 버리는 경우가 있어 모일 때까지 반복).
+    timeout(기본 ANALYSIS_WARMUP_TIMEOUT) 안에 못 모이면 RuntimeError. 응답한 워커 수 반환
+    """
+    deadline = time.monotonic() + (WARMUP_TIMEOUT if timeout is None else timeout)
+
+    def ping_all(pool) -> int:
+        seen = set()
+        while True:
+            futs = [pool.submit(_ping, WARMUP_HOLD_SEC) for _ in range(POOL_SIZE)]
+            seen.update(f.result() for f in futs)
+            if len(seen) >= POOL_SIZE:
+                return len(seen)
+            if time.monotonic() > deadline:
+                raise RuntimeError(
+                    f"pool warmup timed out: {len(seen)}/{POOL_SIZE} workers ready"
+                )
+
+    return _pool.run(ping_all, model_path)
+
+
+def analyze_pcm(
+    model_path: str,
+    pcm: np.ndarray,
+    segmentation: str = "adaptive",
+    params: Optional[Dict[str, Any]] = None,
+    gain_db: float = 0.0,
+    progress: Callable[..., None] | None = None,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    """
+    풀 워커에서 faster_run_filler_analysis_pcm 실행 (progress 는 큐로 중계)
+    profile: 워커 안에서 cProfile 로 감싸 diag.profile 에 요약을 붙임
+    pcm 이 임시 파일로 내린 배열이면 피클 사본 대신 파일 위치를 보낸다
+    (워커가 끝날 때까지 pcm 을 들고 있으므로 그 사이 파일은 지워지지 않음)
+    ANALYSIS_CHUNK_MIN_SEC 이상이면 analyze_pcm_chunked 로 (profile 이면 제외)
+    """
+    from convert import spilled_pcm
+
+    if not profile and use_chunks(pcm):
+        return analyze_pcm_chunked(
+            model_path, pcm, segmentation, params, gain_db, progress
+        )
+    payload = spilled_pcm(pcm) or pcm
+    if progress is None:
+        return _pool.run(
+            lambda pool: pool.submit(
+                _analyze_in_worker,
+                payload,
+                segmentation,
+                params,
+                gain_db,
+                None,
+                profile,
+            ).result(),
+            model_path,
+        )
+
+    q = _get_manager().Queue()
+    return _pool.run(
+        lambda pool: _relay_progress(
+            pool.submit(
+                _analyze_in_worker, payload, segmentation, params, gain_db, q, profile
+            ),
+            q,
+            progress,
+        ),
+        model_path,
+    )
+
+
+def _relay_progress(fut, q, progress: Callable[..., None]) -> Any:
+    """워커가 큐에 넣는 진행 이벤트를 fut 가 끝날 때까지 progress 로 넘기고 결과 반환"""
+    while True:
+        try:
+            stage, value, info = q.get(timeout=0.2)
+            progress(stage, value, **info)
+        except queue.Empty:
+            if fut.done():
+                break
+    # 끝난 뒤 남은 이벤트 비우기
+    while True:
+        try:
+            stage, value, info = q.get_nowait()
+        except queue.Empty:
+            break
+        progress(stage, value, **info)
+    return fut.result()
+
+
+def use_chunks(pcm: np.ndarray) -> bool:
+    """청크 분할 분석 대상인지 (길이 기준, 나눌 워커가 2개 이상일 때만)"""
+    from convert import PCM_SR
+
+    if CHUNK_MIN_SEC <= 0 or min(POOL_SIZE, MAX_CHUNKS) < 2:
+        return False
+    return len(pcm) >= CHUNK_MIN_SEC * PCM_SR
+
+
+def analyze_pcm_chunked(
+    model_path: str,
+    pcm: np.ndarray,
+    segmentation: str = "adaptive",
+    params: Optional[Dict[str, Any]] = None,
+    gain_db: float = 0.0,
+    progress: Callable[..., None] | None = None,
+) -> Dict[str, Any]:
+    """
+    긴 녹음을 청크로 나눠 풀 워커들이 동시에 점수 계산 (결과는 analyze_pcm 과 같음)
+
+    1. 요청 프로세스: plan_filler_windows (발화 구간 / 임계값 / VAD 는 녹음 전체 기준.
+       WebRTC VAD 와 히스테리시스 분할은 앞부분 상태를 이어 가므로 나누지 않음)
+    2. 후보 윈도우를 고른 크기의 최대 MAX_CHUNKS 개로 나누고(split_candidates), 청크마다
+       그 윈도우들을 덮는 PCM 구간만 워커로 보냄 (경계에 걸친 윈도우 때문에 이웃 청크
+       구간은 윈도우 길이만큼 겹칠 수 있음)
+    3. 청크 점수를 원래 순서로 이어 붙여 finish_filler_analysis (neighbor support /
+       NMS / _merge_kept 가 청크 경계를 넘어 녹음 전체에 그대로 적용됨)
+
+    diag.inference.chunks 에 청크별 윈도우 수 / PCM 구간 / 완료 시각(wall_ms) /
+    워커 안 계산 시간(worker_ms),
+    diag.timings 의 mfcc / predict 는 청크 합산, chunks 는 요청 프로세스가 기다린 시간
+    """
+    from core_filler import (
+        finish_filler_analysis,
+        plan_filler_windows,
+        split_window_plan,
+    )
+
+    plan = plan_filler_windows(pcm, segmentation, params, gain_db, progress)
+    ranges = split_window_plan(plan, MAX_CHUNKS)
+    with plan.timer.stage("chunks"):
+        probs, inference = score_windows(
+            model_path, pcm, plan.candidates, ranges, params, plan, progress=progress
+        )
+    return finish_filler_analysis(plan, probs, inference, progress)
+
+
+def score_windows(
+    model_path: str,
+    pcm: np.ndarray,
+    items: list,
+    ranges: List[Tuple[int, int]],
+    params: Optional[Dict[str, Any]] = None,
+    plan=None,
+    offset_ms: int = 0,
+    progress: Callable[..., None] | None = None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    후보 윈도우 items(녹음 기준 ms) 를 ranges 의 청크 [i, j) 별로 풀 워커들이 동시에 점수
+    계산. pcm 은 녹음의 [offset_ms, ...) 구간이고 청크마다 그 윈도우들을 덮는 PCM 구간만
+    워커로 보낸다 (경계에 걸친 윈도우 때문에 이웃 청크 구간은 윈도우 길이만큼 겹칠 수 있음).
+    plan 이 있으면 워커의 mfcc / predict 시간과 특징 프레임 수를 plan 에 더한다.
+    (probs, 합친 diag.inference. chunks 에 청크별 윈도우 수 / PCM 구간 / 완료 시각 /
+    워커 안 계산 시간)
+    """
+    from convert import PCM_SR, spilled_pcm
+
+    report = progress or (lambda *a, **k: None)
+    total = len(items)
+    report("windows", 0.0, scored=0, total=total)
+
+    spilled = spilled_pcm(pcm)
+    per_ms = PCM_SR // 1000
+    chunks = []
+    for i, j in ranges:
+        lo_ms = max(offset_ms, min(ws for ws, _, _ in items[i:j]))
+        hi_ms = max(we for _, we, _ in items[i:j])
+        chunks.append({"windows": j - i, "audio_ms": [lo_ms, hi_ms]})
+
+    def score_chunks(pool) -> list:
+        futs = {}
+        for k, (i, j) in enumerate(ranges):
+            lo_ms, hi_ms = chunks[k]["audio_ms"]
+            lo = (lo_ms - offset_ms) * per_ms
+            hi = min(len(pcm), (hi_ms - offset_ms) * per_ms)
+            # spill 된 녹음은 파일 위치만, 아니면 청크 구간 사본만 피클
+            part = spilled if spilled is not None else pcm[lo:hi]
+            fut = pool.submit(
+                _score_chunk_in_worker, part, lo, hi, lo_ms, items[i:j], params
+            )
+            futs[fut] = k
+        w0 = time.perf_counter()
+        outs = [None] * len(ranges)
+        scored = 0
+        try:
+            for fut in as_completed(futs):
+                k = futs[fut]
+                outs[k] = fut.result()
+                chunks[k]["wall_ms"] = round((time.perf_counter() - w0) * 1e3, 3)
+                chunks[k]["worker_ms"] = round(
+                    sum(t["wall_ms"] for t in outs[k]["timings"].values()), 3
+                )
+                scored += chunks[k]["windows"]
+                report("windows", scored / total, scored=scored, total=total)
+        except BaseException:
+            # 한 청크가 실패하면 아직 시작 안 한 청크는 취소
+            for fut in futs:
+                fut.cancel()
+            raise
+        return outs
+
+    outs = _pool.run(score_chunks, model_path) if ranges else []
+
+    probs = np.zeros((total,), dtype=np.float32)
+    for (i, j), out in zip(ranges, outs):
+        probs[i:j] = out["probs"]
+        if plan is None:
+            continue
+        if plan.engine is not None:
+            # diag.features 는 워커 엔진들의 합 (청크 경계 프레임은 다시 계산)
+            plan.engine.frames_computed += out["frames_computed"]
+            plan.engine.frames_reused += out["frames_reused"]
+        plan.timer.merge(out["timings"])
+
+    # 청크별 diag.inference 를 합침 (후보가 없으면 워커를 안 거치므로 기본값만)
+    inference = {"calls": 0, "scored": 0}
+    for k, out in enumerate(o["inference"] for o in outs):
+        server = out.pop("server", None)
+        if server is not None:
+            chunks[k]["server"] = server
+        inference.update(
+            {key: out[key] for key in ("backend", "mode", "max_batch_size")}
+        )
+        inference["calls"] += out["calls"]
+        inference["scored"] += out["scored"]
+    inference["chunks"] = chunks
+    return probs, inference
+
+
+def plan_pcm(
+    model_path: str,
+    pcm: np.ndarray,
+    segmentation: str = "adaptive",
+    params: Optional[Dict[str, Any]] = None,
+    gain_db: float = 0.0,
+):
+    """
+    core_filler.plan_filler_windows 의 풀 버전 (/analyze/batch 용). 발화 구간 / VAD /
+    에너지 인덱스 / 후보 필터를 워커에서 계산하고, 요청 프로세스는 그 결과와 자기 pcm 으로
+    WindowPlan 을 다시 만든다 (restore_plan). 요청 스레드는 기다리는 동안 GIL 을 쓰지 않음.
+    spill 된 녹음은 파일 위치만 보낸다. diag.timings 의 분할 / 필터 단계는 워커 시간
+    """
+    from convert import spilled_pcm
+    from core_filler import restore_plan
+
+    payload = spilled_pcm(pcm) or pcm
+    state = _pool.run(
+        lambda pool: pool.submit(
+            _plan_in_worker, payload, segmentation, params, gain_db
+        ).result(),
+        model_path,
+    )
+    return restore_plan(pcm, state, segmentation, params, gain_db)
+
+
+def score_plans(
+    model_path: str,
+    plans: list,
+    pcms: List[np.ndarray],
+    batch_size: int,
+) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """
+    core_filler.score_window_plans 의 풀 버전 (/analyze/batch 용). pcms 는 plans 와 같은
+    순서의 녹음 PCM. 여러 녹음의 후보를 이어 붙인 순서를 batch_size 배수 경계에서 최대
+    MAX_CHUNKS 개로 나누고, 청크마다 걸친 녹음들의 해당 구간 PCM 만 워커로 보낸다.
+    (plan 별 probs, 합친 diag.inference). plan 의 mfcc 시간 / 특징 프레임 수는 각 plan 에 더함
+    """
+    from convert import PCM_SR, spilled_pcm
+    from metrics import StageTimer
+
+    batch_size = max(1, int(batch_size))
+    sizes = [len(plan.candidates) for plan in plans]
+    starts = np.concatenate(([0], np.cumsum(sizes))).astype(int).tolist()
+    total = starts[-1]
+    n_batches = -(-total // batch_size)
+    n = max(1, min(MAX_CHUNKS, n_batches))
+    bounds = [min(total, (c * n_batches // n) * batch_size) for c in range(n + 1)]
+
+    per_ms = PCM_SR // 1000
+    spilled = [spilled_pcm(pcm) for pcm in pcms]
+    tasks, metas, chunks = [], [], []
+    for a, b in zip(bounds, bounds[1:]):
+        parts, meta = [], []
+        for k, plan in enumerate(plans):
+            i, j = max(a, starts[k]) - starts[k], min(b, starts[k + 1]) - starts[k]
+            if i >= j:
+                continue
+            items = plan.candidates[i:j]
+            lo_ms = max(0, min(ws for ws, _, _ in items))
+            hi_ms = max(we for _, we, _ in items)
+            lo, hi = lo_ms * per_ms, min(len(pcms[k]), hi_ms * per_ms)
+            part = spilled[k] if spilled[k] is not None else pcms[k][lo:hi]
+            parts.append((part, lo, hi, lo_ms, items, plan.params))
+            meta.append((k, i, j))
+        if parts:
+            tasks.append(parts)
+            metas.append(meta)
+            chunks.append({"windows": b - a, "recordings": len(parts)})
+
+    def score_chunks(pool) -> list:
+        futs = [
+            pool.submit(_score_plans_in_worker, parts, batch_size) for parts in tasks
+        ]
+        try:
+            return [fut.result() for fut in futs]
+        except BaseException:
+            for fut in futs:
+                fut.cancel()
+            raise
+
+    outs = _pool.run(score_chunks, model_path) if tasks else []
+
+    probs = [np.zeros((size,), dtype=np.float32) for size in sizes]
+    timer = StageTimer()
+    inference = {"backend": None, "calls": 0}
+    for meta, out, chunk in zip(metas, outs, chunks):
+        for (k, i, j), part in zip(meta, out["parts"]):
+            plan = plans[k]
+            probs[k][i:j] = part["probs"]
+            plan.timer.merge(part["timings"])
+            if plan.engine is not None:
+                plan.engine.frames_computed += part["frames_computed"]
+                plan.engine.frames_reused += part["frames_reused"]
+        inf = out["inference"]
+        timer.merge(inf["timings"])
+        inference["backend"] = inf["backend"]
+        inference["calls"] += inf["calls"]
+        if "server" in inf:
+            chunk["server"] = inf["server"]
+    inference.update(
+        {
+            "mode": "shared_batch",
+            "max_batch_size": batch_size,
+            "recordings": len(plans),
+            "windows": total,
+            "timings": timer.to_dict(),
+            "chunks": chunks,
+        }
+    )
+    return probs, inference
@@ -0,0 +1,249 @@
+"""
+녹음 단위로 한 번만 만들어 두고 모든 필터가 공유하는 인덱스들.
+
+EnergyIndex: ms 단위 누적 제곱합(prefix sum). 임의의 [s, e) 구간의
+    평균제곱 / RMS / dBFS 를 슬라이스나 합산 없이 O(1)로 계산한다.
+    질의 경계가 항상 ms 단위이므로 ms 해상도의 누적합으로도 샘플 단위 계산과
+    정확히 같은 값이 나온다 (int64 정수 누적이라 반올림 오차 없음).
+
+VadIndex: 녹음 전체를 WebRTC VAD 로 한 번만 돌린 프레임별 유성 비트맵 +
+    누적 개수. 윈도우 유성 비율과 segmentation="vad" 구간 모두 여기서 계산한다.
+"""
+
+from __future__ import annotations
+import math
+from typing import Dict
+import numpy as np
+import webrtcvad
+
+import func_filler as ff
+from pcm_buffer import PcmBuffer
+
+# 누적합을 만들 때 한 번에 int64 로 올릴 샘플 수 (임시 메모리 상한)
+_CHUNK_MS = 60_000
+
+
+class EnergyIndex:
+    def __init__(self, buf: PcmBuffer, threshold_source=None):
+        """
+        threshold_source: 선택. adaptive_params 를 계산할 frame_dbfs 제공자 (기본: 자신).
+          녹음 일부 구간만 분석할 때 녹음 전체 기준 적응형 임계값을 쓰도록 (스트리밍 체크포인트)
+        """
+        len_ms = len(buf)
+        per_ms = buf.frame_rate // 1000
+        # csum[t] = [0, t) ms 구간 샘플 제곱합
+        csum = np.zeros(len_ms + 1, dtype=np.int64)
+        for s in range(0, len_ms, _CHUNK_MS):
+            e = min(len_ms, s + _CHUNK_MS)
+            x = buf.samples[s * per_ms : e * per_ms].astype(np.int64)
+            csum[s + 1 : e + 1] = (x * x).reshape(e - s, per_ms).sum(axis=1)
+        np.cumsum(csum, out=csum)
+        self._init(csum, per_ms, buf.max_possible_amplitude, threshold_source)
+
+    @classmethod
+    def from_csum(
+        cls,
+        csum: np.ndarray,
+        per_ms: int = ff.TARGET_SR // 1000,
+        threshold_source=None,
+    ) -> "EnergyIndex":
+        """
+        이미 계산해 둔 누적합(csum[0] = 0, 길이 len_ms + 1)으로 만든다 (복사 없음).
+        스트리밍 세션이 녹음 중에 이어서 쌓아 둔 값 (np.memmap 도 됨)
+        """
+        self = cls.__new__(cls)
+        self._init(csum, per_ms, PcmBuffer.max_possible_amplitude, threshold_source)
+        return self
+
+    def _init(self, csum, per_ms, max_amp, threshold_source):
+        self.threshold_source = threshold_source
+        self.len_ms = len(csum) - 1
+        self.per_ms = per_ms
+        self.max_amp = max_amp
+        self.csum = csum
+        self._adaptive: Dict[tuple, dict] = {}
+
+    def __len__(self) -> int:
+        return self.len_ms
+
+    # ---------------------------------------------------------------
+    def _clip(self, s: int, e: int):
+        s = min(max(0, int(s)), self.len_ms)
+        e = min(max(0, int(e)), self.len_ms)
+        return s, max(s, e)
+
+    def sumsq(self, s: int, e: int) -> int:
+        s, e = self._clip(s, e)
+        return int(self.csum[e] - self.csum[s])
+
+    def n_samples(self, s: int, e: int) -> int:
+        s, e = self._clip(s, e)
+        return (e - s) * self.per_ms
+
+    def mean_square(self, s: int, e: int) -> float:
+        n = self.n_samples(s, e)
+        return self.sumsq(s, e) / n if n else 0.0
+
+    def rms(self, s: int, e: int) -> int:
+        """audioop.rms / AudioSegment.rms 와 동일 (정수 내림)"""
+        n = self.n_samples(s, e)
+        return int(math.sqrt(self.sumsq(s, e) / n)) if n else 0
+
+    def dbfs(self, s: int, e: int) -> float:
+        """AudioSegment[s:e].dBFS 와 동일 (무음이면 -inf)"""
+        rms = self.rms(s, e)
+        if not rms:
+            return -float("infinity")
+        # pydub.utils.ratio_to_db 와 같은 식 (log10 대신 log(x, 10))
+        return 20 * math.log(rms / self.max_amp, 10)
+
+    def rms_db(self, s: int, e: int) -> float:
+        """func_filler.rms_db(slice_ms(full, s, e)) 와 동일한 정의"""
+        n = self.n_samples(s, e)
+        if n == 0:
+            return -100.0
+        ms = self.sumsq(s, e) / n / (32768.0 * 32768.0)
+        return 20.0 * math.log10(math.sqrt(ms + 1e-12) + 1e-12)
+
+    # --- 벡터화 질의 ------------------------------------------------
+    def rms_many(self, s: np.ndarray, e: np.ndarray) -> np.ndarray:
+        s = np.clip(np.asarray(s, dtype=np.int64), 0, self.len_ms)
+        e = np.maximum(s, np.clip(np.asarray(e, dtype=np.int64), 0, self.len_ms))
+        n = (e - s) * self.per_ms
+        ss = (self.csum[e] - self.csum[s]).astype(np.float64)
+        out = np.zeros(len(s), dtype=np.int64)
+        nz = n > 0
+        out[nz] = np.sqrt(ss[nz] / n[nz]).astype(np.int64)
+        return out
+
+    def dbfs_many(self, s: np.ndarray, e: np.ndarray, floor: float = -100.0):
+        """구간별 dBFS. 무음(rms=0) 구간은 floor 로 대체"""
+        rms = self.rms_many(s, e)
+        out = np.full(len(rms), floor, dtype=np.float64)
+        nz = rms > 0
+        out[nz] = 20 * (np.log(rms[nz] / self.max_amp) / math.log(10))
+        return out
+
+    def rms_db_many(self, s: np.ndarray, e: np.ndarray) -> np.ndarray:
+        """구간별 rms_db (빈 구간은 -100)"""
+        s = np.clip(np.asarray(s, dtype=np.int64), 0, self.len_ms)
+        e = np.maximum(s, np.clip(np.asarray(e, dtype=np.int64), 0, self.len_ms))
+        n = (e - s) * self.per_ms
+        ss = (self.csum[e] - self.csum[s]).astype(np.float64)
+        out = np.full(len(s), -100.0, dtype=np.float64)
+        nz = n > 0
+        ms = ss[nz] / n[nz] / (32768.0 * 32768.0)
+        out[nz] = 20.0 * np.log10(np.sqrt(ms + 1e-12) + 1e-12)
+        return out
+
+    def frame_dbfs(self, frame_ms: int = 30) -> np.ndarray:
+        """_frame_dbfs_series 와 동일: frame_ms 간격 프레임별 dBFS (마지막은 짧을 수 있음)"""
+        starts = np.arange(0, self.len_ms, int(frame_ms), dtype=np.int64)
+        ends = np.minimum(starts + int(frame_ms), self.len_ms)
+        return self.dbfs_many(starts, ends).astype(np.float32)
+
+    # ---------------------------------------------------------------
+    def adaptive_params(self, frame_ms: int = 30, **kw) -> dict:
+        """compute_adaptive_params 결과를 녹음당 한 번만 계산해서 공유"""
+        key = (int(frame_ms), tuple(sorted(kw.items())))
+        if key not in self._adaptive:
+            self._adaptive[key] = ff.compute_adaptive_params(
+                None, frame_ms=frame_ms, energy=self.threshold_source or self, **kw
+            )
+        return self._adaptive[key]
+
+
+class VadIndex:
+    """
+    프레임 정렬 규칙
+      - 전역 프레임 그리드: [k*frame_ms, (k+1)*frame_ms), k = 0 .. n_frames-1
+      - 윈도우 [s, e) 는 n = (e - s) // frame_ms 개 프레임을 쓰고 (기존과 동일),
+        시작 프레임은 s 에 가장 가까운 그리드 프레임 k0 = round(s / frame_ms).
+      - 따라서 각 프레임이 기존(윈도우 시작 기준 프레임)보다 최대 frame_ms/2 어긋난다.
+    허용 오차 (기존 윈도우별 VAD 대비, 합성 음성으로 측정):
+      - adaptive 분할(기본): |Δratio| 평균 <= 0.005, VAD_REQ_RATIO 통과 여부 변화 ~0%
+      - vad 분할: 구간 경계(hangover 꼬리) 윈도우에서 WebRTC 내부 hangover 상태가
+        이어지므로 |Δratio| 평균 ~0.04, 통과 여부 변화 ~10% 이내
+      즉 프레임 정렬 차이로 인한 오차는 윈도우당 2/n (320ms 기준 0.125) 이하이고,
+      나머지는 VAD 내부 상태(문맥) 차이다. 기존 동작이 필요하면 params.vad_bitmap=false.
+      vad 분할은 이 차이가 결과(필러 구간)를 바꾸므로 윈도우 필터에서는 기본으로 쓰지
+      않고(params.vad_bitmap=true 로 켬), 발화 구간 검출에만 쓴다 (전체 VAD 와 같은 값).
+    (기존 구현도 전역 Vad 객체의 내부 상태가 요청 간에 이어져서 결정적이지 않았다.
+     여기서는 녹음마다 새 Vad 로 한 번만 돌리므로 같은 입력이면 항상 같은 결과.)
+    """
+
+    def __init__(
+        self,
+        buf: PcmBuffer,
+        frame_ms: int = ff.VAD_FRAME_MS,
+        aggr: int = ff.VAD_AGGR,
+    ):
+        assert frame_ms in (10, 20, 30), "webrtcvad는 10/20/30ms 프레임만 지원"
+        self.frame_ms = frame_ms
+        self.aggr = aggr
+        self.sr = buf.frame_rate
+        spf = self.sr * frame_ms // 1000
+        n_frames = len(buf.samples) // spf
+        vad = webrtcvad.Vad(aggr)
+        raw = buf.raw_data  # 복사 없는 memoryview
+        step = spf * 2
+        voiced = np.zeros(n_frames, dtype=np.bool_)
+        for k in range(n_frames):
+            try:
+                voiced[k] = vad.is_speech(raw[k * step : (k + 1) * step], self.sr)
+            except Exception:
+                # 잘못된 프레임은 무성으로 처리
+                pass
+        self._init(voiced)
+
+    @classmethod
+    def from_voiced(
+        cls,
+        voiced: np.ndarray,
+        frame_ms: int = ff.VAD_FRAME_MS,
+        aggr: int = ff.VAD_AGGR,
+        sr: int = ff.TARGET_SR,
+    ) -> "VadIndex":
+        """
+        이미 계산해 둔 프레임별 유성 비트맵으로 만든다. 녹음 시작부터 Vad 하나로
+        frame_ms 프레임을 차례로 돌린 값이어야 __init__ 과 같다 (스트리밍 세션)
+        """
+        self = cls.__new__(cls)
+        self.frame_ms = frame_ms
+        self.aggr = aggr
+        self.sr = sr
+        self._init(np.asarray(voiced, dtype=np.bool_))
+        return self
+
+    def _init(self, voiced: np.ndarray):
+        self.voiced = voiced
+        # prefix[k] = [0, k) 프레임 중 유성 프레임 수
+        self.prefix = np.zeros(len(voiced) + 1, dtype=np.int32)
+        np.cumsum(voiced, out=self.prefix[1:])
+
+    def __len__(self) -> int:
+        return len(self.voiced)
+
+    def voiced_ratio(self, s: int, e: int) -> float:
+        """faster_vad_voiced_ratio(slice_ms(full, s, e)) 대응 (정렬 규칙은 클래스 설명 참고)"""
+        n = max(0, e - s) // self.frame_ms
+        n = min(n, len(self.voiced))
+        if n == 0:
+            return 0.0
+        k0 = (max(0, s) + self.frame_ms // 2) // self.frame_ms
+        k0 = min(k0, len(self.voiced) - n)
+        return float(self.prefix[k0 + n] - self.prefix[k0]) / n
+
+    def voiced_ratio_many(self, s: np.ndarray, e: np.ndarray) -> np.ndarray:
+        s = np.asarray(s, dtype=np.int64)
+        e = np.asarray(e, dtype=np.int64)
+        n = np.minimum(np.maximum(0, e - s) // self.frame_ms, len(self.voiced))
+        k0 = (np.maximum(0, s) + self.frame_ms // 2) // self.frame_ms
+        k0 = np.minimum(k0, len(self.voiced) - n)
+        cnt = self.prefix[k0 + n] - self.prefix[k0]
+        return np.where(n > 0, cnt / np.maximum(n, 1), 0.0)
+
+    def frames(self):
+        """(fs, fe, is_speech) 프레임 목록 (detect_speech_intervals_vad 용)"""
+        fm = self.frame_ms
+        return [(k * fm, (k + 1) * fm, bool(v)) for k, v in enumerate(self.voiced)]
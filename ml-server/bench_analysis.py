@@ -0,0 +1,414 @@
+"""
+filler 분석 파이프라인 벤치마크 + 결과 drift 체크.
+
+run_filler_analysis_bytes(legacy, pydub) 와 faster_run_filler_analysis_bytes(faster) 를
+같은 합성 오디오로 돌려 처리량 / 단계별 시간 / 최대 메모리를 비교하고, 결과가 저장된
+golden 과 달라지면 실패(exit 1)한다. 네트워크 / GPU / 프로덕션 .h5 없이 ffmpeg 만 있으면
+일반 리눅스 CPU 에서 돈다.
+
+  python bench_analysis.py [--lengths 10,60,300] [--segmentation adaptive,vad]
+      [--impl faster,legacy,chunked] [--legacy-max-sec 60] [--repeat 3] [--model PATH]
+      [--workers N] [--no-mem] [--golden bench_golden.json] [--update-golden] [--tol 1e-6]
+
+합성 오디오 (synth_speech, seed 고정이라 어디서나 같은 바이트)
+  배경 잡음 위에 하모닉 톤 + 음절 단위 진폭 변조 발화 구간, 길게 끄는 저음 모음
+  ("음/어" 비슷한 filler 후보), 짧은 잡음 버스트(클릭/숨소리), 짧은 쉼 / 1.5초 넘는 긴 쉼
+
+legacy 는 윈도우마다 pydub 슬라이스 / wav export 를 하므로 60초에 10초 이상 걸린다.
+--legacy-max-sec 보다 긴 케이스는 legacy 를 건너뛴다.
+
+chunked (청크 분할 분석, analysis_pool.analyze_pcm_chunked)
+  --workers 개(기본: CPU quota)의 spawn 풀 워커로 점수 계산을 나눈다. 결과는 faster 의
+  golden 과 비교한다 (청크마다 모델 배치 구성이 달라도 결과가 같아야 함).
+  분할 / VAD / 윈도우 필터와 NMS / 집계는 요청 프로세스에서 직렬이므로 케이스마다
+    serial_ms           청크를 기다린 시간을 뺀 나머지 (디코딩 + 계획 + 집계)
+    chunk_worker_ms     청크별 워커 안 계산 시간 (MFCC + predict)
+    projected_wall_sec  청크가 각자 코어 하나씩 동시에 돈다고 보고, 기다린 시간을 가장 긴
+                        청크 시간으로 바꾼 값 (풀 작업 전달 / 피클 비용은 빠짐)
+  를 함께 낸다. 코어가 --workers 보다 적은 기계(env.cpu_quota)에서는 wall_sec 이
+  faster 보다 느릴 수 있으니 projected_wall_sec 를 볼 것.
+
+모델
+  기본은 StandInModel: 윈도우 MFCC 의 계수별 평균/표준편차 -> 고정 가중치 MLP -> softmax.
+  numpy 만 쓰므로 TF 없이 돌고 기계가 달라도 같은 확률이 나온다 (golden 비교용).
+  추론 비용은 실제 모델보다 훨씬 작으므로 predict 시간은 --model 로 실제 .h5 를 줘서 잴 것.
+
+출력(JSON)
+  cases[]   impl / segmentation / audio_sec 별
+    wall_sec         repeat 회 중 중앙값 (min_wall_sec 도 함께)
+    throughput_x     audio_sec / wall_sec (실시간 대비 배속)
+    stages_ms        diag.timings 단계별 wall 중앙값 (faster 만)
+    peak_mem_mb      tracemalloc 으로 잰 분석 중 파이썬/numpy 최대 할당량 (별도 1회 실행)
+    drift            "ok" | "no_golden" | 달라진 필드 경로 목록
+  speedup   legacy wall / faster wall (같은 segmentation / 길이)
+  chunked_speedup  faster wall / chunked wall 과 projected_wall_sec 기준 값
+  ok        drift 가 하나도 없으면 true
+
+golden (bench_golden.json) 은 StandInModel 기준이고 디코딩(ffmpeg) / MFCC(librosa) 결과에
+의존한다. 결과가 바뀌는 게 의도된 변경이면 --update-golden 으로 다시 만들어 함께 커밋한다.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import func_filler as ff
+from core_filler import faster_run_filler_analysis_bytes, run_filler_analysis_bytes
+
+SR = 16000
+IMPLS = {
+    "faster": faster_run_filler_analysis_bytes,
+    "legacy": run_filler_analysis_bytes,
+}
+CHUNK_MODEL = "stand-in"  # chunked 풀 워커가 올릴 모델 (main 에서 --model 로 바꿈)
+
+
+def chunked_run_filler_analysis_bytes(audio: bytes, model, segmentation="adaptive"):
+    """faster 와 같은 분석을 점수 계산만 풀 워커들에 청크로 나눠서 (model 은 워커 쪽)"""
+    import analysis_pool
+    from convert import decode_normalized_pcm16
+
+    pcm, gain = decode_normalized_pcm16(audio)
+    return analysis_pool.analyze_pcm_chunked(CHUNK_MODEL, pcm, segmentation, None, gain)
+
+
+def _init_chunk_worker(model_path: str):
+    import analysis_pool
+
+    if model_path == "stand-in":
+        analysis_pool._worker_model = StandInModel()
+    else:
+        analysis_pool._init_worker(model_path)
+
+
+IMPLS["chunked"] = chunked_run_filler_analysis_bytes
+# 실행마다 달라지는 값 (시간 / 캐시 / 추론 백엔드 정보) 은 drift 비교에서 뺀다
+VOLATILE_DIAG = ("timings", "inference", "cache", "features", "profile", "stream")
+
+
+# ---- 합성 오디오 ---------------------------------------------------------
+def _voiced(rng, n: int, f0: float, syllable_hz: float) -> np.ndarray:
+    t = np.arange(n) / SR
+    # 피치가 살짝 흔들리는 하모닉 톤
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.03 * np.sin(2 * np.pi * 3 * t))) / SR
+    sig = sum(np.sin(k * phase + rng.uniform(0, 6)) / k for k in range(1, 9))
+    # 음절 단위 진폭 변조 + 양끝 페이드
+    am = 0.55 + 0.45 * np.sin(2 * np.pi * syllable_hz * t + rng.uniform(0, 6))
+    fade = np.sin(np.pi * np.arange(n) / n) ** 0.5
+    return sig * am * fade
+
+
+def synth_speech(seconds: float, seed: int = 0) -> bytes:
+    """말하기 비슷한 구조의 16k/mono/16bit wav 바이트"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SR)
+    y = rng.normal(0, 0.002, n)  # 배경 잡음
+    t = int(rng.uniform(0.2, 0.6) * SR)
+    while t < n:
+        kind = rng.random()
+        if kind < 0.6:
+            # 발화 구간 (0.4 ~ 2.5초)
+            L = int(rng.uniform(0.4, 2.5) * SR)
+            seg = 0.25 * _voiced(rng, L, rng.uniform(100, 230), rng.uniform(3, 6))
+        elif kind < 0.8:
+            # filler 비슷한 길게 끄는 저음 모음 (0.3 ~ 0.9초, 변조 거의 없음)
+            L = int(rng.uniform(0.3, 0.9) * SR)
+            seg = 0.18 * _voiced(rng, L, rng.uniform(85, 130), 0.5)
+        else:
+            # 클릭 / 숨소리 같은 짧은 잡음 버스트
+            L = int(rng.uniform(0.03, 0.15) * SR)
+            seg = rng.normal(0, 0.08, L) * np.hanning(L)
+        L = min(L, n - t)
+        y[t : t + L] += seg[:L]
+        t += L
+        # 쉼: 대부분 짧고, 가끔 1.5초 넘는 긴 쉼
+        pause = rng.uniform(1.6, 3.0) if rng.random() < 0.1 else rng.uniform(0.08, 0.7)
+        t += int(pause * SR)
+    pcm = (np.clip(y, -1, 1) * 30000).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+# ---- 대역 모델 -----------------------------------------------------------
+class StandInModel:
+    """(N, 20, 40, 1) MFCC -> (N, 2) softmax. predict_on_batch / predict(verbose=) 만 흉내"""
+
+    backend_name = "stand-in"
+
+    def __init__(self, seed: int = 7, hidden: int = 16):
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.normal(0, 1.0, (40, hidden))
+        self.b1 = rng.normal(0, 0.5, hidden)
+        self.w2 = rng.normal(0, 1.5, (hidden, 2))
+        self.b2 = np.array([0.0, 0.6])
+
+    def predict_on_batch(self, xs: np.ndarray) -> np.ndarray:
+        x = np.asarray(xs, dtype=np.float64)[..., 0]  # (N, 20, 40)
+        # MFCC 크기(수백 dB 단위)를 대략 0 근처로
+        feat = np.concatenate([x.mean(axis=2), x.std(axis=2)], axis=1) / 100.0
+        h = np.tanh(feat @ self.w1 + self.b1)
+        z = h @ self.w2 + self.b2
+        z -= z.max(axis=1, keepdims=True)
+        ez = np.exp(z)
+        return (ez / ez.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def predict(self, xs, verbose=0):
+        return self.predict_on_batch(xs)
+
+
+# ---- drift 비교 ----------------------------------------------------------
+def comparable(result: dict) -> dict:
+    out = json.loads(json.dumps(result))
+    for k in VOLATILE_DIAG:
+        out.get("diag", {}).pop(k, None)
+    return out
+
+
+def diff_paths(a, b, tol: float, path: str = "", out=None, limit: int = 20):
+    """a, b 가 다른 경로 목록 (float 는 절대오차 tol 까지 같다고 봄)"""
+    out = [] if out is None else out
+    if len(out) >= limit:
+        return out
+    if isinstance(a, dict) and isinstance(b, dict):
+        for k in sorted(set(a) | set(b)):
+            if k not in a or k not in b:
+                out.append(f"{path}.{k} (missing)")
+            else:
+                diff_paths(a[k], b[k], tol, f"{path}.{k}", out, limit)
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            out.append(f"{path} (len {len(a)} != {len(b)})")
+        else:
+            for i, (x, y) in enumerate(zip(a, b)):
+                diff_paths(x, y, tol, f"{path}[{i}]", out, limit)
+    elif isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None or abs(a - b) > tol:
+            out.append(f"{path} ({a} != {b})")
+    elif a != b:
+        out.append(f"{path} ({a} != {b})")
+    return out
+
+
+def load_golden(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_golden(path: str, golden: dict):
+    # 케이스당 한 줄 (git diff 로 어떤 케이스가 바뀌었는지 보이게)
+    lines = [
+        f"  {json.dumps(k)}: {json.dumps(golden[k], sort_keys=True, ensure_ascii=False)}"
+        for k in sorted(golden)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n" + ",\n".join(lines) + "\n}\n")
+
+
+# ---- 측정 ---------------------------------------------------------------
+def _peak_mem_mb(fn, *args) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2**20, 2)
+
+
+def bench_case(fn, audio: bytes, model, segmentation: str, repeat: int, mem: bool):
+    walls, stages, result = [], {}, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(audio, model, segmentation=segmentation)
+        walls.append(time.perf_counter() - t0)
+        for k, v in result["diag"].get("timings", {}).items():
+            stages.setdefault(k, []).append(v["wall_ms"])
+    out = {
+        "wall_sec": round(statistics.median(walls), 4),
+        "min_wall_sec": round(min(walls), 4),
+        "stages_ms": {k: round(statistics.median(v), 3) for k, v in stages.items()}
+        or None,
+    }
+    if mem:
+        out["peak_mem_mb"] = _peak_mem_mb(fn, audio, model, segmentation)
+    return out, result
+
+
+def _chunk_stats(stats: dict, result: dict, workers: int) -> dict:
+    """chunked 케이스: 직렬 구간 / 청크별 워커 시간 / 코어가 충분할 때의 예상 wall"""
+    chunks = result["diag"]["inference"].get("chunks", [])
+    wait_ms = stats["stages_ms"].get("chunks", 0.0)
+    worker_ms = [c.get("worker_ms", 0.0) for c in chunks]
+    wall_ms = stats["wall_sec"] * 1e3
+    serial_ms = wall_ms - wait_ms
+    return {
+        "chunks": len(chunks),
+        "chunk_windows": [c["windows"] for c in chunks],
+        "serial_ms": round(serial_ms, 3),
+        "chunk_worker_ms": worker_ms,
+        "projected_wall_sec": round((serial_ms + max(worker_ms, default=0.0)) / 1e3, 4),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lengths", default="10,60,300", help="초 단위, 쉼표 구분")
+    ap.add_argument("--segmentation", default="adaptive,vad")
+    ap.add_argument("--impl", default="faster,legacy")
+    ap.add_argument("--legacy-max-sec", type=float, default=60)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--model", default=None, help="실제 .h5 (없으면 StandInModel)")
+    ap.add_argument("--workers", type=int, default=0, help="chunked 풀 워커 수")
+    ap.add_argument("--no-mem", action="store_true", help="tracemalloc 측정 생략")
+    ap.add_argument("--golden", default=os.path.join(HERE, "bench_golden.json"))
+    ap.add_argument("--update-golden", action="store_true")
+    ap.add_argument("--tol", type=float, default=1e-6)
+    args = ap.parse_args()
+
+    lengths = [float(x) for x in args.lengths.split(",") if x]
+    segs = [s for s in args.segmentation.split(",") if s]
+    impls = [i for i in args.impl.split(",") if i]
+    for i in impls:
+        if i not in IMPLS:
+            ap.error(f"unknown impl: {i}")
+
+    import analysis_pool
+
+    workers = args.workers or analysis_pool.cpu_quota()
+    if "chunked" in impls:
+        global CHUNK_MODEL
+        CHUNK_MODEL = args.model or "stand-in"
+        analysis_pool.POOL_SIZE = analysis_pool.MAX_CHUNKS = workers
+        analysis_pool._pool = analysis_pool.LazyPool(workers, _init_chunk_worker)
+        analysis_pool.warmup(CHUNK_MODEL)
+
+    if args.model:
+        import model_runtime
+
+        model = model_runtime.load_filler_model(args.model)
+        model_runtime.warmup(model)
+        model_tag = model_runtime.model_fingerprint(args.model)
+    else:
+        model = StandInModel()
+        model_tag = "stand-in"
+
+    # 첫 호출의 import / 캐시 비용이 첫 케이스에 섞이지 않도록 짧은 오디오로 한 번씩
+    warm = synth_speech(3, seed=0)
+    for impl in impls:
+        for seg in segs:
+            IMPLS[impl](warm, model, segmentation=seg)
+
+    golden = load_golden(args.golden)
+    cases, walls = [], {}
+    for seconds in lengths:
+        # 길이마다 seed 를 달리해 짧은 케이스가 긴 케이스의 앞부분이 되지 않게
+        audio = synth_speech(seconds, seed=int(seconds))
+        for seg in segs:
+            for impl in impls:
+                if impl == "legacy" and seconds > args.legacy_max_sec:
+                    continue
+                stats, result = bench_case(
+                    IMPLS[impl], audio, model, seg, args.repeat, not args.no_mem
+                )
+                key = f"{impl}:{seg}:{seconds:g}s:{model_tag}"
+                # chunked 는 한 번에 분석한 faster 와 같은 결과여야 함
+                gkey = key.replace("chunked:", "faster:", 1)
+                cur = comparable(result)
+                if args.update_golden and impl != "chunked":
+                    golden[key] = cur
+                    drift = "ok"
+                elif gkey not in golden:
+                    drift = "no_golden"
+                else:
+                    drift = diff_paths(golden[gkey], cur, args.tol) or "ok"
+                walls[(impl, seg, seconds)] = stats["wall_sec"]
+                cases.append(
+                    {
+                        "impl": impl,
+                        "segmentation": seg,
+                        "audio_sec": seconds,
+                        **stats,
+                        "throughput_x": round(seconds / stats["wall_sec"], 2),
+                        "windows": result["diag"]["total_windows"],
+                        "fillers": len(result["intervals"]["filler"]),
+                        "drift": drift,
+                    }
+                )
+                if impl == "chunked":
+                    cases[-1].update(_chunk_stats(stats, result, workers))
+                print(
+                    f"[bench] {key} wall {stats['wall_sec']}s "
+                    f"x{cases[-1]['throughput_x']} drift={drift if drift in ('ok', 'no_golden') else 'FAIL'}",
+                    file=sys.stderr,
+                )
+
+    if args.update_golden:
+        save_golden(args.golden, golden)
+
+    speedup = {
+        f"{seg}:{seconds:g}s": round(walls[("legacy", seg, seconds)] / w, 2)
+        for (impl, seg, seconds), w in walls.items()
+        if impl == "faster" and ("legacy", seg, seconds) in walls
+    }
+    chunked_speedup = {
+        f"{c['segmentation']}:{c['audio_sec']:g}s": {
+            "measured": round(
+                walls[("faster", c["segmentation"], c["audio_sec"])] / c["wall_sec"], 2
+            ),
+            "projected": round(
+                walls[("faster", c["segmentation"], c["audio_sec"])]
+                / c["projected_wall_sec"],
+                2,
+            ),
+        }
+        for c in cases
+        if c["impl"] == "chunked"
+        and ("faster", c["segmentation"], c["audio_sec"]) in walls
+    }
+    ok = all(c["drift"] in ("ok", "no_golden") for c in cases)
+    print(
+        json.dumps(
+            {
+                "env": {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                    "cpu_quota": analysis_pool.cpu_quota(),
+                    "workers": workers if "chunked" in impls else None,
+                    "model": model_tag,
+                    "thr": ff.THR,
+                },
+                "cases": cases,
+                "speedup": speedup,
+                "chunked_speedup": chunked_speedup,
+                "ok": ok,
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+워커 기동 시간 측정 (import / 모델 로드 / 워밍업을 따로).
+
+매 측정마다 새 파이썬 프로세스를 띄워서 import 캐시 영향 없이 잰다.
+
+  python bench_startup.py [--model PATH] [--repeat 3]
+
+출력(JSON)
+  import_main_sec       main 모듈 import (TF 없이 기동되는 시간)
+  import_tf_sec         tensorflow import
+  import_core_sec       core_filler (librosa 등) import
+  load_sec              .h5 모델 로드
+  warmup_sec            더미 배치로 첫 추론 (그래프 트레이싱 포함)
+  first_predict_sec     워밍업 없이 바로 추론했을 때 첫 호출 시간 (비교용)
+  warm_predict_sec      워밍업 후 같은 배치 추론 시간
+  tf_imported_by_main   main import 만으로 TF 가 올라왔는지 (False 여야 함)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = r"""
+import json, sys, time
+sys.path.insert(0, {here!r})
+out = {{}}
+t = time.perf_counter()
+import main
+out["import_main_sec"] = time.perf_counter() - t
+out["tf_imported_by_main"] = "tensorflow" in sys.modules
+
+t = time.perf_counter()
+import tensorflow
+out["import_tf_sec"] = time.perf_counter() - t
+t = time.perf_counter()
+import core_filler
+out["import_core_sec"] = time.perf_counter() - t
+
+import numpy as np
+import func_filler as ff
+import model_runtime
+t = time.perf_counter()
+model = model_runtime.load_filler_model({model!r})
+out["load_sec"] = time.perf_counter() - t
+x = np.zeros((ff.INFER_BATCH_SIZE, *model_runtime.INPUT_SHAPE), dtype=np.float32)
+t = time.perf_counter()
+if {warm!r}:
+    model_runtime.warmup(model)
+    out["warmup_sec"] = time.perf_counter() - t
+    t = time.perf_counter()
+    ff.predict_filler_probs(model, x)
+    out["warm_predict_sec"] = time.perf_counter() - t
+else:
+    ff.predict_filler_probs(model, x)
+    out["first_predict_sec"] = time.perf_counter() - t
+print(json.dumps(out))
+"""
+
+
+def _probe(model: str, warm: bool) -> dict:
+    env = dict(os.environ, MODEL_PRELOAD="0", TF_CPP_MIN_LOG_LEVEL="3")
+    code = _PROBE.format(here=HERE, model=model, warm=warm)
+    res = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--model",
+        default=os.getenv(
+            "FILLER_MODEL_PATH",
+            os.path.join(HERE, "model", "new_filler_determine_model.h5"),
+        ),
+    )
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    runs = []
+    for _ in range(args.repeat):
+        runs.append(_probe(args.model, warm=True))
+        runs.append(_probe(args.model, warm=False))
+
+    summary = {}
+    for key in sorted({k for r in runs for k in r}):
+        vals = [r[key] for r in runs if key in r]
+        if isinstance(vals[0], bool):
+            summary[key] = any(vals)
+        else:
+            summary[key] = round(statistics.median(vals), 4)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+추론 백엔드 parity 체크: 샘플 오디오의 윈도우별 filler 확률을 Keras 기준과 비교.
+
+  python check_backend_parity.py a.webm b.wav ... \
+      [--model PATH] [--backends tflite:none,tflite:fp16,tflite:int8,onnx:none,onnx:int8] \
+      [--all-windows] [--rss] [--max-flip-pct 0.5] [--max-abs 0.05] [--write-report]
+
+출력(JSON, 백엔드별)
+  max_abs / mean_abs / p99_abs   Keras 확률과의 절대 차이
+  threshold_flips                func_filler.THR 기준 통과 여부가 달라진 윈도우 수 (flip_pct: 비율 %)
+  results                        녹음 전체 분석 결과 비교: filler 구간 수 / filler_ms 가 달라진
+                                 녹음 수와 차이 합
+  passed                         flip_pct <= --max-flip-pct 이고 max_abs <= --max-abs
+  ms_per_window                  INFER_BATCH_SIZE 배치 기준 윈도우당 추론 시간
+  rss_mb                         (--rss) 백엔드만 로드 + 워밍업한 새 프로세스의 최대 RSS (VmHWM)
+
+--write-report: fp16 / int8 변환본마다 이 결과를 "<변환본>.parity.json" 으로 남긴다.
+inference_backend 는 passed 인 기록이 있어야 INFER_QUANT=fp16 / int8 을 로드한다.
+기준을 넘은 백엔드가 있으면 종료 코드 1.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import func_filler as ff
+import inference_backend
+from convert import decode_normalized_pcm16
+from core_filler import faster_run_filler_analysis_pcm, plan_filler_windows
+
+_RSS_PROBE = r"""
+import sys
+sys.path.insert(0, {here!r})
+import inference_backend, model_runtime
+m = inference_backend.load({model!r}, {backend!r}, {quant!r})
+model_runtime.warmup(m)
+# ru_maxrss 는 fork 한 부모 프로세스의 RSS 가 섞이므로 VmHWM 사용
+with open("/proc/self/status") as f:
+    print([l.split()[1] for l in f if l.startswith("VmHWM:")][0])
+"""
+
+
+def _decode(paths) -> list:
+    out = []
+    for path in paths:
+        with open(path, "rb") as f:
+            out.append(decode_normalized_pcm16(f.read()))
+    return out
+
+
+def _windows_x(recordings, all_windows: bool) -> np.ndarray:
+    xs = []
+    for pcm, gain in recordings:
+        plan = plan_filler_windows(pcm, gain_db=gain)
+        if all_windows:
+            items = [
+                (ws, we, we - ws)
+                for s, e in plan.speech_iv
+                for ws, we in ff.sliding_windows(s, e)
+            ]
+        else:
+            items = plan.candidates
+        xs.append(plan.features(items))
+    return np.concatenate(xs, axis=0)
+
+
+def _score(model, xs: np.ndarray):
+    t = time.perf_counter()
+    probs = ff.predict_filler_probs(model, xs, batch_size=ff.INFER_BATCH_SIZE)
+    ms = (time.perf_counter() - t) * 1000.0 / max(1, len(xs))
+    return probs, ms
+
+
+def _results(model, recordings) -> list:
+    """녹음별 (filler 구간 수, filler_ms)"""
+    out = []
+    for pcm, gain in recordings:
+        r = faster_run_filler_analysis_pcm(pcm, model, gain_db=gain)
+        out.append((len(r["intervals"]["filler"]), r["filler_ms"]))
+    return out
+
+
+def _compare_results(got: list, ref: list) -> dict:
+    return {
+        "recordings_changed": sum(1 for a, b in zip(got, ref) if a != b),
+        "filler_count_diff": sum(abs(a[0] - b[0]) for a, b in zip(got, ref)),
+        "filler_ms_diff": sum(abs(a[1] - b[1]) for a, b in zip(got, ref)),
+    }
+
+
+def _rss_mb(model_path: str, backend: str, quant: str) -> float:
+    code = _RSS_PROBE.format(here=HERE, model=model_path, backend=backend, quant=quant)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    res = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # VmHWM 단위는 KB
+    return round(int(res.stdout.strip().splitlines()[-1]) / 1024.0, 1)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("audio", nargs="+")
+    ap.add_argument(
+        "--model",
+        default=os.getenv(
+            "FILLER_MODEL_PATH",
+            os.path.join(HERE, "model", "new_filler_determine_model.h5"),
+        ),
+    )
+    ap.add_argument(
+        "--backends", default="tflite:none,tflite:fp16,tflite:int8,onnx:none,onnx:int8"
+    )
+    ap.add_argument("--all-windows", action="store_true")
+    ap.add_argument("--rss", action="store_true")
+    ap.add_argument("--max-flip-pct", type=float, default=0.5)
+    ap.add_argument("--max-abs", type=float, default=0.05)
+    ap.add_argument("--write-report", action="store_true")
+    args = ap.parse_args()
+
+    recordings = _decode(args.audio)
+    xs = _windows_x(recordings, args.all_windows)
+    ref_model = inference_backend.load(args.model, "keras", "none")
+    _score(ref_model, xs[:1])  # 트레이싱 제외
+    ref, ref_ms = _score(ref_model, xs)
+    ref_results = _results(ref_model, recordings)
+
+    report = {
+        "windows": int(len(xs)),
+        "threshold": ff.THR,
+        "keras": {"ms_per_window": round(ref_ms, 4)},
+        "gate": {"max_flip_pct": args.max_flip_pct, "max_abs": args.max_abs},
+    }
+    if args.rss:
+        report["keras"]["rss_mb"] = _rss_mb(args.model, "keras", "none")
+
+    # 통과 기록은 이 스크립트가 남기므로, 기록 확인 없이 로드해서 비교
+    inference_backend.REQUIRE_PARITY = False
+    failed = False
+    for spec in args.backends.split(","):
+        backend, _, quant = spec.partition(":")
+        quant = quant or "none"
+        try:
+            model = inference_backend.load(args.model, backend, quant)
+        except Exception as e:
+            report[spec] = {"error": str(e)}
+            continue
+        _score(model, xs[:1])
+        probs, ms = _score(model, xs)
+        diff = np.abs(probs - ref)
+        flips = int(np.sum((probs >= ff.THR) != (ref >= ff.THR)))
+        entry = report[spec] = {
+            "max_abs": float(diff.max()) if len(diff) else 0.0,
+            "mean_abs": float(diff.mean()) if len(diff) else 0.0,
+            "p99_abs": float(np.percentile(diff, 99)) if len(diff) else 0.0,
+            "threshold_flips": flips,
+            "flip_pct": round(100.0 * flips / max(1, len(xs)), 4),
+            "results": _compare_results(_results(model, recordings), ref_results),
+            "ms_per_window": round(ms, 4),
+        }
+        entry["passed"] = (
+            entry["flip_pct"] <= args.max_flip_pct and entry["max_abs"] <= args.max_abs
+        )
+        failed = failed or not entry["passed"]
+        if args.rss:
+            entry["rss_mb"] = _rss_mb(args.model, backend, quant)
+        if args.write_report and quant != "none":
+            path = inference_backend.converted_path(args.model, backend, quant)
+            record = {
+                **entry,
+                "windows": report["windows"],
+                "threshold": ff.THR,
+                "gate": report["gate"],
+                "audio": [os.path.basename(p) for p in args.audio],
+            }
+            inference_backend.parity_report_path(path).write_text(
+                json.dumps(record, indent=2, ensure_ascii=False)
+            )
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,22 @@
+import math
+import mmap
+import os
 import subprocess
+import tempfile
+import threading
+import weakref
+from typing import BinaryIO, Iterable, NamedTuple, Optional, Tuple, Union
+import numpy as np
 from pydub import AudioSegment
 from io import BytesIO
 
+from pcm_buffer import padded_len
+
+PCM_SR = 16000
+PEAK_TARGET_DBFS = -1.0  # 피크 노멀라이즈 목표 (pydub max_dBFS 기준)
+_READ_CHUNK = 1 << 16
+_NORM_CHUNK = 1 << 20  # 노멀라이즈 시 float 로 올리는 샘플 수 (임시 메모리 상한)
+
 
 def convert_webm_to_wav(webm_path: str, wav_path: str):
     subprocess.run(
@@ -29,6 +44,129 @@ def convert_to_seekable_webm(webm_path: str, output_path: str):
     )
 
 
+class _StderrTail:
+    """
+    ffmpeg stderr 파이프를 백그라운드 스레드에서 계속 비우고 끝의 keep 바이트만 남긴다.
+    깨진 입력이면 패킷마다 에러를 찍을 수 있어, 끝날 때 한 번에 읽으면 stderr 파이프(64KB)
+    가 차서 ffmpeg 가 멈추고 stdout 을 기다리는 쪽도 같이 멈춘다.
+    """
+
+    KEEP = 8192
+
+    def __init__(self, pipe, keep: int = KEEP):
+        self._pipe = pipe
+        self._keep = keep
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            try:
+                chunk = self._pipe.read1(_READ_CHUNK)
+            except (OSError, ValueError):
+                return
+            if not chunk:
+                return
+            with self._lock:
+                self._buf += chunk
+                del self._buf[: -self._keep]
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def text(self) -> str:
+        with self._lock:
+            return bytes(self._buf).decode(errors="replace")
+
+
+def _anon_file(name: str) -> Tuple[BinaryIO, str]:
+    """디스크에 이름이 남지 않는 읽기/쓰기 파일 + ffmpeg 에 넘길 경로"""
+    if hasattr(os, "memfd_create"):
+        # 리눅스: 메모리에만 있는 익명 파일. 자식 프로세스는 /dev/fd/N 으로 연다
+        fd = os.memfd_create(name, os.MFD_CLOEXEC)
+        return open(fd, "w+b", buffering=0), f"/dev/fd/{fd}"
+    f = tempfile.NamedTemporaryFile(suffix=".webm")
+    return f, f.name
+
+
+class SeekableWebmRemuxer:
+    """
+    webm 청크 -> 코덱 복사 재다중화 -> Duration / Cues 가 들어간 seek 가능한 webm.
+    (convert_to_seekable_webm 과 같은 ffmpeg 옵션, 파일 대신 파이프 입력)
+
+    청크는 write 하는 즉시 ffmpeg stdin 으로 흘려보내므로 업로드를 저장하지 않는다.
+    출력은 stdout 파이프가 아니라 익명 메모리 파일(memfd)에 쓴다. matroska muxer 는
+    끝에서 파일 앞쪽으로 돌아가 Duration 과 Cues(탐색 인덱스)를 쓰는데, 파이프 출력은
+    seek 할 수 없어서 이 둘이 빠진 (= 변환 전과 같은) 파일이 나오기 때문이다.
+    """
+
+    def __init__(self):
+        self._out, path = _anon_file("seekable-webm")
+        self._proc = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-i",
+                "pipe:0",
+                "-c:a",
+                "copy",
+                "-fflags",
+                "+genpts",
+                "-f",
+                "webm",
+                "-y",
+                path,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            pass_fds=(self._out.fileno(),) if path.startswith("/dev/fd/") else (),
+        )
+        self._err = _StderrTail(self._proc.stderr)
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        try:
+            self._proc.stdin.write(chunk)
+        except BrokenPipeError as e:
+            self._proc.wait()
+            self._err.join()
+            raise subprocess.CalledProcessError(
+                self._proc.returncode, "ffmpeg", stderr=self._stderr()
+            ) from e
+
+    def finish(self) -> Tuple[BinaryIO, int]:
+        """입력 끝. (처음 위치로 되감은 출력 파일, 바이트 수). 파일은 호출한 쪽이 닫는다"""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._proc.wait()
+        self._err.join()
+        if self._proc.returncode != 0:
+            self._out.close()
+            raise subprocess.CalledProcessError(
+                self._proc.returncode, "ffmpeg", stderr=self._stderr()
+            )
+        size = os.fstat(self._out.fileno()).st_size
+        self._out.seek(0)
+        return self._out, size
+
+    def abort(self):
+        if self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+        self._out.close()
+
+    def _stderr(self) -> str:
+        return self._err.text()
+
+
 def webm_to_wav_bytes(webm_bytes: bytes) -> bytes:
     # webm → AudioSegment
     audio = AudioSegment.from_file(BytesIO(webm_bytes), format="webm")
@@ -36,3 +174,377 @@ def webm_to_wav_bytes(webm_bytes: bytes) -> bytes:
     buf = BytesIO()
     audio.export(buf, format="wav")
     return buf.getvalue()
+
+
+def _ffmpeg_pcm16_cmd(sr: int):
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(sr),
+        "-f",
+        "s16le",
+        "-acodec",
+        "pcm_s16le",
+        "pipe:1",
+    ]
+
+
+class AudioLimitError(ValueError):
+    """입력이 한도(바이트 수 / 길이)를 넘음. 넘는 순간 다운로드 / 디코딩을 멈춘다"""
+
+
+class SpilledPcm(NamedTuple):
+    """임시 파일로 내린 PCM 의 위치. 풀 워커에는 배열 대신 이것만 보낸다"""
+
+    path: str
+    samples: int
+
+    def open(self) -> np.ndarray:
+        return np.memmap(self.path, dtype=np.int16, mode="r", shape=(self.samples,))
+
+
+def spilled_pcm(pcm: np.ndarray) -> Optional[SpilledPcm]:
+    """decode_to_pcm16 이 임시 파일로 내린 배열이면 그 위치, 아니면 None"""
+    # view(슬라이스)가 아니라 파일 전체를 매핑한 배열만
+    if isinstance(pcm, np.memmap) and isinstance(pcm.base, mmap.mmap):
+        return SpilledPcm(pcm.filename, len(pcm))
+    return None
+
+
+def _unlink_quiet(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _PcmSink:
+    """
+    ffmpeg stdout(s16le) 을 int16 배열로 모은다.
+
+    max_samples > 0   넘는 순간 AudioLimitError
+    spill_samples > 0 넘으면 그때까지 받은 것을 spill_dir 의 임시 파일로 옮기고 나머지도
+                      파일에 이어 쓴 뒤 np.memmap 으로 돌려준다. 긴 녹음이 통째로 힙에
+                      올라가지 않고 (bytearray 가 커질 때마다의 재할당 복사도 없음),
+                      메모리가 모자라면 커널이 페이지를 파일로 내릴 수 있다.
+                      파일은 배열(과 그 view)이 모두 사라지면 삭제
+    """
+
+    def __init__(self, max_samples: int = 0, spill_samples: int = 0, spill_dir=None):
+        self.max_bytes = max_samples * 2
+        self.spill_bytes = spill_samples * 2
+        self.spill_dir = spill_dir
+        self.nbytes = 0
+        self._buf = bytearray()
+        self._file = None
+
+    def write(self, chunk: bytes):
+        self.nbytes += len(chunk)
+        if self.max_bytes and self.nbytes > self.max_bytes:
+            raise AudioLimitError(
+                f"오디오가 최대 길이({self.max_bytes // 2 // PCM_SR}초)를 넘습니다."
+            )
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._buf += chunk
+        if self.spill_bytes and len(self._buf) > self.spill_bytes:
+            self._file = tempfile.NamedTemporaryFile(
+                dir=self.spill_dir, prefix="pcm-", suffix=".s16le", delete=False
+            )
+            self._file.write(self._buf)
+            self._buf = bytearray()
+
+    def finish(self, pad_ms: bool = False) -> np.ndarray:
+        """
+        int16 배열 (홀수 바이트가 남으면 버림)
+        pad_ms: PcmBuffer 의 ms 길이만큼 끝을 0 으로 채움 (padded_len)
+        """
+        n = self.nbytes // 2
+        total = padded_len(n, PCM_SR) if pad_ms else n
+        if self._file is None:
+            del self._buf[n * 2 :]
+            # bytearray 는 여유 용량이 있어 보통 재할당 없이 붙는다
+            self._buf += bytes((total - n) * 2)
+            return np.frombuffer(self._buf, dtype=np.int16)
+        f, self._file = self._file, None
+        try:
+            f.flush()
+            f.truncate(total * 2)  # 홀수 바이트 자르기 + 0 채우기
+        finally:
+            f.close()
+        mm = np.memmap(f.name, dtype=np.int16, mode="r+", shape=(total,))
+        weakref.finalize(mm, _unlink_quiet, f.name)
+        return mm
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            _unlink_quiet(self._file.name)
+            self._file = None
+        self._buf = bytearray()
+
+
+def decode_to_pcm16(
+    data: Union[bytes, Iterable[bytes]],
+    sr: int = PCM_SR,
+    max_samples: int = 0,
+    spill_samples: int = 0,
+    spill_dir: Optional[str] = None,
+    pad_ms: bool = False,
+) -> np.ndarray:
+    """
+    ffmpeg 한 번으로 (webm/wav/...) -> 16k/mono/s16le 디코딩 + 리샘플.
+    data 는 bytes 또는 bytes 청크 이터레이터(다운로드 스트림). 청크가 도착하는 대로
+    stdin 에 흘려보내므로 다운로드와 디코딩이 겹쳐서 진행된다.
+    stdout 을 bytearray 로 바로 받아서 쓰기 가능한 int16 배열로 반환 (추가 복사 없음).
+    max_samples / spill_samples / spill_dir / pad_ms 는 _PcmSink 참고.
+    한도를 넘거나 청크 이터레이터가 예외를 던지면 ffmpeg 를 바로 종료한다.
+    """
+    chunks = [data] if isinstance(data, (bytes, bytearray, memoryview)) else data
+    proc = subprocess.Popen(
+        _ffmpeg_pcm16_cmd(sr),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    err = _StderrTail(proc.stderr)
+
+    # stdin 쓰기와 stdout 읽기를 동시에 해야 파이프 버퍼가 차서 막히지 않음 (stderr 는 err)
+    feed_error = []
+
+    def _feed():
+        try:
+            for chunk in chunks:
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            # 다운로드 실패 / 바이트 한도 등: 남은 입력은 디코딩하지 않음
+            feed_error.append(e)
+            proc.kill()
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    writer = threading.Thread(target=_feed, daemon=True)
+    writer.start()
+
+    sink = _PcmSink(max_samples, spill_samples, spill_dir)
+    try:
+        while True:
+            chunk = proc.stdout.read1(_READ_CHUNK)
+            if not chunk:
+                break
+            sink.write(chunk)
+        writer.join()
+        if feed_error:
+            proc.wait()
+            raise feed_error[0]
+        if proc.wait() != 0:
+            err.join()
+            raise subprocess.CalledProcessError(
+                proc.returncode, "ffmpeg", stderr=err.text()
+            )
+    except BaseException:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        sink.abort()
+        raise
+    return sink.finish(pad_ms=pad_ms)
+
+
+def peak_gain_db(peak: int, target_dbfs: float = PEAK_TARGET_DBFS) -> float:
+    """피크 절댓값이 peak 인 신호를 target_dbfs 로 맞추는 gain(dB). 무음이면 0"""
+    if peak == 0:
+        return 0.0
+    max_dbfs = 20 * math.log(peak / 32768.0, 10)
+    return target_dbfs - max_dbfs
+
+
+def apply_gain_inplace(pcm: np.ndarray, gain: float):
+    """int16 배열에 gain(dB) 을 제자리에서 적용 (audioop.mul 과 같이 내림 후 클램프)"""
+    factor = 10 ** (gain / 20)
+    for i in range(0, pcm.size, _NORM_CHUNK):
+        part = pcm[i : i + _NORM_CHUNK]
+        scaled = part * factor
+        np.floor(scaled, out=scaled)
+        np.clip(scaled, -32768, 32767, out=scaled)
+        part[...] = scaled
+
+
+def normalize_peak_inplace(pcm: np.ndarray, target_dbfs: float = PEAK_TARGET_DBFS):
+    """
+    AudioSegment.apply_gain(target - max_dBFS) 와 같은 피크 노멀라이즈를 제자리에서 수행.
+    (audioop.mul 과 같이 내림 후 int16 범위로 클램프) 적용한 gain(dB)을 반환.
+    샘플별 연산이라 녹음 일부 구간에 같은 gain 을 apply_gain_inplace 해도 값이 같다.
+    """
+    if pcm.size == 0:
+        return 0.0
+    peak = max(int(pcm.max()), -int(pcm.min()))
+    if peak == 0:
+        return 0.0
+    gain = peak_gain_db(peak, target_dbfs)
+    apply_gain_inplace(pcm, gain)
+    return gain
+
+
+def decode_normalized_pcm16(
+    data: Union[bytes, Iterable[bytes]],
+    sr: int = PCM_SR,
+    max_samples: int = 0,
+    spill_samples: int = 0,
+    spill_dir: Optional[str] = None,
+):
+    """
+    /analyze 용 단일 디코딩 단계: (피크 노멀라이즈된 int16 배열, gain_db)
+    끝은 PcmBuffer 의 ms 길이만큼 0 으로 채워 둔다 (분석 때 전체 사본을 만들지 않도록)
+    """
+    pcm = decode_to_pcm16(
+        data,
+        sr=sr,
+        max_samples=max_samples,
+        spill_samples=spill_samples,
+        spill_dir=spill_dir,
+        pad_ms=True,
+    )
+    gain = normalize_peak_inplace(pcm)
+    return pcm, gain
+
+
+class StreamingPcmDecoder:
+    """
+    청크를 write 하는 즉시 디코딩하는 증분 디코더 (스트리밍 분석 세션용).
+
+    decode_to_pcm16 과 같은 ffmpeg 명령을 하나 띄워 두고 stdin 에 청크를 흘려보내며,
+    stdout 은 백그라운드 스레드가 계속 받아서 쌓는다 (stderr 도 _StderrTail 이 비움).
+    같은 바이트를 한 번에 넣은 decode_to_pcm16 과 결과 PCM 이 같다.
+    take() 로 그때까지 디코딩된 부분을 가져가면 디코더에는 그 뒤만 남는다 (긴 녹음을
+    디코더가 통째로 들고 있지 않도록). finish() 는 가져가지 않은 나머지를 돌려준다.
+    raw_pcm=True 면 입력이 이미 16k/mono/s16le 이므로 ffmpeg 없이 그대로 쌓는다.
+    max_samples > 0 이면 디코딩된 길이가 넘는 순간 ffmpeg 를 종료하고 이후 write / finish 는
+    AudioLimitError (작은 청크가 아주 긴 PCM 으로 풀리는 입력도 한도 안에서 멈춤)
+    """
+
+    def __init__(self, sr: int = PCM_SR, raw_pcm: bool = False, max_samples: int = 0):
+        self.sr = sr
+        self.max_bytes = max_samples * 2
+        self._over = False
+        self._out = bytearray()  # 아직 take 로 가져가지 않은 출력
+        self._nbytes = 0  # 지금까지 디코딩된 전체 바이트 수
+        self._lock = threading.Lock()
+        self._proc = None
+        self._reader = None
+        if not raw_pcm:
+            self._proc = subprocess.Popen(
+                _ffmpeg_pcm16_cmd(sr),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            self._err = _StderrTail(self._proc.stderr)
+            self._reader = threading.Thread(target=self._read, daemon=True)
+            self._reader.start()
+
+    def _read(self):
+        while True:
+            chunk = self._proc.stdout.read1(_READ_CHUNK)
+            if not chunk:
+                return
+            if not self._keep(chunk):
+                self._proc.kill()
+                return
+
+    def _keep(self, chunk: bytes) -> bool:
+        """디코딩된 청크를 쌓음. 길이 한도를 넘으면 쌓지 않고 False"""
+        with self._lock:
+            if self.max_bytes and self._nbytes + len(chunk) > self.max_bytes:
+                self._over = True
+                return False
+            self._out += chunk
+            self._nbytes += len(chunk)
+            return True
+
+    def _check_limit(self):
+        if self._over:
+            raise AudioLimitError(
+                f"오디오가 최대 길이({self.max_bytes // 2 // self.sr}초)를 넘습니다."
+            )
+
+    def write(self, chunk: bytes):
+        self._check_limit()
+        if not chunk:
+            return
+        if self._proc is None:
+            self._keep(chunk)
+            self._check_limit()
+            return
+        try:
+            self._proc.stdin.write(chunk)
+            self._proc.stdin.flush()
+        except BrokenPipeError as e:
+            # ffmpeg 가 먼저 죽음 (잘못된 입력 / 길이 한도 등)
+            self._proc.wait()
+            self._err.join()
+            self._check_limit()
+            raise subprocess.CalledProcessError(
+                self._proc.returncode, "ffmpeg", stderr=self._stderr()
+            ) from e
+
+    def samples(self) -> int:
+        """지금까지 디코딩된 샘플 수"""
+        with self._lock:
+            return self._nbytes // 2
+
+    def take(self) -> np.ndarray:
+        """지금까지 디코딩된 것 중 아직 가져가지 않은 샘플 (쓰기 가능한 int16 배열)"""
+        with self._lock:
+            n = len(self._out) // 2 * 2
+            out = bytearray(self._out[:n])
+            del self._out[:n]
+        return np.frombuffer(out, dtype=np.int16)
+
+    def finish(self) -> np.ndarray:
+        """
+        입력 끝. 남은 출력을 모두 받아 take 로 가져가지 않은 나머지 PCM 반환
+        (take 를 안 썼으면 전체. decode_to_pcm16 과 동일)
+        """
+        self._check_limit()
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._reader.join()
+            self._proc.wait()
+            self._check_limit()
+            if self._proc.returncode != 0:
+                self._err.join()
+                raise subprocess.CalledProcessError(
+                    self._proc.returncode, "ffmpeg", stderr=self._stderr()
+                )
+        with self._lock:
+            # 홀수 바이트가 남으면 버림
+            if len(self._out) % 2:
+                del self._out[-1]
+            out = bytearray(self._out)
+        return np.frombuffer(out, dtype=np.int16)
+
+    def abort(self):
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+    def _stderr(self) -> str:
+        return self._err.text()
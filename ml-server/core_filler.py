@@ -1,10 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Tuple, Dict, Any, Callable
 import io
 import numpy as np
 from pydub import AudioSegment
 import func_filler as ff
+from feature_engine import MfccEngine
+from pcm_buffer import PcmBuffer
+from audio_index import EnergyIndex, VadIndex
+from interval_set import IntervalSet
+from convert import decode_normalized_pcm16
+from metrics import StageTimer
 
 
 @dataclass
@@ -243,206 +249,645 @@ def faster_run_filler_analysis_bytes(
     segmentation: str = "adaptive",  # 'adaptive' | 'vad' | 'pydub'
     params: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
-    p = params or {}
+    # ffmpeg 한 번으로 16k/mono/int16 디코딩 + 제자리 피크 노멀라이즈
+    pcm, gain = decode_normalized_pcm16(audio_bytes)
+    return faster_run_filler_analysis_pcm(
+        pcm, model, segmentation=segmentation, params=params, gain_db=gain
+    )
 
-    # 모델을 로드 + 피크 노멀라이즈
-    full = AudioSegment.from_file(io.BytesIO(audio_bytes))
-    gain = -1.0 - (full.max_dBFS if full.max_dBFS != float("-inf") else -1.0)
-    full = full.apply_gain(gain)
-    full = ff.ensure_format(full)
 
-    adapt = ff.compute_adaptive_params(full, frame_ms=30)
-    ctx_th = adapt["ctx_thresh"]
+@dataclass
+class WindowPlan:
+    """
+    추론 직전까지 끝난 녹음 하나의 상태.
+    plan_filler_windows -> (모델 점수) -> finish_filler_analysis 순서로 쓰며,
+    /analyze/batch 는 여러 녹음의 candidates 를 모아서 한 번에 점수 계산한다.
+    """
+
+    full: PcmBuffer
+    speech_iv: IntervalSet
+    candidates: List[Tuple[int, int, int]]  # 필터 통과 윈도우 (ws, we, dur)
+    drop: Dict[str, int]
+    total_windows: int
+    segmentation: str
+    gain_db: float
+    params: Dict[str, Any]
+    engine: MfccEngine | None = None
+    timer: StageTimer = field(default_factory=StageTimer)  # -> diag.timings
+
+    def features(self, items=None) -> np.ndarray:
+        """윈도우 -> (N, 20, 40, 1) 모델 입력"""
+        items = self.candidates if items is None else items
+        if not items:
+            return np.zeros((0, 20, 40, 1), dtype=np.float32)
+        with self.timer.stage("mfcc"):
+            if self.engine is not None:
+                return self.engine.windows_x([(ws, we) for ws, we, _ in items])
+            return np.concatenate(
+                [ff.extract_x(ff.slice_ms(self.full, ws, we)) for ws, we, _ in items],
+                axis=0,
+            )
+
+    def release_features(self):
+        """점수 계산이 끝난 뒤 MFCC 엔진의 mel 캐시 / 신호 참조를 놓음 (집계 동안 들고 있지 않게)"""
+        if self.engine is not None:
+            self.engine.release()
+
+
+def faster_run_filler_analysis_pcm(
+    pcm: np.ndarray,
+    model,
+    segmentation: str = "adaptive",  # 'adaptive' | 'vad' | 'pydub'
+    params: Dict[str, Any] | None = None,
+    gain_db: float = 0.0,
+    progress: Callable[..., None] | None = None,
+) -> Dict[str, Any]:
+    """
+    피크 노멀라이즈까지 끝난 16k/mono int16 PCM 을 분석
 
-    # 1. 전역 발화 구간
-    if segmentation == "vad":
-        speech_ivs_raw = ff.detect_speech_intervals_vad(
-            full,
-            frame_ms=p.get("vad_frame_ms", 20),  # 10/20/30 중 하나
-            aggr=p.get("vad_aggr", 2),  # 0~3 (3이 더 엄격)
-            min_speech_ms=p.get(
-                "vad_min_speech_ms", 200
-            ),  # 얼마나 잘게 쪼갤지 (200~250)
-            hangover_ms=p.get(
-                "vad_hangover_ms", 120
-            ),  # 문장 꼬리 자연스럽게 붙임 (100~200)
-            max_merge_gap_ms=p.get("vad_merge_gap_ms", 120),
-        )
-    elif segmentation == "pydub":
-        speech_ivs_raw = ff.detect_speech_intervals(full)
-    else:
-        speech_ivs_raw = ff.detect_speech_intervals_adaptive(
-            full,
-            frame_ms=p.get("adaptive_frame_ms", 30),
-            enter_margin_db=p.get("adaptive_enter_db", 6.0),
-            exit_margin_db=p.get("adaptive_exit_db", 3.0),
-            min_speech_ms=p.get("adaptive_min_speech_ms", 150),
-            min_sil_ms=p.get("adaptive_min_sil_ms", 120),
-        )
+    progress: 선택. progress(stage, value, **info) 로 단계별 진행 상황을 알린다.
+      stage = "segmentation" | "windows" | "aggregation", value = 0~1
+      ("windows" 는 점수 계산이 끝난 후보 윈도우 수 scored / 전체 total 도 함께 전달)
+    """
+    plan = plan_filler_windows(pcm, segmentation, params, gain_db, progress)
+    probs, inference = score_window_plan(plan, model, progress)
+    return finish_filler_analysis(plan, probs, inference, progress)
 
-    speech_iv = merge_iv(speech_ivs_raw)
 
-    # 2. 윈도윙 + 후보 필터 + 추론
+def plan_filler_windows(
+    pcm: np.ndarray,
+    segmentation: str = "adaptive",
+    params: Dict[str, Any] | None = None,
+    gain_db: float = 0.0,
+    progress: Callable[..., None] | None = None,
+    energy: EnergyIndex | None = None,
+    vad_index: VadIndex | None = None,
+) -> WindowPlan:
+    """
+    1. 전역 발화 구간 + 2. 윈도윙/후보 필터 (모델 없이 CPU 만 사용)
+
+    energy / vad_index: 선택. pcm 으로 미리 만들어 둔 인덱스 (스트리밍 세션이 녹음 중에
+      이어서 쌓아 둔 것). 있으면 pcm 으로 다시 만들지 않는다. vad_index 는
+      ff.VAD_FRAME_MS / ff.VAD_AGGR 로 만든 것이어야 한다. 끝부분만 계획할 때는
+      energy.threshold_source 로 녹음 전체 기준 적응형 임계값을 쓴다 (체크포인트)
+    """
+    p = params or {}
+    gain = gain_db
+    report = progress or (lambda *a, **k: None)
+
+    timer = StageTimer()
+
+    with timer.stage("segmentation"):
+        # 이후 파이프라인은 int16 배열 기반 PcmBuffer 로 처리 (슬라이스 = 복사 없는 view)
+        full = PcmBuffer.from_pcm16(pcm, ff.TARGET_SR)
+        # 구간 에너지(dBFS) 질의용 누적합 인덱스 + 적응형 임계값은 녹음당 한 번만 계산
+        if energy is None:
+            energy = EnergyIndex(full)
+
+        adapt = energy.adaptive_params(30)
+        ctx_th = adapt["ctx_thresh"]
+
+    # WebRTC VAD 는 녹음 전체에 한 번만 돌려 비트맵으로 공유 (윈도우 필터 + vad 분할)
+    # vad 분할은 비트맵이 기존 전체 VAD 와 같아서 항상 쓰지만, 윈도우 필터는 vad 분할에서
+    # 구간 경계 윈도우의 통과 여부가 바뀌므로(VadIndex 참고) 명시적으로 켤 때만 비트맵 사용
+    bitmap_filter = p.get("vad_bitmap", ff.VAD_BITMAP and segmentation != "vad")
+    if not ((bitmap_filter and ff.USE_VAD) or segmentation == "vad"):
+        vad_index = None
+    elif vad_index is None:
+        with timer.stage("vad"):
+            vad_index = VadIndex(full, frame_ms=ff.VAD_FRAME_MS, aggr=ff.VAD_AGGR)
+
+    with timer.stage("segmentation"):
+        # 1. 전역 발화 구간
+        if segmentation == "vad":
+            speech_ivs_raw = ff.detect_speech_intervals_vad(
+                full,
+                frame_ms=p.get("vad_frame_ms", 20),  # 10/20/30 중 하나
+                aggr=p.get("vad_aggr", 2),  # 0~3 (3이 더 엄격)
+                min_speech_ms=p.get(
+                    "vad_min_speech_ms", 200
+                ),  # 얼마나 잘게 쪼갤지 (200~250)
+                hangover_ms=p.get(
+                    "vad_hangover_ms", 120
+                ),  # 문장 꼬리 자연스럽게 붙임 (100~200)
+                max_merge_gap_ms=p.get("vad_merge_gap_ms", 120),
+                vad_index=vad_index,
+            )
+        elif segmentation == "pydub":
+            speech_ivs_raw = ff.detect_speech_intervals(full, energy=energy)
+        else:
+            speech_ivs_raw = ff.detect_speech_intervals_adaptive(
+                full,
+                frame_ms=p.get("adaptive_frame_ms", 30),
+                enter_margin_db=p.get("adaptive_enter_db", 6.0),
+                exit_margin_db=p.get("adaptive_exit_db", 3.0),
+                min_speech_ms=p.get("adaptive_min_speech_ms", 150),
+                min_sil_ms=p.get("adaptive_min_sil_ms", 120),
+                energy=energy,
+            )
+
+        speech_iv = IntervalSet.from_pairs(speech_ivs_raw)
+    report("segmentation", 1.0, speech_intervals=len(speech_iv))
+
+    # 2. 윈도윙 + 후보 필터
+    # 녹음의 모든 윈도우를 배열로 한 번에 만들고, 필터는 기존 순서(= 싼 것부터)대로
+    # 앞 필터를 통과한 윈도우에만 bool 마스크로 적용. 윈도우는 처음 걸린 필터에 집계
     drop = {"too_short_long": 0, "vad": 0, "context": 0, "low_prob": 0}
     if ff.ENERGY_USE:
         drop["energy_valley"] = 0
-    total_windows = 0
-    rows = []
-
-    for s, e in [(i.s, i.e) for i in speech_iv]:
-        for ws, we in ff.sliding_windows(s, e):
-            total_windows += 1
-            seg = ff.slice_ms(full, ws, we)
-            dur = len(seg)
-
-            if dur < ff.MIN_MS or dur > ff.MAX_MS:
-                drop["too_short_long"] += 1
-                continue
-            if ff.USE_VAD:
-                if ff.faster_vad_voiced_ratio(seg) < ff.VAD_REQ_RATIO:
-                    drop["vad"] += 1
-                    continue
-            if ff.USE_QUIET_CONTEXT and not ff.faster_is_quiet_context_adaptive(
-                full, ws, we, ctx_thresh=ctx_th
-            ):
-                drop["context"] += 1
-                continue
-            if ff.ENERGY_USE and (not ff.energy_valley_ok(full, ws, we)):
-                drop["energy_valley"] += 1
-                continue
+    with timer.stage("window_filter"):
+        ws, we = ff.sliding_window_table(speech_iv.s, speech_iv.e)
+        total_windows = len(ws)
+        T = len(full)
+        # len(slice_ms(full, ws, we)) 와 같은 클램프
+        dur = np.maximum(0, np.minimum(we, T) - np.minimum(np.maximum(0, ws), T))
+
+        def _keep(name: str, ok: np.ndarray):
+            nonlocal ws, we, dur
+            drop[name] += int(len(ok) - ok.sum())
+            ws, we, dur = ws[ok], we[ok], dur[ok]
+
+        _keep("too_short_long", (dur >= ff.MIN_MS) & (dur <= ff.MAX_MS))
+        if ff.USE_VAD:
+            if bitmap_filter and vad_index is not None:
+                ratio = vad_index.voiced_ratio_many(ws, we)
+            else:
+                ratio = np.array(
+                    [
+                        ff.faster_vad_voiced_ratio(ff.slice_ms(full, a, b))
+                        for a, b in zip(ws.tolist(), we.tolist())
+                    ],
+                    dtype=np.float64,
+                )
+            _keep("vad", ratio >= ff.VAD_REQ_RATIO)
+        if ff.USE_QUIET_CONTEXT:
+            _keep("context", ff.quiet_context_mask(energy, ws, we, ctx_th))
+        if ff.ENERGY_USE:
+            _keep("energy_valley", ff.energy_valley_mask(energy, ws, we))
+        candidates = list(zip(ws.tolist(), we.tolist(), dur.tolist()))
+
+    # 정규화된 int16 신호를 그대로 공유 (프레임만 float32 로), 겹치는 STFT 프레임도 공유
+    with timer.stage("mfcc"):
+        engine = (
+            MfccEngine(full.samples) if p.get("mfcc_engine", ff.MFCC_ENGINE) else None
+        )
+    return WindowPlan(
+        full=full,
+        speech_iv=speech_iv,
+        candidates=candidates,
+        drop=drop,
+        total_windows=total_windows,
+        segmentation=segmentation,
+        gain_db=gain,
+        params=p,
+        engine=engine,
+        timer=timer,
+    )
 
-            x = ff.extract_x(seg)
-            p0 = float(model.predict(x, verbose=0)[0][ff.FILLER_IDX])
 
-            if p0 >= ff.THR:
-                rows.append({"s": ws, "e": we, "dur_ms": dur, "p": round(p0, 6)})
+def score_window_plan(
+    plan: WindowPlan,
+    model,
+    progress: Callable[..., None] | None = None,
+    known: Dict[Tuple[int, int], float] | None = None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    후보 윈도우별 filler 확률. (probs (N,), diag.inference)
+
+    known: 선택. 같은 gain 의 신호에서 이미 계산한 {(ws, we): 확률}.
+      윈도우 특징은 윈도우 안 샘플에만 의존하므로 그대로 재사용하고 나머지만 계산한다
+      (스트리밍 세션이 녹음 중에 미리 계산한 점수).
+    """
+    p = plan.params
+    report = progress or (lambda *a, **k: None)
+    batch_infer = p.get("batch_infer", ff.BATCH_INFER)
+    infer_batch_size = max(1, int(p.get("infer_batch_size", ff.INFER_BATCH_SIZE)))
+    items = plan.candidates
+    total = len(items)
+    report("windows", 0.0, scored=0, total=total)
+
+    probs = np.zeros((total,), dtype=np.float32)
+    todo = list(range(total))
+    if known:
+        todo = []
+        for i, (ws, we, _) in enumerate(items):
+            if (ws, we) in known:
+                probs[i] = known[(ws, we)]
             else:
-                drop["low_prob"] += 1
+                todo.append(i)
+    reused = total - len(todo)
+    calls = 0
+    _sidecar_stats(model)  # 이전 호출(워밍업 등)의 기록 비우기
+    if batch_infer:
+        # 배치 모드: infer_batch_size 개씩 특징 추출 + 점수 계산 (윈도우 순서 유지)
+        for i in range(0, len(todo), infer_batch_size):
+            idx = todo[i : i + infer_batch_size]
+            x = plan.features([items[k] for k in idx])
+            with plan.timer.stage("predict"):
+                probs[idx] = ff.predict_filler_probs(
+                    model, x, batch_size=infer_batch_size
+                )
+            calls += 1
+            done = reused + i + len(idx)
+            report("windows", done / total, scored=done, total=total)
+        if total and not todo:
+            report("windows", 1.0, scored=total, total=total)
+    else:
+        for i in todo:
+            x = plan.features([items[i]])
+            with plan.timer.stage("predict"):
+                probs[i] = float(model.predict(x, verbose=0)[0][ff.FILLER_IDX])
+            calls += 1
+        report("windows", 1.0, scored=total, total=total)
+
+    inference = {
+        "backend": getattr(model, "backend_name", "keras"),
+        "mode": "batch" if batch_infer else "single",
+        "max_batch_size": infer_batch_size,
+        "calls": calls,
+        "scored": len(todo),
+    }
+    if known is not None:
+        inference["reused"] = reused
+    server = _sidecar_stats(model)
+    if server is not None:
+        inference["server"] = server
+    return probs, inference
+
+
+def _sidecar_stats(model) -> Dict[str, Any] | None:
+    """remote 백엔드면 사이드카 배치 크기 / 큐 대기 요약 (호출할 때마다 비워짐)"""
+    collect = getattr(model, "collect_stats", None)
+    return collect() if collect is not None else None
+
+
+def score_window_plans(
+    plans: List[WindowPlan], model, batch_size: int = ff.INFER_BATCH_SIZE
+) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """
+    여러 녹음의 후보 윈도우를 이어 붙여 같은 모델 배치로 점수 계산 (/analyze/batch 용).
+    결과는 plan 별 probs 로 다시 나눠서 돌려준다. 윈도우 순서/값은 녹음별 계산과 동일.
+    """
+    batch_size = max(1, int(batch_size))
+    # (plan 번호, 후보 번호) 를 전역 순서로 펼친 뒤 batch_size 씩 잘라서 계산
+    flat = [(k, i) for k, plan in enumerate(plans) for i in range(len(plan.candidates))]
+    probs = [np.zeros((len(plan.candidates),), dtype=np.float32) for plan in plans]
+    calls = 0
+    timer = StageTimer()  # 공유 배치 추론 시간은 녹음별로 나눌 수 없어 배치 diag 에
+    _sidecar_stats(model)
+    for b in range(0, len(flat), batch_size):
+        chunk = flat[b : b + batch_size]
+        xs = []
+        for k in sorted({k for k, _ in chunk}):
+            idx = [i for kk, i in chunk if kk == k]
+            xs.append(plans[k].features([plans[k].candidates[i] for i in idx]))
+        with timer.stage("predict"):
+            yb = ff.predict_filler_probs(model, np.concatenate(xs, axis=0), batch_size)
+        calls += 1
+        for (k, i), p0 in zip(chunk, yb):
+            probs[k][i] = p0
+    inference = {
+        "backend": getattr(model, "backend_name", "keras"),
+        "mode": "shared_batch",
+        "max_batch_size": batch_size,
+        "calls": calls,
+        "recordings": len(plans),
+        "windows": len(flat),
+        "timings": timer.to_dict(),
+    }
+    server = _sidecar_stats(model)
+    if server is not None:
+        inference["server"] = server
+    return probs, inference
+
+
+def split_window_plan(plan: WindowPlan, max_chunks: int) -> List[Tuple[int, int]]:
+    """청크 분할 분석용으로 plan.candidates 를 나눔 (split_candidates)"""
+    return split_candidates(len(plan.candidates), max_chunks)
+
+
+def split_candidates(total: int, max_chunks: int) -> List[Tuple[int, int]]:
+    """
+    후보 total 개를 크기가 고른 최대 max_chunks 개의 연속 범위 [i, j) 로 나눔
+    (청크 크기 ~ total / max_chunks, 풀 워커마다 한 청크).
+    윈도우 확률은 행(윈도우)마다 따로 계산되므로 경계를 모델 배치(infer_batch_size)에
+    맞추지 않는다. 배치 구성이 한 번에 계산할 때와 달라져 생기는 차이는 행별 float 오차
+    수준이다 (bench_analysis --impl chunked 가 단일 실행과의 결과 차이를 확인).
+    """
+    if total <= 0:
+        return []
+    n = max(1, min(int(max_chunks), total))
+    bounds = [k * total // n for k in range(n + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(n)]
 
-    # 3. neighbor merge
-    def _has_support(c, pool) -> bool:
-        for d in pool:
-            if d is c:
-                continue
-            if (
-                ff.iou((c["s"], c["e"]), (d["s"], d["e"])) >= ff.NEIGHBOR_IOU_MIN
-                and d["p"] >= ff.NEIGHBOR_SUPPORT_THR
-            ):
-                return True
-        return False
 
-    cands = rows
-    tmp = []
-    for c in cands:
-        if c["p"] >= ff.STRICT_PASS or _has_support(c, cands):
-            tmp.append(c)
-    cands = tmp
-    cands = sorted(cands, key=lambda r: r["p"], reverse=True)
-    kept = []
-    for c in cands:
-        if all(ff.iou((c["s"], c["e"]), (k["s"], k["e"])) < ff.NMS_IOU for k in kept):
-            kept.append(c)
+def plan_state(plan: WindowPlan) -> Dict[str, Any]:
+    """
+    풀 워커에서 만든 plan 중 요청 프로세스로 돌려줄 부분 (PCM / MFCC 엔진은 빼고).
+    restore_plan 으로 요청 프로세스의 PCM 과 합쳐 다시 WindowPlan 을 만든다
+    """
+    return {
+        "speech": (plan.speech_iv.s, plan.speech_iv.e),
+        "candidates": plan.candidates,
+        "drop": plan.drop,
+        "total_windows": plan.total_windows,
+        "timings": plan.timer.to_dict(),
+    }
 
-    def _merge_kept(kept: list[dict], max_gap: int = 80) -> list[dict]:
-        if not kept:
-            return kept
-        kept = sorted(kept, key=lambda r: (r["s"], r["e"]))
-        out = [dict(kept[0])]
-        for c in kept[1:]:
-            last = out[-1]
-            # 겹치거나, gap이 max_gap 이하이면 합치기
-            if c["s"] <= last["e"] + max_gap:
-                last["e"] = max(last["e"], c["e"])
-                last["dur_ms"] = last["e"] - last["s"]
-                last["p"] = max(last["p"], c["p"])  # 최고 확률 유지
-            else:
-                out.append(dict(c))
-        return out
 
-    kept = _merge_kept(kept, max_gap=80)
-    filler_iv = merge_iv([(r["s"], r["e"]) for r in kept])
+def restore_plan(
+    pcm: np.ndarray,
+    state: Dict[str, Any],
+    segmentation: str,
+    params: Dict[str, Any] | None,
+    gain_db: float,
+) -> WindowPlan:
+    """plan_state 결과 + 같은 녹음의 pcm -> plan_filler_windows 와 같은 WindowPlan"""
+    p = params or {}
+    full = PcmBuffer.from_pcm16(pcm, ff.TARGET_SR)
+    timer = StageTimer()
+    timer.merge(state["timings"])
+    return WindowPlan(
+        full=full,
+        speech_iv=IntervalSet.from_arrays(*state["speech"]),
+        candidates=state["candidates"],
+        drop=state["drop"],
+        total_windows=state["total_windows"],
+        segmentation=segmentation,
+        gain_db=gain_db,
+        params=p,
+        engine=(
+            MfccEngine(full.samples) if p.get("mfcc_engine", ff.MFCC_ENGINE) else None
+        ),
+        timer=timer,
+    )
 
-    # 4. 집계
-    T = len(full)
 
-    speech_ms = sum_iv(speech_iv)
-    filler_ms = sum_iv(filler_iv)
-    speech_wo_filler_iv = subtract_iv(speech_iv, filler_iv)  # speech - filler
-    speech_wo_filler_ms = sum_iv(speech_wo_filler_iv)
-    silence_iv = complement_iv(speech_iv, T)
-    silence_ms = sum_iv(silence_iv)
+def chunk_window_plan(
+    pcm: np.ndarray,
+    offset_ms: int,
+    candidates: List[Tuple[int, int, int]],
+    params: Dict[str, Any] | None = None,
+) -> WindowPlan:
+    """
+    녹음의 [offset_ms, ...) 구간 PCM 과 그 안의 candidates(녹음 전체 기준 ms) 로
+    점수 계산만 할 WindowPlan (풀 워커용. 분할 / 필터 결과는 요청 프로세스에 있음).
+    윈도우 특징은 윈도우 안 샘플에만 의존하므로, 구간이 윈도우를 모두 덮으면
+    녹음 전체로 계산한 값과 같다. 구간 끝이 녹음 끝이면 끝 클램프도 같다.
+    """
+    p = params or {}
+    full = PcmBuffer.from_pcm16(pcm, ff.TARGET_SR)
+    return WindowPlan(
+        full=full,
+        speech_iv=IntervalSet(),
+        candidates=[(ws - offset_ms, we - offset_ms, d) for ws, we, d in candidates],
+        drop={},
+        total_windows=len(candidates),
+        segmentation="",
+        gain_db=0.0,
+        params=p,
+        engine=(
+            MfccEngine(full.samples) if p.get("mfcc_engine", ff.MFCC_ENGINE) else None
+        ),
+    )
 
-    # 추가 지표
-    # 긴 침묵
-    LONG_PAUSE_MS = 1500
-    long_pauses = [iv for iv in silence_iv if (iv.e - iv.s) >= LONG_PAUSE_MS]
-    long_pauses_count = len(long_pauses)
-    longest_pause_ms = max((iv.e - iv.s) for iv in long_pauses) if long_pauses else 0
-    long_pauses_per_min = (long_pauses_count / (T / 60000)) if T > 0 else 0.0
-
-    def _overlap_ms(iv, seg):
-        return max(0, min(iv.e, seg[1]) - max(iv.s, seg[0]))
-
-    # 침묵 분포 (3등분)
-    thirds = [(0, T // 3), (T // 3, 2 * T // 3), (2 * T // 3, T)]
-    head = sum(_overlap_ms(iv, thirds[0]) for iv in silence_iv)
-    body = sum(_overlap_ms(iv, thirds[1]) for iv in silence_iv)
-    tail = sum(_overlap_ms(iv, thirds[2]) for iv in silence_iv)
-    pause_distribution = {
-        "head": head / 1000.0,
-        "body": body / 1000.0,
-        "tail": tail / 1000.0,
+
+def chunk_result(plan: WindowPlan, probs: np.ndarray) -> Dict[str, Any]:
+    """풀 워커가 돌려줄 청크 결과 {"probs", "timings", "frames_computed", "frames_reused"}"""
+    plan.release_features()
+    engine = plan.engine
+    return {
+        "probs": probs,
+        "timings": plan.timer.to_dict(),
+        "frames_computed": engine.frames_computed if engine else None,
+        "frames_reused": engine.frames_reused if engine else None,
     }
 
-    phrase_durs = [i.e - i.s for i in speech_iv]
-    avg_phrase_sec = (float(np.mean(phrase_durs)) / 1000.0) if phrase_durs else 0.0
-    phrase_len_sd = (float(np.std(phrase_durs)) / 1000.0) if phrase_durs else 0.0
 
-    fillers_per_min = (len(filler_iv) / (T / 60000)) if T > 0 else 0.0
-    speech_density = (speech_wo_filler_ms / T) if T > 0 else 0.0
+def score_window_chunk(
+    pcm: np.ndarray,
+    offset_ms: int,
+    candidates: List[Tuple[int, int, int]],
+    model,
+    params: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    청크 분할 분석의 워커 쪽: chunk_window_plan 의 점수 계산.
+    chunk_result 에 "inference" 를 더한 dict
+    """
+    plan = chunk_window_plan(pcm, offset_ms, candidates, params)
+    probs, inference = score_window_plan(plan, model)
+    return {**chunk_result(plan, probs), "inference": inference}
+
+
+def _overlap_pairs(s: np.ndarray, e: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    시간상 겹치는 (i, j) 쌍 전부 (i != j). IoU 임계값이 양수이면 겹치지 않는 쌍은
+    볼 필요가 없으므로, 시작 기준 정렬 후 [s_i - 최대길이, e_i) 안에서 시작하는 후보만 본다.
+    """
+    n = len(s)
+    if n < 2:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    by_s = np.argsort(s, kind="stable")
+    ss = s[by_s]
+    span = int((e - s).max())
+    lo = np.searchsorted(ss, s - span, side="right")
+    hi = np.searchsorted(ss, e, side="left")
+    cnt = np.maximum(0, hi - lo)
+    i = np.repeat(np.arange(n), cnt)
+    offs = np.arange(int(cnt.sum())) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    j = by_s[np.repeat(lo, cnt) + offs]
+    ok = (i != j) & (np.minimum(e[i], e[j]) > np.maximum(s[i], s[j]))
+    return i[ok], j[ok]
+
+
+def _iou_pairs(s, e, i, j) -> np.ndarray:
+    """ff.iou 와 같은 식 (정수 교집합 / 합집합 -> float64 나눗셈)"""
+    inter = np.maximum(0, np.minimum(e[i], e[j]) - np.maximum(s[i], s[j]))
+    union = (e[i] - s[i]) + (e[j] - s[j]) - inter
+    return np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+
+
+def _neighbor_support(s, e, p) -> np.ndarray:
+    """후보마다: IoU >= NEIGHBOR_IOU_MIN 이고 p >= NEIGHBOR_SUPPORT_THR 인 다른 후보가 있는지"""
+    strong = p >= ff.NEIGHBOR_SUPPORT_THR
+    if ff.NEIGHBOR_IOU_MIN <= 0:
+        # 겹치지 않아도(IoU 0) 지지 조건을 만족하므로 자기 자신 외 강한 후보가 있으면 됨
+        n_strong = int(strong.sum())
+        return (n_strong - strong.astype(np.int64)) > 0
+    i, j = _overlap_pairs(s, e)
+    ok = strong[j] & (_iou_pairs(s, e, i, j) >= ff.NEIGHBOR_IOU_MIN)
+    out = np.zeros(len(s), dtype=bool)
+    out[i[ok]] = True
+    return out
 
-    silence_per_duration = (silence_ms / T) if T > 0 else 0.0
-    silence_per_speech = (silence_ms / speech_ms) if speech_ms > 0 else 0.0
-    sil_plus_filler_per_speech_wo_filler = (
-        ((silence_ms + filler_ms) / speech_wo_filler_ms)
-        if speech_wo_filler_ms > 0
-        else None
-    )
 
-    return {
-        "duration_ms": T,
-        "speech_ms": speech_ms,
-        "silence_ms": silence_ms,
-        "filler_ms": filler_ms,
-        "speech_wo_filler_ms": speech_wo_filler_ms,
-        "ratios": {
-            "silence_per_duration": silence_per_duration,
-            "silence_per_speech": silence_per_speech,
-            "silence_plus_filler_per_speech_wo_filler": sil_plus_filler_per_speech_wo_filler,
-            "filler_ratio": (filler_ms / speech_ms) if speech_ms > 0 else 0.0,
-            "speech_density": speech_density,
-        },
-        "fluency": {"fillers_per_min": fillers_per_min},
-        "pause_hygiene": {
-            "long_pauses_count": long_pauses_count,
-            "longest_pause_ms": longest_pause_ms,
-            "long_pauses_per_min": long_pauses_per_min,
-            "pause_distribution": pause_distribution,
-            "avg_phrase_sec": avg_phrase_sec,
-            "phrase_len_sd": phrase_len_sd,
-        },
-        "intervals": {
-            "speech": [{"s": i.s, "e": i.e} for i in speech_iv],
-            "filler": [{"s": i.s, "e": i.e} for i in filler_iv],
-            "silence": [{"s": i.s, "e": i.e} for i in silence_iv],
-            "speech_wo_filler": [{"s": i.s, "e": i.e} for i in speech_wo_filler_iv],
-        },
-        "diag": {
-            "total_windows": total_windows,
-            "drops": drop,
-            "pre_nms_candidates": len(rows),
-            "post_nms_kept": len(kept),
-            "segmentation_mode": segmentation,
-            "gain_db": gain,
-        },
-    }
+def _nms_order(s, e, p, iou_thr: float) -> np.ndarray:
+    """
+    확률 내림차순(동률은 원래 순서) greedy NMS 로 남는 후보 인덱스 (남은 순서대로).
+    이미 남긴 후보와 IoU >= iou_thr 인 후보는 버린다. 충돌 쌍은 겹치는 이웃 사이에서만
+    미리 벡터로 구해 두고, greedy 순회는 남길 때 그 이웃들을 지우기만 한다.
+    """
+    n = len(s)
+    order = np.argsort(-p, kind="stable")
+    if n == 0:
+        return order
+    if iou_thr <= 0:
+        # 모든 쌍이 충돌 (IoU >= 0): 첫 후보만 남음
+        return order[:1]
+    i, j = _overlap_pairs(s, e)
+    hit = _iou_pairs(s, e, i, j) >= iou_thr
+    i, j = i[hit], j[hit]
+    # CSR 형태 이웃 목록
+    by_i = np.argsort(i, kind="stable")
+    nbr = j[by_i]
+    ptr = np.concatenate(([0], np.cumsum(np.bincount(i, minlength=n))))
+    suppressed = np.zeros(n, dtype=bool)
+    kept = []
+    for c in order.tolist():
+        if suppressed[c]:
+            continue
+        kept.append(c)
+        suppressed[nbr[ptr[c] : ptr[c + 1]]] = True
+    return np.asarray(kept, dtype=np.int64)
+
+
+def _merge_kept(s: np.ndarray, e: np.ndarray, max_gap: int = 80):
+    """(s, e) 정렬 후, 겹치거나 gap 이 max_gap 이하인 후보를 합침 -> (s 배열, e 배열)"""
+    if len(s) == 0:
+        return s, e
+    order = np.lexsort((e, s))
+    s, e = s[order], e[order]
+    reach = np.maximum.accumulate(e)
+    start = np.ones(len(s), dtype=bool)
+    start[1:] = s[1:] > reach[:-1] + max_gap
+    first = np.flatnonzero(start)
+    return s[first], np.maximum.reduceat(e, first)
+
+
+def finish_filler_analysis(
+    plan: WindowPlan,
+    probs: np.ndarray,
+    inference: Dict[str, Any],
+    progress: Callable[..., None] | None = None,
+) -> Dict[str, Any]:
+    """3. 후보 정리(neighbor support / NMS / 병합) + 4. 집계"""
+    report = progress or (lambda *a, **k: None)
+    # 모델 점수는 이미 나왔으므로 특징용 버퍼는 여기서 놓음
+    plan.release_features()
+    full = plan.full
+    speech_iv = plan.speech_iv
+    segmentation = plan.segmentation
+    gain = plan.gain_db
+    engine = plan.engine
+    total_windows = plan.total_windows
+    drop = dict(plan.drop)
+
+    # 후보를 열 배열 (s, e, p) 로. p 는 기존과 같이 소수 6자리로 반올림한 값
+    cand = np.asarray([(ws, we) for ws, we, _ in plan.candidates], dtype=np.int64)
+    cand = cand.reshape(-1, 2)
+    probs = np.asarray(probs, dtype=np.float64)
+    passed = probs >= ff.THR
+    drop["low_prob"] += int(len(probs) - passed.sum())
+    cs, ce = cand[passed, 0], cand[passed, 1]
+    cp = np.array([round(x, 6) for x in probs[passed].tolist()], dtype=np.float64)
+    n_rows = len(cs)
+
+    # 3. neighbor support -> NMS -> 인접 병합
+    timer = plan.timer
+    with timer.stage("nms"):
+        keep = (cp >= ff.STRICT_PASS) | _neighbor_support(cs, ce, cp)
+        cs, ce, cp = cs[keep], ce[keep], cp[keep]
+        order = _nms_order(cs, ce, cp, ff.NMS_IOU)
+        kept_s, kept_e = _merge_kept(cs[order], ce[order], max_gap=80)
+        filler_iv = IntervalSet.from_arrays(kept_s, kept_e)
+
+    # 4. 집계 (구간 연산은 IntervalSet 배열 sweep 으로)
+    report("aggregation", 0.0)
+    with timer.stage("aggregation"):
+        T = len(full)
+
+        speech_ms = speech_iv.total()
+        filler_ms = filler_iv.total()
+        speech_wo_filler_iv = speech_iv.subtract(filler_iv)  # speech - filler
+        speech_wo_filler_ms = speech_wo_filler_iv.total()
+        silence_iv = speech_iv.complement(T)
+        silence_ms = silence_iv.total()
+
+        # 추가 지표
+        # 긴 침묵
+        LONG_PAUSE_MS = 1500
+        pause_lens = silence_iv.lengths()
+        long_pauses = pause_lens[pause_lens >= LONG_PAUSE_MS]
+        long_pauses_count = len(long_pauses)
+        longest_pause_ms = int(long_pauses.max()) if long_pauses_count else 0
+        long_pauses_per_min = (long_pauses_count / (T / 60000)) if T > 0 else 0.0
+
+        # 침묵 분포 (3등분)
+        head, body, tail = silence_iv.overlap_bins([0, T // 3, 2 * T // 3, T]).tolist()
+        pause_distribution = {
+            "head": head / 1000.0,
+            "body": body / 1000.0,
+            "tail": tail / 1000.0,
+        }
+
+        phrase_durs = speech_iv.lengths().tolist()
+        avg_phrase_sec = (float(np.mean(phrase_durs)) / 1000.0) if phrase_durs else 0.0
+        phrase_len_sd = (float(np.std(phrase_durs)) / 1000.0) if phrase_durs else 0.0
+
+        fillers_per_min = (len(filler_iv) / (T / 60000)) if T > 0 else 0.0
+        speech_density = (speech_wo_filler_ms / T) if T > 0 else 0.0
+
+        silence_per_duration = (silence_ms / T) if T > 0 else 0.0
+        silence_per_speech = (silence_ms / speech_ms) if speech_ms > 0 else 0.0
+        sil_plus_filler_per_speech_wo_filler = (
+            ((silence_ms + filler_ms) / speech_wo_filler_ms)
+            if speech_wo_filler_ms > 0
+            else None
+        )
+
+        result = {
+            "duration_ms": T,
+            "speech_ms": speech_ms,
+            "silence_ms": silence_ms,
+            "filler_ms": filler_ms,
+            "speech_wo_filler_ms": speech_wo_filler_ms,
+            "ratios": {
+                "silence_per_duration": silence_per_duration,
+                "silence_per_speech": silence_per_speech,
+                "silence_plus_filler_per_speech_wo_filler": sil_plus_filler_per_speech_wo_filler,
+                "filler_ratio": (filler_ms / speech_ms) if speech_ms > 0 else 0.0,
+                "speech_density": speech_density,
+            },
+            "fluency": {"fillers_per_min": fillers_per_min},
+            "pause_hygiene": {
+                "long_pauses_count": long_pauses_count,
+                "longest_pause_ms": longest_pause_ms,
+                "long_pauses_per_min": long_pauses_per_min,
+                "pause_distribution": pause_distribution,
+                "avg_phrase_sec": avg_phrase_sec,
+                "phrase_len_sd": phrase_len_sd,
+            },
+            "intervals": {
+                "speech": speech_iv.to_dicts(),
+                "filler": filler_iv.to_dicts(),
+                "silence": silence_iv.to_dicts(),
+                "speech_wo_filler": speech_wo_filler_iv.to_dicts(),
+            },
+            "diag": {
+                "total_windows": total_windows,
+                "drops": drop,
+                "pre_nms_candidates": n_rows,
+                "post_nms_kept": len(kept_s),
+                "segmentation_mode": segmentation,
+                "gain_db": gain,
+                "inference": inference,
+                "features": {
+                    "engine": engine is not None,
+                    "frames_computed": engine.frames_computed if engine else None,
+                    "frames_reused": engine.frames_reused if engine else None,
+                },
+            },
+        }
+    result["diag"]["timings"] = timer.to_dict()
+    return result
@@ -0,0 +1,175 @@
+"""
+윈도우별 MFCC 입력을 녹음 전체 기준으로 한 번만 계산해서 잘라 쓰는 엔진.
+
+func_filler.extract_x 는 윈도우마다 wav export -> librosa.load -> mfcc 를 반복한다.
+320ms 윈도우 / 80ms hop 이면 같은 STFT 프레임을 약 4번씩 다시 계산하게 된다.
+
+여기서는
+  1) 정규화된 int16 신호를 그대로 들고, 꺼낸 프레임만 float32 로 변환하고
+     (녹음 전체 float32 사본을 만들지 않음. float32 배열을 넘겨도 됨)
+  2) 윈도우 안에 완전히 들어가는 프레임(interior)은 절대 샘플 위치 기준으로
+     한 번만 계산해서 캐시하고(겹치는 윈도우끼리 공유)
+  3) 윈도우 경계에 걸치는 프레임(edge)만 librosa 와 똑같이 0 패딩해서 계산한다.
+  4) power_to_db(top_db=80) 는 윈도우 단위 최대값 기준이므로 윈도우별로 적용 후 DCT.
+
+librosa.feature.mfcc(y=seg, sr=16000, n_mfcc=20) 와 같은 정의(hann, n_fft=2048,
+hop=512, center=True, pad_mode='constant', mel 128, slaney norm, DCT-II ortho)를
+그대로 따르므로 결과 차이는 float32 반올림 수준이다.
+허용 오차(문서화): MFCC 값 기준 atol=1e-3 (dB 스케일, 일반적인 값 범위는 -600~+200).
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import librosa
+import scipy.fft
+import scipy.signal
+
+import func_filler as ff
+
+N_MFCC = 20
+T_LEN = 40
+N_FFT = 2048
+HOP = 512
+N_MELS = 128
+AMIN = 1e-10
+TOP_DB = 80.0
+
+# 한 번에 만들어 FFT 할 프레임 수. 프레임 행렬(float64) + rfft(complex128) 가
+# 256 x 2048 x (8 + 8)B ≈ 8MB 를 넘지 않게 (후보가 많은 긴 녹음에서도 고정 상한)
+FRAME_CHUNK = 256
+
+
+def pcm16_to_float32(pcm: np.ndarray) -> np.ndarray:
+    """int16 PCM -> [-1, 1) float32 (librosa.load 와 동일한 스케일)"""
+    return pcm.astype(np.float32) / 32768.0
+
+
+class MfccEngine:
+    def __init__(self, y: np.ndarray, sr: int = ff.TARGET_SR):
+        if y.dtype != np.int16:
+            y = np.ascontiguousarray(y, dtype=np.float32)
+        self.y = y
+        self.sr = sr
+        self.half = N_FFT // 2
+        self._window = scipy.signal.get_window("hann", N_FFT, fftbins=True)
+        self._mel = librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=N_MELS)
+        self._cache: Dict[int, np.ndarray] = {}  # 프레임 시작 샘플 -> mel power (128,)
+        self.frames_computed = 0
+        self.frames_reused = 0
+
+    @classmethod
+    def from_segment(cls, seg) -> "MfccEngine":
+        """16k/mono/16bit AudioSegment 에서 바로 생성"""
+        pcm = np.frombuffer(seg.raw_data, dtype=np.int16)
+        return cls(pcm16_to_float32(pcm), sr=seg.frame_rate)
+
+    # ---------------------------------------------------------------
+    def _float(self, x: np.ndarray) -> np.ndarray:
+        """꺼낸 샘플 -> [-1, 1) float32 (pcm16_to_float32 와 같은 값)"""
+        if x.dtype != np.int16:
+            return x
+        out = x.astype(np.float32)
+        out /= 32768.0
+        return out
+
+    def _mel_power(self, frames: np.ndarray) -> np.ndarray:
+        """(K, N_FFT) -> (K, N_MELS) mel power"""
+        out = []
+        for i in range(0, len(frames), FRAME_CHUNK):
+            spec = np.fft.rfft(frames[i : i + FRAME_CHUNK] * self._window, axis=-1)
+            power = (np.abs(spec) ** 2).astype(np.float32)
+            out.append(power @ self._mel.T)
+        return np.concatenate(out, axis=0) if out else np.zeros((0, N_MELS), np.float32)
+
+    def _interior(self, starts: np.ndarray) -> np.ndarray:
+        """신호 안에 완전히 들어가는 프레임들의 mel power (캐시 사용)"""
+        missing = np.array(
+            sorted({int(s) for s in starts if int(s) not in self._cache}),
+            dtype=np.int64,
+        )
+        self.frames_reused += len(starts) - len(missing)
+        if len(missing):
+            # 프레임 행렬은 복사 없는 view 에서 FRAME_CHUNK 개씩만 꺼냄
+            # (전체 프레임 x N_FFT int64 인덱스 행렬을 만들지 않음)
+            view = np.lib.stride_tricks.sliding_window_view(self.y, N_FFT)
+            for i in range(0, len(missing), FRAME_CHUNK):
+                part = missing[i : i + FRAME_CHUNK]
+                for s, col in zip(
+                    part.tolist(), self._mel_power(self._float(view[part]))
+                ):
+                    self._cache[s] = col
+            self.frames_computed += len(missing)
+        return np.stack([self._cache[int(s)] for s in starts]) if len(starts) else None
+
+    def _edge(self, specs: List[Tuple[int, int, int]]) -> np.ndarray:
+        """(윈도우 시작 샘플, 윈도우 길이, 프레임 중심 오프셋) -> 0 패딩 프레임 mel power"""
+        if not specs:
+            return np.zeros((0, N_MELS), np.float32)
+        if len(specs) > FRAME_CHUNK:
+            return np.concatenate(
+                [
+                    self._edge(specs[i : i + FRAME_CHUNK])
+                    for i in range(0, len(specs), FRAME_CHUNK)
+                ],
+                axis=0,
+            )
+        a = np.array([s[0] for s in specs], dtype=np.int64)[:, None]
+        n = np.array([s[1] for s in specs], dtype=np.int64)[:, None]
+        c = np.array([s[2] for s in specs], dtype=np.int64)[:, None]
+        rel = c - self.half + np.arange(N_FFT)[None, :]  # 윈도우 기준 샘플 위치
+        inside = (rel >= 0) & (rel < n)
+        idx = np.clip(a + rel, 0, max(0, len(self.y) - 1))
+        frames = np.where(inside, self._float(self.y[idx]) if len(self.y) else 0.0, 0.0)
+        self.frames_computed += len(specs)
+        return self._mel_power(frames.astype(np.float32))
+
+    def release(self):
+        """신호 / 프레임 캐시를 놓음 (frames_* 통계는 유지). 이후 windows_x 는 쓸 수 없다"""
+        self.y = self.y[:0]
+        self._cache = {}
+
+    # ---------------------------------------------------------------
+    def windows_x(self, windows: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """[(s_ms, e_ms), ...] -> (N, 20, 40, 1) 모델 입력"""
+        if not windows:
+            return np.zeros((0, N_MFCC, T_LEN, 1), dtype=np.float32)
+
+        per_ms = self.sr // 1000
+        total = len(self.y)
+        total_ms = round(1000 * total / self.sr)
+        layout = []  # 윈도우별 [(kind, key)] ; kind 0=interior(start), 1=edge(index)
+        interior_starts: List[int] = []
+        edge_specs: List[Tuple[int, int, int]] = []
+        for s, e in windows:
+            e = min(e, total_ms)  # slice_ms 와 동일하게 끝 클램프
+            a = max(0, s) * per_ms
+            b = min(total, e * per_ms)
+            # AudioSegment 슬라이스처럼 신호 끝을 넘는 부분은 0 으로 본다
+            n = max(0, e * per_ms - a)
+            n_frames = 1 + n // HOP
+            cols = []
+            for j in range(n_frames):
+                c = j * HOP
+                if c >= self.half and c + self.half <= n and a + c + self.half <= b:
+                    cols.append((0, len(interior_starts)))
+                    interior_starts.append(a + c - self.half)
+                else:
+                    cols.append((1, len(edge_specs)))
+                    edge_specs.append((a, min(n, b - a), c))
+            layout.append(cols)
+
+        inter = self._interior(np.array(interior_starts, dtype=np.int64))
+        edge = self._edge(edge_specs)
+
+        xs = np.zeros((len(windows), N_MFCC, T_LEN, 1), dtype=np.float32)
+        for w, cols in enumerate(layout):
+            S = np.stack(
+                [inter[k] if kind == 0 else edge[k] for kind, k in cols], axis=1
+            )  # (128, T)
+            log_spec = 10.0 * np.log10(np.maximum(AMIN, S))
+            log_spec = np.maximum(log_spec, log_spec.max() - TOP_DB)
+            mfcc = scipy.fft.dct(log_spec, axis=0, type=2, norm="ortho")[:N_MFCC]
+            t = min(T_LEN, mfcc.shape[1])
+            xs[w, :, :t, 0] = mfcc[:, :t]
+        return xs
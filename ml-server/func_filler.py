@@ -7,6 +7,8 @@ from pydub import AudioSegment
 from pydub.silence import detect_nonsilent
 import numpy as np
 
+from pcm_buffer import PcmBuffer
+
 TARGET_SR = 16000
 TARGET_CH = 1
 TARGET_SW = 2  # 16-bit
@@ -18,11 +20,17 @@ MIN_SIL_MS = 120
 FILLER_IDX = 0
 THR = 0.72  # ↑ 살짝 상향
 
+# -------------------- inference --------------------
+BATCH_INFER = True  # 필터 통과 윈도우를 모아서 한 번에 predict
+INFER_BATCH_SIZE = 256  # 한 번의 predict 호출에 넣을 최대 윈도우 수
+MFCC_ENGINE = True  # 녹음 단위 MFCC 엔진 사용 (False면 윈도우마다 extract_x)
+
 # -------------------- VAD / context filters --------------------
 USE_VAD = True
 VAD_AGGR = 2
 VAD_FRAME_MS = 20
 VAD_REQ_RATIO = 0.45  # 유성 비율 55% 이상만 통과
+VAD_BITMAP = True  # 윈도우 필터에 녹음 전체 VAD 비트맵 재사용 (vad 분할은 기본 off)
 
 USE_QUIET_CONTEXT = True  # ★ 켜기
 CTX_PRE_MS = 150
@@ -52,6 +60,13 @@ _vad = webrtcvad.Vad(VAD_AGGR)
 
 
 def ensure_format(seg: AudioSegment) -> AudioSegment:
+    if isinstance(seg, PcmBuffer):
+        # PcmBuffer 는 항상 mono/16bit, 샘플레이트만 확인
+        if seg.frame_rate != TARGET_SR:
+            raise ValueError(
+                f"PcmBuffer frame_rate={seg.frame_rate} (기대값 {TARGET_SR})"
+            )
+        return seg
     return (
         seg.set_frame_rate(TARGET_SR)
         .set_channels(TARGET_CH)
@@ -78,9 +93,20 @@ def detect_speech_intervals_vad(
     min_speech_ms: int,  # 이보다 짧은 구간은 제거
     hangover_ms: int,  # 말끝 무음 허용(꼬리 달기)
     max_merge_gap_ms: int,  # 가까운 구간 병합
+    vad_index=None,  # 같은 frame_ms/aggr 로 미리 계산된 VadIndex (있으면 재사용)
 ):
-    vad = webrtcvad.Vad(aggr)
-    frames = list(_iter_pcm_frames(audio, frame_ms))
+    if (
+        vad_index is not None
+        and vad_index.frame_ms == frame_ms
+        and vad_index.aggr == aggr
+    ):
+        frames = vad_index.frames()
+    else:
+        vad = webrtcvad.Vad(aggr)
+        frames = [
+            (fs, fe, vad.is_speech(raw, TARGET_SR))
+            for fs, fe, raw in _iter_pcm_frames(audio, frame_ms)
+        ]
     if not frames:
         return []
 
@@ -92,8 +118,7 @@ def detect_speech_intervals_vad(
     min_frames = max(1, min_speech_ms // frame_ms)
 
     ivs = []
-    for fs, fe, raw in frames:
-        is_speech = vad.is_speech(raw, TARGET_SR)
+    for fs, fe, is_speech in frames:
         if is_speech:
             silent_run = 0
             if not active:
@@ -131,14 +156,53 @@ def detect_speech_intervals_vad(
     return [(int(s), int(e)) for s, e in merged]
 
 
-def detect_speech_intervals(audio: AudioSegment) -> List[Tuple[int, int]]:
-    ivs = detect_nonsilent(
-        audio, min_silence_len=MIN_SIL_MS, silence_thresh=SILENCE_THRESH_DBFS
-    )
+def _detect_nonsilent_energy(energy, min_silence_len: int, silence_thresh: float):
+    """pydub.silence.detect_nonsilent(seek_step=1) 와 같은 결과를 누적합으로 계산"""
+    seg_len = len(energy)
+    if seg_len < min_silence_len:
+        return [[0, seg_len]]
+    thresh = (10 ** (silence_thresh / 20)) * energy.max_amp
+    starts = np.arange(0, seg_len - min_silence_len + 1, dtype=np.int64)
+    silent = starts[energy.rms_many(starts, starts + min_silence_len) <= thresh]
+    if silent.size == 0:
+        return [[0, seg_len]]
+
+    # 연속(=step 1)이 끊기고 min_silence_len 보다 떨어진 곳에서 무음 구간을 나눈다
+    brk = np.nonzero(np.diff(silent) > min_silence_len)[0]
+    first = np.concatenate(([silent[0]], silent[brk + 1]))
+    last = np.concatenate((silent[brk], [silent[-1]]))
+    silent_ranges = [[int(a), int(b) + min_silence_len] for a, b in zip(first, last)]
+
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == seg_len:
+        return []
+    prev_end_i = 0
+    out = []
+    for start_i, end_i in silent_ranges:
+        out.append([prev_end_i, start_i])
+        prev_end_i = end_i
+    if end_i != seg_len:
+        out.append([prev_end_i, seg_len])
+    if out[0] == [0, 0]:
+        out.pop(0)
+    return out
+
+
+def detect_speech_intervals(audio: AudioSegment, energy=None) -> List[Tuple[int, int]]:
+    if energy is not None:
+        ivs = _detect_nonsilent_energy(energy, MIN_SIL_MS, SILENCE_THRESH_DBFS)
+    else:
+        ivs = detect_nonsilent(
+            audio, min_silence_len=MIN_SIL_MS, silence_thresh=SILENCE_THRESH_DBFS
+        )
     return [(int(s), int(e)) for (s, e) in ivs]
 
 
-def _frame_dbfs_series(audio: AudioSegment, frame_ms: int = 30) -> np.ndarray:
+def _frame_dbfs_series(
+    audio: AudioSegment, frame_ms: int = 30, energy=None
+) -> np.ndarray:
+    if energy is not None:
+        # 누적합 인덱스로 모든 프레임을 한 번에 계산
+        return energy.frame_dbfs(frame_ms)
     step = int(frame_ms)
     vals = []
     for s in range(0, len(audio), step):
@@ -155,8 +219,9 @@ def compute_adaptive_params(
     speech_pct: float = 95.0,
     sil_margin_db: float = 4.0,
     ctx_margin_db: float = 2.0,
+    energy=None,
 ):
-    db = _frame_dbfs_series(audio, frame_ms)
+    db = _frame_dbfs_series(audio, frame_ms, energy=energy)
     if db.size == 0:
         return {"silence_thresh": -35.0, "ctx_thresh": -38.0}
 
@@ -193,8 +258,13 @@ def detect_speech_intervals_adaptive(
     exit_margin_db: float,
     min_speech_ms: int,
     min_sil_ms: int,
+    energy=None,
 ):
-    p = compute_adaptive_params(audio, frame_ms=frame_ms)
+    if energy is not None:
+        # 녹음당 한 번 계산된 적응형 임계값을 공유
+        p = energy.adaptive_params(frame_ms)
+    else:
+        p = compute_adaptive_params(audio, frame_ms=frame_ms)
     base = p["silence_thresh"]  # 진입 기준의 베이스
     enter_th = base + enter_margin_db  # 말소리로 '들어갈' 때 임계
     exit_th = base + exit_margin_db  # 말소리에서 '나올' 때 임계
@@ -202,10 +272,16 @@ def detect_speech_intervals_adaptive(
     # 프레임 스캔
     step = frame_ms
     frames = []
-    for s in range(0, len(audio), step):
-        seg = audio[s : min(len(audio), s + step)]
-        db = seg.dBFS if seg.dBFS != float("-inf") else -100.0
-        frames.append((s, s + len(seg), db))
+    if energy is not None:
+        starts = list(range(0, len(energy), step))
+        ends = [min(len(energy), s + step) for s in starts]
+        dbs = energy.frame_dbfs(step).tolist() if starts else []
+        frames = list(zip(starts, ends, dbs))
+    else:
+        for s in range(0, len(audio), step):
+            seg = audio[s : min(len(audio), s + step)]
+            db = seg.dBFS if seg.dBFS != float("-inf") else -100.0
+            frames.append((s, s + len(seg), db))
     if not frames:
         return []
 
@@ -259,6 +335,22 @@ def sliding_windows(s: int, e: int, win: int = WIN_MS, hop: int = HOP_MS):
         i += hop
 
 
+def sliding_window_table(starts, ends, win: int = WIN_MS, hop: int = HOP_MS):
+    """
+    구간 배열마다 sliding_windows 를 펼친 (ws, we) 배열 (구간 순서, 구간 안에서는 시작 순).
+    구간 [s, e) 의 윈도우 수 K: 마지막 윈도우가 e 에 닿는 첫 k (e - s <= win 이면 1개)
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    span = ends - starts
+    k = np.where(span > 0, 1 + np.maximum(0, -(-(span - win) // hop)), 0)
+    iv = np.repeat(np.arange(len(starts)), k)
+    offs = np.arange(int(k.sum())) - np.repeat(np.cumsum(k) - k, k)
+    ws = starts[iv] + offs * hop
+    we = np.minimum(ends[iv], ws + win)
+    return ws, we
+
+
 def slice_ms(audio: AudioSegment, s: int, e: int) -> AudioSegment:
     s = max(0, s)
     e = min(len(audio), e)
@@ -267,14 +359,9 @@ def slice_ms(audio: AudioSegment, s: int, e: int) -> AudioSegment:
 
 def audio_to_pcm16(seg: AudioSegment) -> bytes:
     """Return raw 16k/mono/16bit little-endian PCM bytes."""
-    seg = ensure_format(seg)
-    buf = io.BytesIO()
-    seg.export(buf, format="wav")
-    wav = buf.getvalue()
-    # strip wav header to raw PCM for VAD
-    # (webrtcvad expects raw PCM)
-    # but easier: use pydub's raw_data (already PCM)
-    return seg.raw_data  # 16k/mono/16bit
+    # webrtcvad 는 raw PCM 을 받으므로 wav export 없이 raw_data 를 바로 사용
+    # (PcmBuffer 면 복사 없는 memoryview)
+    return ensure_format(seg).raw_data  # 16k/mono/16bit
 
 
 def vad_voiced_ratio(seg: AudioSegment) -> float:
@@ -345,7 +432,17 @@ def faster_is_quiet_context_adaptive(
     pre_ms: int = 150,
     post_ms: int = 150,
     ctx_thresh=None,
+    energy=None,
 ):
+    if energy is not None:
+        if ctx_thresh is None:
+            ctx_thresh = energy.adaptive_params(30)["ctx_thresh"]
+        pre_db = energy.dbfs(max(0, s - pre_ms), s)
+        post_db = energy.dbfs(e, min(len(energy), e + post_ms))
+        pre_db = pre_db if pre_db != float("-inf") else -100.0
+        post_db = post_db if post_db != float("-inf") else -100.0
+        return pre_db <= ctx_thresh or post_db <= ctx_thresh
+
     if ctx_thresh is None:
         ctx_thresh = compute_adaptive_params(full, frame_ms=30)["ctx_thresh"]
 
@@ -360,7 +457,36 @@ def faster_is_quiet_context_adaptive(
     return quiet(pre) or quiet(post)
 
 
-# --- MFCC(20x40) for binary model ---
+# 벡터 경로에서 log 계산(numpy vs math) 의 마지막 자리 차이로 임계값 판정이 뒤집히지
+# 않도록, 임계값에서 이 이내인 윈도우는 스칼라 함수로 다시 판정한다
+_TIE_DB = 1e-6
+
+
+def quiet_context_mask(
+    energy, s, e, ctx_thresh: float, pre_ms: int = 150, post_ms: int = 150
+) -> np.ndarray:
+    """faster_is_quiet_context_adaptive(energy=...) 를 윈도우 배열 전체에 (bool 배열)"""
+    s = np.asarray(s, dtype=np.int64)
+    e = np.asarray(e, dtype=np.int64)
+    pre_db = energy.dbfs_many(np.maximum(0, s - pre_ms), s)
+    post_db = energy.dbfs_many(e, np.minimum(len(energy), e + post_ms))
+    ok = (pre_db <= ctx_thresh) | (post_db <= ctx_thresh)
+    near = (np.abs(pre_db - ctx_thresh) < _TIE_DB) | (
+        np.abs(post_db - ctx_thresh) < _TIE_DB
+    )
+    for k in np.flatnonzero(near).tolist():
+        ok[k] = faster_is_quiet_context_adaptive(
+            None,
+            int(s[k]),
+            int(e[k]),
+            pre_ms,
+            post_ms,
+            ctx_thresh=ctx_thresh,
+            energy=energy,
+        )
+    return ok
+
+
 def pad2d(a: np.ndarray, t_len: int) -> np.ndarray:
     return (
         a[:, :t_len]
@@ -370,16 +496,35 @@ def pad2d(a: np.ndarray, t_len: int) -> np.ndarray:
 
 
 def extract_x(seg: AudioSegment) -> np.ndarray:
-    # seg -> wav bytes -> librosa load
-    buf = io.BytesIO()
-    ensure_format(seg).export(buf, format="wav")
-    y, _ = librosa.load(io.BytesIO(buf.getvalue()), sr=TARGET_SR, mono=True)
+    if isinstance(seg, PcmBuffer):
+        # 이미 16k/mono PCM 이므로 wav 왕복 없이 float32 로 변환
+        y = ensure_format(seg).to_float32()
+    else:
+        # seg -> wav bytes -> librosa load
+        buf = io.BytesIO()
+        ensure_format(seg).export(buf, format="wav")
+        y, _ = librosa.load(io.BytesIO(buf.getvalue()), sr=TARGET_SR, mono=True)
     mfcc = librosa.feature.mfcc(y=y, sr=TARGET_SR, n_mfcc=20)  # (20, T)
     feat = pad2d(mfcc, 40)  # (20, 40)
     x = np.expand_dims(feat, axis=(0, -1))  # (1, 20, 40, 1)
     return x
 
 
+def predict_filler_probs(
+    model, xs: np.ndarray, batch_size: int = INFER_BATCH_SIZE
+) -> np.ndarray:
+    """(N, 20, 40, 1) 입력 -> 윈도우별 filler 확률 (N,)"""
+    if len(xs) == 0:
+        return np.zeros((0,), dtype=np.float32)
+    batch_size = max(1, int(batch_size))
+    probs = []
+    for i in range(0, len(xs), batch_size):
+        # predict()는 호출마다 데이터셋/콜백 셋업 비용이 있어 predict_on_batch 사용
+        yb = np.asarray(model.predict_on_batch(xs[i : i + batch_size]))
+        probs.append(yb[:, FILLER_IDX])
+    return np.concatenate(probs).astype(np.float32)
+
+
 def iou(a: Tuple[int, int], b: Tuple[int, int]) -> float:
     s1, e1 = a
     s2, e2 = b
@@ -391,7 +536,10 @@ def iou(a: Tuple[int, int], b: Tuple[int, int]) -> float:
 # -------------------------------------------
 def rms_db(seg: AudioSegment) -> float:
     # 16-bit PCM 가정(TARGET_SW=2)
-    a = np.frombuffer(seg.raw_data, dtype=np.int16).astype(np.float32)
+    if isinstance(seg, PcmBuffer):
+        a = seg.samples.astype(np.float32)
+    else:
+        a = np.frombuffer(seg.raw_data, dtype=np.int16).astype(np.float32)
     if seg.channels > 1:
         a = a.reshape(-1, seg.channels).mean(axis=1)
     if a.size == 0:
@@ -401,20 +549,47 @@ def rms_db(seg: AudioSegment) -> float:
     return 20.0 * np.log10(rms + 1e-12)
 
 
-def energy_valley_ok(full: AudioSegment, s: int, e: int) -> bool:
+def energy_valley_ok(full: AudioSegment, s: int, e: int, energy=None) -> bool:
     # 중앙 구간
     mid = s + (e - s) // 2
     c_s = max(s, mid - ENERGY_CENTER_MS // 2)
     c_e = min(e, mid + ENERGY_CENTER_MS // 2)
-    center = slice_ms(full, c_s, c_e)
 
-    # 앞/뒤 경계 구간
-    pre = slice_ms(full, s - ENERGY_EDGE_MS, s)
-    post = slice_ms(full, e, e + ENERGY_EDGE_MS)
+    if energy is not None:
+        # slice_ms 와 같은 클램프 규칙으로 누적합에서 바로 계산
+        c_db = energy.rms_db(c_s, c_e)
+        pre_db = energy.rms_db(max(0, s - ENERGY_EDGE_MS), s)
+        post_db = energy.rms_db(e, min(len(energy), e + ENERGY_EDGE_MS))
+    else:
+        center = slice_ms(full, c_s, c_e)
 
-    c_db = rms_db(center)
-    pre_db = rms_db(pre)
-    post_db = rms_db(post)
+        # 앞/뒤 경계 구간
+        pre = slice_ms(full, s - ENERGY_EDGE_MS, s)
+        post = slice_ms(full, e, e + ENERGY_EDGE_MS)
+
+        c_db = rms_db(center)
+        pre_db = rms_db(pre)
+        post_db = rms_db(post)
 
     # 중앙이 양쪽보다 MARIGIN 만큼 더 커야(=양옆이 더 조용해야) 추임새로 인정
     return (c_db >= pre_db + ENERGY_MARGIN_DB) or (c_db >= post_db + ENERGY_MARGIN_DB)
+
+
+def energy_valley_mask(energy, s, e) -> np.ndarray:
+    """energy_valley_ok(energy=...) 를 윈도우 배열 전체에 (bool 배열)"""
+    s = np.asarray(s, dtype=np.int64)
+    e = np.asarray(e, dtype=np.int64)
+    mid = s + (e - s) // 2
+    c_db = energy.rms_db_many(
+        np.maximum(s, mid - ENERGY_CENTER_MS // 2),
+        np.minimum(e, mid + ENERGY_CENTER_MS // 2),
+    )
+    pre_db = energy.rms_db_many(np.maximum(0, s - ENERGY_EDGE_MS), s)
+    post_db = energy.rms_db_many(e, np.minimum(len(energy), e + ENERGY_EDGE_MS))
+    d_pre = c_db - (pre_db + ENERGY_MARGIN_DB)
+    d_post = c_db - (post_db + ENERGY_MARGIN_DB)
+    ok = (d_pre >= 0) | (d_post >= 0)
+    near = (np.abs(d_pre) < _TIE_DB) | (np.abs(d_post) < _TIE_DB)
+    for k in np.flatnonzero(near).tolist():
+        ok[k] = energy_valley_ok(None, int(s[k]), int(e[k]), energy=energy)
+    return ok
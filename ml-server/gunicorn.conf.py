@@ -0,0 +1,90 @@
+# gunicorn 설정 (명령줄 옵션은 Dockerfile CMD 참고)
+#
+# 환경변수
+#   JOB_DRAIN_SEC  워커 종료 때 진행 중인 비동기 job 을 기다리는 최대 시간
+#                  (초, 기본 10. --graceful-timeout 을 넘지 않음)
+#   SIDECAR_RESTART_MAX_SEC  추론 사이드카가 죽었을 때 다시 띄우기 전 대기의 상한
+#                            (초, 기본 30. 1초부터 연달아 죽을 때마다 두 배)
+import os
+import subprocess
+import sys
+import threading
+import time
+
+JOB_DRAIN_SEC = float(os.getenv("JOB_DRAIN_SEC", "10"))
+SIDECAR_RESTART_MAX_SEC = float(os.getenv("SIDECAR_RESTART_MAX_SEC", "30"))
+
+_sidecar = None
+_stopping = threading.Event()
+
+
+def _supervise_sidecar(log):
+    # 사이드카가 끝나면(크래시 / OOM kill) 다시 띄운다. 오래(60초 이상) 살아 있다가
+    # 죽었으면 바로, 뜨자마자 연달아 죽으면 대기를 늘려 가며.
+    # (gunicorn master 의 SIGCHLD 처리가 먼저 거둬 가도 wait() 는 돌아온다)
+    global _sidecar
+    here = os.path.dirname(os.path.abspath(__file__))
+    delay = 1.0
+    while not _stopping.is_set():
+        started = time.monotonic()
+        _sidecar = subprocess.Popen(
+            [sys.executable, os.path.join(here, "inference_server.py")]
+        )
+        log.info("inference sidecar started (pid %s)", _sidecar.pid)
+        code = _sidecar.wait()
+        if _stopping.is_set():
+            return
+        if time.monotonic() - started >= 60:
+            delay = 1.0
+        log.error(
+            "inference sidecar exited (code %s), restarting in %.0fs", code, delay
+        )
+        if _stopping.wait(delay):
+            return
+        delay = min(delay * 2, SIDECAR_RESTART_MAX_SEC)
+
+
+def on_starting(server):
+    # INFER_BACKEND=remote 면 컨테이너당 추론 사이드카 하나를 master 가 띄우고 감시한다.
+    # 워커 / 분석 풀 워커는 모델 없이 소켓으로 사이드카에 추론을 요청한다.
+    if os.getenv("INFER_BACKEND") != "remote":
+        return
+    threading.Thread(
+        target=_supervise_sidecar,
+        args=(server.log,),
+        name="sidecar-supervisor",
+        daemon=True,
+    ).start()
+
+
+def on_exit(server):
+    _stopping.set()
+    if _sidecar is not None and _sidecar.poll() is None:
+        _sidecar.terminate()
+        try:
+            _sidecar.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _sidecar.kill()
+
+
+def post_worker_init(worker):
+    # 워커가 앱을 import 한 직후 백그라운드에서 모델 로드 + 워밍업 시작.
+    # 끝나기 전까지 /ready 는 503 을 돌려준다.
+    import main
+
+    main.model_runtime.start_preload(main.model_path)
+
+
+def worker_exit(server, worker):
+    # 종료(SIGTERM / HUP) 시: 요청(SSE 포함)은 graceful-timeout 안에 끝났고, 아직 도는
+    # 비동기 job 은 상태가 워커 메모리에 있어 프로세스와 함께 사라진다. 곧 끝날 job 은 결과가
+    # 결과 캐시에 남도록 잠깐만 기다린다.
+    # gunicorn 은 이 훅 전에 worker.tmp 를 닫으므로 worker.notify(heartbeat)는 쓸 수 없고,
+    # master 는 graceful-timeout 뒤에 SIGKILL 하므로 그보다 오래 기다리지 않는다.
+    # (그래서 --max-requests 재시작도 쓰지 않음. Dockerfile 참고)
+    import main
+
+    timeout = min(JOB_DRAIN_SEC, float(server.cfg.graceful_timeout))
+    left = main.job_manager.drain(timeout)
+    if left:
+        worker.log.warning("worker exit with %d unfinished job(s)", left)
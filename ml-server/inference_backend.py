@@ -0,0 +1,397 @@
+"""
+filler 모델 추론 백엔드.
+
+모든 백엔드는 Keras 모델에서 실제로 쓰던 인터페이스만 제공한다.
+  predict_on_batch(xs) -> (N, C) ndarray
+  predict(x, verbose=0) -> (N, C) ndarray
+따라서 func_filler.predict_filler_probs / core_filler 는 백엔드를 몰라도 된다.
+
+  keras   tf.keras 로 .h5 그대로 로드 (기존 동작)
+  tflite  .h5 -> .tflite 변환본을 LiteRT / tflite_runtime / tf.lite 인터프리터로 실행
+  onnx    .h5 -> .onnx 변환본을 onnxruntime 으로 실행
+  remote  모델은 추론 사이드카(inference_server.py)에만 올리고 유닉스 소켓으로 요청.
+          여러 워커/요청의 윈도우가 사이드카에서 micro-batch 로 묶인다
+
+양자화 (tflite / onnx)
+  none  float32 그대로
+  fp16  가중치 float16 (tflite: float16 가중치, onnx: onnxconverter_common 필요)
+  int8  가중치 int8 동적 양자화 (활성값은 실행 시 양자화, 대표 데이터셋 불필요)
+
+fp16 / int8 은 확률이 달라지므로 check_backend_parity.py --write-report 가 변환본 옆에
+남긴 통과 기록("<변환본>.parity.json", 변환본보다 새 것)이 있어야 로드된다.
+
+변환본은 .h5 옆(또는 INFER_CACHE_DIR)에 "<이름>.<quant>.tflite|onnx" 로 저장해두고
+.h5 보다 새 것이면 재사용한다. 변환본만 있으면 onnx 는 TF 없이, tflite 는
+ai_edge_litert / tflite_runtime 이 설치돼 있으면 TF 없이 로드된다.
+
+환경변수
+  INFER_BACKEND    keras(기본) | tflite | onnx | remote
+  INFER_QUANT      none(기본) | fp16 | int8
+  INFER_THREADS    tflite / onnx 인터프리터 스레드 수 (기본 1)
+  INFER_CACHE_DIR  변환본 저장 위치 (기본: .h5 와 같은 디렉터리)
+  INFER_QUANT_REQUIRE_PARITY  1(기본)이면 fp16 / int8 은 parity 통과 기록이 있어야 로드
+  INFER_CONNECT_TIMEOUT  remote: 사이드카가 뜰 때까지 기다리는 최대 시간(초, 기본 120)
+  INFER_REQUEST_TIMEOUT  remote: 요청 하나의 소켓 송수신 제한 시간(초, 기본 60). 사이드카가
+                         재시작 중이면 이 시간 안에서 다시 연결을 시도한다
+"""
+
+from __future__ import annotations
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND = os.getenv("INFER_BACKEND", "keras")
+QUANT = os.getenv("INFER_QUANT", "none")
+THREADS = int(os.getenv("INFER_THREADS", "1"))
+CACHE_DIR = os.getenv("INFER_CACHE_DIR", "")
+CONNECT_TIMEOUT = float(os.getenv("INFER_CONNECT_TIMEOUT", "120"))
+REQUEST_TIMEOUT = float(os.getenv("INFER_REQUEST_TIMEOUT", "60"))
+REQUIRE_PARITY = os.getenv("INFER_QUANT_REQUIRE_PARITY", "1") == "1"
+
+BACKENDS = ("keras", "tflite", "onnx", "remote")
+QUANTS = ("none", "fp16", "int8")
+
+
+class KerasBackend:
+    backend_name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+        self.quant = "none"
+
+    def predict_on_batch(self, xs: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(xs))
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return np.asarray(self.model.predict(x, verbose=verbose))
+
+
+class TFLiteBackend:
+    backend_name = "tflite"
+
+    def __init__(self, path: str, quant: str = "none", threads: int = THREADS):
+        self.path = path
+        self.quant = quant
+        self._it = _tflite_interpreter(path, threads)
+        self._in = self._it.get_input_details()[0]["index"]
+        self._out = self._it.get_output_details()[0]["index"]
+        self._n = None
+        # 인터프리터는 스레드 안전하지 않음 (gthread 워커에서 요청끼리 공유)
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, xs: np.ndarray) -> np.ndarray:
+        xs = np.ascontiguousarray(xs, dtype=np.float32)
+        with self._lock:
+            if self._n != len(xs):
+                self._it.resize_tensor_input(self._in, xs.shape)
+                self._it.allocate_tensors()
+                self._n = len(xs)
+            self._it.set_tensor(self._in, xs)
+            self._it.invoke()
+            return self._it.get_tensor(self._out).copy()
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.predict_on_batch(x)
+
+
+class OnnxBackend:
+    backend_name = "onnx"
+
+    def __init__(self, path: str, quant: str = "none", threads: int = THREADS):
+        import onnxruntime as ort
+
+        self.path = path
+        self.quant = quant
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        self._sess = ort.InferenceSession(
+            path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self._in = self._sess.get_inputs()[0].name
+
+    def predict_on_batch(self, xs: np.ndarray) -> np.ndarray:
+        xs = np.ascontiguousarray(xs, dtype=np.float32)
+        return self._sess.run(None, {self._in: xs})[0]
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.predict_on_batch(x)
+
+
+class RemoteBackend:
+    """
+    추론 사이드카 클라이언트. 스레드마다 연결 하나를 유지한다.
+    호출별 사이드카 배치 크기 / 큐 대기 시간은 스레드별로 모아 두었다가
+    collect_stats() 로 꺼낸다 (core_filler 가 diag.inference.server 로 보고).
+    """
+
+    backend_name = "remote"
+
+    def __init__(self, socket_path: str | None = None, timeout=CONNECT_TIMEOUT):
+        import inference_server
+
+        self._srv = inference_server
+        self.socket_path = socket_path or inference_server.SOCKET_PATH
+        self._local = threading.local()
+        self.server = self._wait_ready(timeout)
+        self.quant = self.server.get("quant", "none")
+
+    def _wait_ready(self, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                header, _ = self._call({"op": "ping"})
+                return {k: v for k, v in header.items() if k not in ("ok", "nbytes")}
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(
+                        f"추론 사이드카에 연결할 수 없습니다: {self.socket_path}"
+                    )
+                time.sleep(0.2)
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = _connect(self.socket_path, REQUEST_TIMEOUT)
+            self._local.sock = sock
+        return sock
+
+    def _drop_conn(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _call(self, header: dict, payload: bytes = b""):
+        # 응답이 REQUEST_TIMEOUT 안에 안 오면(사이드카 멈춤) 연결을 버리고 실패.
+        # 끊긴 연결 / 연결 실패(사이드카 재시작 중)는 REQUEST_TIMEOUT 안에서 다시 연결해 재시도
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+        while True:
+            try:
+                sock = self._conn()
+                self._srv.send_frame(sock, header, payload)
+                return self._srv.recv_frame(sock)
+            except socket.timeout:
+                self._drop_conn()
+                raise
+            except OSError:
+                self._drop_conn()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def predict_on_batch(self, xs: np.ndarray) -> np.ndarray:
+        xs = np.ascontiguousarray(xs, dtype=np.float32)
+        header, payload = self._call(
+            {"op": "predict", "shape": list(xs.shape)}, xs.tobytes()
+        )
+        if not header.get("ok"):
+            raise RuntimeError(f"추론 사이드카 오류: {header.get('error')}")
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            stats = self._local.stats = []
+        stats.append(header)
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.predict_on_batch(x)
+
+    def collect_stats(self) -> dict:
+        """이 스레드에서 collect_stats 이후 보낸 요청들의 사이드카 배치 / 대기 요약"""
+        stats = getattr(self._local, "stats", None) or []
+        self._local.stats = []
+        queue_ms = [h["queue_ms"] for h in stats]
+        return {
+            "sidecar_backend": self.server.get("backend"),
+            "requests": len(stats),
+            "batch_sizes": [n for h in stats for n in h["batches"]],
+            "queue_ms_mean": round(sum(queue_ms) / len(queue_ms), 3) if stats else 0.0,
+            "queue_ms_max": max(queue_ms) if stats else 0.0,
+            "server_ms": round(sum(h["server_ms"] for h in stats), 3),
+        }
+
+
+def _connect(socket_path: str, timeout: float) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def sidecar_status(timeout: float = 2.0) -> dict:
+    """/ready 용: 새 연결로 사이드카에 ping. {"ok": bool, ...사이드카 정보 또는 "error"}"""
+    import inference_server
+
+    try:
+        with _connect(inference_server.SOCKET_PATH, timeout) as sock:
+            inference_server.send_frame(sock, {"op": "ping"})
+            header, _ = inference_server.recv_frame(sock)
+    except (OSError, ValueError) as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    header.pop("nbytes", None)
+    return header
+
+
+# -------------------------------------------------------------------
+def load(model_path: str, backend: str = BACKEND, quant: str = QUANT):
+    """.h5 경로 -> 선택한 백엔드 (변환이 필요하면 변환 후 캐시)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 INFER_BACKEND: {backend}")
+    if quant not in QUANTS:
+        raise ValueError(f"지원하지 않는 INFER_QUANT: {quant}")
+
+    if backend == "keras":
+        import tensorflow as tf
+
+        return KerasBackend(tf.keras.models.load_model(model_path))
+    if backend == "remote":
+        # 모델은 사이드카가 로드 (model_path 는 결과 캐시 지문에만 쓰임)
+        return RemoteBackend()
+
+    path = converted_path(model_path, backend, quant)
+    if not _is_fresh(path, model_path):
+        convert(model_path, backend, quant, path)
+    if quant != "none" and REQUIRE_PARITY:
+        check_parity_report(path, backend, quant)
+    if backend == "tflite":
+        return TFLiteBackend(str(path), quant)
+    return OnnxBackend(str(path), quant)
+
+
+def converted_path(model_path: str, backend: str, quant: str) -> Path:
+    src = Path(model_path)
+    base = Path(CACHE_DIR) if CACHE_DIR else src.parent
+    return base / f"{src.stem}.{quant}.{backend}"
+
+
+def parity_report_path(path: Path) -> Path:
+    return path.with_name(path.name + ".parity.json")
+
+
+def check_parity_report(path: Path, backend: str, quant: str):
+    """양자화 변환본의 parity 통과 기록 확인 (없거나 실패 / 변환본보다 오래됐으면 ValueError)"""
+    import json
+
+    report = parity_report_path(path)
+    how = (
+        f"python check_backend_parity.py <샘플 오디오...> "
+        f"--backends {backend}:{quant} --write-report"
+    )
+    try:
+        rec = json.loads(report.read_text())
+        fresh = report.stat().st_mtime >= path.stat().st_mtime
+    except (OSError, ValueError):
+        raise ValueError(
+            f"{backend}:{quant} 는 parity 확인 기록이 없어 쓸 수 없습니다 ({how})"
+        ) from None
+    if not fresh:
+        raise ValueError(
+            f"{backend}:{quant} parity 기록이 변환본보다 오래됐습니다 ({how})"
+        )
+    if not rec.get("passed"):
+        raise ValueError(
+            f"{backend}:{quant} 가 parity 기준을 넘었습니다: "
+            f"threshold_flips={rec.get('threshold_flips')}, max_abs={rec.get('max_abs')}"
+        )
+
+
+def _is_fresh(path: Path, model_path: str) -> bool:
+    if not path.exists():
+        return False
+    try:
+        return path.stat().st_mtime >= os.stat(model_path).st_mtime
+    except OSError:
+        # 원본 .h5 없이 변환본만 배포한 경우
+        return True
+
+
+def convert(model_path: str, backend: str, quant: str, out_path: Path) -> Path:
+    """.h5 -> tflite / onnx 변환 (TF 필요). 임시 파일에 쓴 뒤 교체"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    if backend == "tflite":
+        data = _to_tflite(tf, model, quant)
+    else:
+        data = _to_onnx(tf, model, quant)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def _to_tflite(tf, model, quant: str) -> bytes:
+    conv = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quant == "fp16":
+        conv.optimizations = [tf.lite.Optimize.DEFAULT]
+        conv.target_spec.supported_types = [tf.float16]
+    elif quant == "int8":
+        # 대표 데이터셋 없이 가중치만 int8 (dynamic range quantization)
+        conv.optimizations = [tf.lite.Optimize.DEFAULT]
+    return conv.convert()
+
+
+def _to_onnx(tf, model, quant: str) -> bytes:
+    try:
+        import tf2onnx
+    except ImportError as e:
+        raise ImportError("onnx 백엔드 변환에는 tf2onnx 가 필요합니다.") from e
+
+    spec = [tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="x")]
+
+    @tf.function(input_signature=spec)
+    def _fn(x):
+        return model(x, training=False)
+
+    proto, _ = tf2onnx.convert.from_function(_fn, input_signature=spec, opset=13)
+    if quant == "fp16":
+        try:
+            from onnxconverter_common import float16
+        except ImportError as e:
+            raise ImportError(
+                "onnx fp16 변환에는 onnxconverter_common 이 필요합니다."
+            ) from e
+        proto = float16.convert_float_to_float16(proto, keep_io_types=True)
+    data = proto.SerializeToString()
+    if quant == "int8":
+        data = _onnx_quantize_int8(data)
+    return data
+
+
+def _onnx_quantize_int8(data: bytes) -> bytes:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = os.path.join(tmpdir, "fp32.onnx")
+        dst = os.path.join(tmpdir, "int8.onnx")
+        with open(src, "wb") as f:
+            f.write(data)
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        with open(dst, "rb") as f:
+            return f.read()
+
+
+def _tflite_interpreter(path: str, threads: int):
+    # TF 전체를 올리지 않아도 되는 런타임을 우선 사용
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=threads)
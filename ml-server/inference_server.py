@@ -0,0 +1,274 @@
+"""
+컨테이너당 하나 띄우는 추론 사이드카.
+
+모델은 이 프로세스에만 올리고, gunicorn 워커 / 분석 풀 워커는 INFER_BACKEND=remote 로
+유닉스 소켓을 통해 윈도우 특징 텐서를 보낸다. 여러 요청에서 동시에 들어온 윈도우를
+max batch / max wait 기준으로 묶어서(dynamic micro-batching) 한 번에 추론한다.
+
+프로토콜 (요청/응답 동일한 프레임)
+  [4바이트 big-endian 헤더 길이][헤더 JSON][payload (헤더의 nbytes 바이트)]
+  요청  {"op": "predict", "shape": [N, 20, 40, 1], "nbytes": ...} + float32 입력
+        {"op": "ping"}
+  응답  {"ok": true, "shape": [N, C], "nbytes": ..., "batches": [...],
+         "queue_ms": ..., "server_ms": ...} + float32 출력
+        {"ok": false, "error": "..."}
+  batches   이 요청의 윈도우가 실린 사이드카 배치들의 크기 (다른 요청 윈도우 포함)
+  queue_ms  도착 ~ 첫 배치 추론 시작, server_ms  도착 ~ 응답 직전
+
+환경변수
+  INFER_SOCKET            소켓 경로 (기본 /tmp/filler-infer.sock)
+  INFER_SIDECAR_BACKEND   사이드카가 쓸 백엔드 keras | tflite | onnx (기본 keras)
+  INFER_SIDECAR_QUANT     사이드카 백엔드 양자화 (기본 none)
+  INFER_MAX_BATCH         한 번에 추론할 최대 윈도우 수 (기본 256)
+  INFER_MAX_WAIT_MS       첫 요청 도착 후 배치를 모으며 기다리는 최대 시간 (기본 5)
+
+  python inference_server.py [--model PATH]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SOCKET_PATH = os.getenv("INFER_SOCKET", "/tmp/filler-infer.sock")
+SIDECAR_BACKEND = os.getenv("INFER_SIDECAR_BACKEND", "keras")
+SIDECAR_QUANT = os.getenv("INFER_SIDECAR_QUANT", "none")
+MAX_BATCH = int(os.getenv("INFER_MAX_BATCH", "256"))
+MAX_WAIT_MS = float(os.getenv("INFER_MAX_WAIT_MS", "5"))
+
+_HDR = struct.Struct(">I")
+
+
+# ---- 프레임 입출력 (클라이언트와 공용) ----------------------------------
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("소켓이 닫혔습니다.")
+        got += k
+    return bytes(buf)
+
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b""):
+    header = dict(header, nbytes=len(payload))
+    h = json.dumps(header).encode("utf-8")
+    sock.sendall(_HDR.pack(len(h)) + h)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[dict, bytes]:
+    (n,) = _HDR.unpack(_recv_exact(sock, _HDR.size))
+    header = json.loads(_recv_exact(sock, n))
+    nbytes = int(header.get("nbytes", 0))
+    payload = _recv_exact(sock, nbytes) if nbytes else b""
+    return header, payload
+
+
+# ---- 배처 --------------------------------------------------------------
+class _Request:
+    __slots__ = (
+        "xs",
+        "out",
+        "pos",
+        "left",
+        "t_enq",
+        "t_first",
+        "batches",
+        "error",
+        "done",
+    )
+
+    def __init__(self, xs: np.ndarray):
+        self.xs = xs
+        self.out: Optional[np.ndarray] = None
+        self.pos = 0  # 다음에 배치로 보낼 행
+        self.left = len(xs)  # 아직 결과가 안 나온 행
+        self.t_enq = time.perf_counter()
+        self.t_first: Optional[float] = None
+        self.batches: List[int] = []
+        self.error: Optional[str] = None  # 이 요청의 배치 하나라도 실패하면 그 사유
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, model, max_batch: int = MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+        self._q: "deque[_Request]" = deque()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._loop, name="batcher", daemon=True).start()
+
+    def submit(self, xs: np.ndarray) -> _Request:
+        req = _Request(xs)
+        if len(xs) == 0:
+            req.out = np.zeros((0, 0), dtype=np.float32)
+            req.done.set()
+            return req
+        with self._cond:
+            self._q.append(req)
+            self._cond.notify()
+        return req
+
+    def _pending_rows(self) -> int:
+        return sum(len(r.xs) - r.pos for r in self._q)
+
+    def _take(self) -> List[Tuple[_Request, int, int]]:
+        """큐 앞에서부터 max_batch 행까지 잘라서 가져옴 (큰 요청은 여러 배치로 나뉨)"""
+        slices = []
+        room = self.max_batch
+        while self._q and room > 0:
+            r = self._q[0]
+            n = min(room, len(r.xs) - r.pos)
+            slices.append((r, r.pos, r.pos + n))
+            r.pos += n
+            room -= n
+            if r.pos >= len(r.xs):
+                self._q.popleft()
+        return slices
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._q:
+                    self._cond.wait()
+                # 첫 요청 도착 시점부터 max_wait 까지, 또는 max_batch 가 찰 때까지 모음
+                deadline = self._q[0].t_enq + self.max_wait
+                while self._pending_rows() < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                slices = self._take()
+            self._run(slices)
+
+    def _run(self, slices):
+        t0 = time.perf_counter()
+        for r, _, _ in slices:
+            if r.t_first is None:
+                r.t_first = t0
+        xs = np.concatenate([r.xs[a:b] for r, a, b in slices], axis=0)
+        try:
+            ys = np.asarray(self.model.predict_on_batch(xs), dtype=np.float32)
+        except Exception as e:
+            self._fail([r for r, _, _ in slices], f"{type(e).__name__}: {e}")
+            return
+        k = 0
+        for r, a, b in slices:
+            if r.out is None:
+                r.out = np.empty((len(r.xs), ys.shape[1]), dtype=np.float32)
+            r.out[a:b] = ys[k : k + (b - a)]
+            k += b - a
+            r.batches.append(len(xs))
+            r.left -= b - a
+            if r.left <= 0:
+                r.done.set()
+
+    def _fail(self, reqs: List[_Request], error: str):
+        """배치가 실패한 요청들: 큐에 남은 나머지 행은 빼고 바로 실패로 응답"""
+        with self._cond:
+            for r in reqs:
+                if r.pos < len(r.xs):
+                    # 큰 요청은 뒷부분이 아직 큐 맨 앞에 남아 있음
+                    self._q.remove(r)
+        for r in reqs:
+            r.error = error
+            r.done.set()
+
+
+# ---- 서버 ---------------------------------------------------------------
+def _serve_conn(conn: socket.socket, batcher: MicroBatcher, info: dict):
+    with conn:
+        try:
+            while True:
+                _serve_one(conn, batcher, info)
+        except (ConnectionError, OSError):
+            # 클라이언트가 끊음 (요청 제한 시간이 지나 연결을 버린 경우 포함)
+            return
+
+
+def _serve_one(conn: socket.socket, batcher: MicroBatcher, info: dict):
+    header, payload = recv_frame(conn)
+    op = header.get("op")
+    if op == "ping":
+        send_frame(conn, {"ok": True, **info})
+        return
+    if op != "predict":
+        send_frame(conn, {"ok": False, "error": f"unknown op: {op}"})
+        return
+    xs = np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+    req = batcher.submit(xs)
+    req.done.wait()
+    if req.error is not None:
+        send_frame(conn, {"ok": False, "error": req.error})
+        return
+    send_frame(
+        conn,
+        {
+            "ok": True,
+            "shape": list(req.out.shape),
+            "batches": req.batches,
+            "queue_ms": round(((req.t_first or req.t_enq) - req.t_enq) * 1e3, 3),
+            "server_ms": round((time.perf_counter() - req.t_enq) * 1e3, 3),
+        },
+        req.out.tobytes(),
+    )
+
+
+def serve(model_path: str, socket_path: str = SOCKET_PATH):
+    import inference_backend
+    import model_runtime
+
+    model = inference_backend.load(model_path, SIDECAR_BACKEND, SIDECAR_QUANT)
+    model_runtime.warmup(model, batch_sizes=(MAX_BATCH, 1))
+    batcher = MicroBatcher(model)
+    info = {
+        "backend": SIDECAR_BACKEND,
+        "quant": SIDECAR_QUANT,
+        "max_batch": batcher.max_batch,
+        "max_wait_ms": MAX_WAIT_MS,
+        "model_fingerprint": model_runtime.model_fingerprint(model_path),
+    }
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(socket_path)
+    srv.listen(64)
+    print(f"[inference_server] listening on {socket_path} ({info})", flush=True)
+    while True:
+        conn, _ = srv.accept()
+        threading.Thread(
+            target=_serve_conn, args=(conn, batcher, info), daemon=True
+        ).start()
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--model",
+        default=os.getenv(
+            "FILLER_MODEL_PATH",
+            os.path.join(here, "model", "new_filler_determine_model.h5"),
+        ),
+    )
+    ap.add_argument("--socket", default=SOCKET_PATH)
+    args = ap.parse_args()
+    serve(args.model, args.socket)
+
+
+if __name__ == "__main__":
+    main()
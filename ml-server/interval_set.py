@@ -0,0 +1,147 @@
+"""
+ms 단위 구간 집합 (시작/끝 int64 배열 두 개).
+
+core_filler 의 merge_iv / subtract_iv / complement_iv / sum_iv 와 같은 결과를
+Interval 객체 없이 정렬 + 누적 최대값(sweep-line) 으로 계산한다.
+subtract_iv 는 A x B 중첩 루프(O(|A|·|B|))였지만 여기서는 전부 O((|A|+|B|) log) 이다.
+
+정규형: 시작 기준 정렬, 서로 겹치거나 맞닿는 구간은 병합 (merge_iv 와 같은 규칙).
+길이 0 인 구간도 merge_iv 처럼 다른 구간에 흡수되지 않으면 그대로 남는다.
+"""
+
+from __future__ import annotations
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class IntervalSet:
+    __slots__ = ("s", "e")
+
+    def __init__(self, s: np.ndarray = _EMPTY, e: np.ndarray = _EMPTY):
+        """이미 정규형인 배열을 그대로 감쌈 (정규화는 from_pairs / from_arrays)"""
+        self.s = s
+        self.e = e
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[int, int]]) -> "IntervalSet":
+        pairs = list(pairs)
+        if not pairs:
+            return cls()
+        arr = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        return cls.from_arrays(arr[:, 0], arr[:, 1])
+
+    @classmethod
+    def from_arrays(cls, s, e) -> "IntervalSet":
+        """정렬 + 병합 (merge_iv 와 동일: s <= 지금까지의 끝 이면 합침)"""
+        s = np.asarray(s, dtype=np.int64)
+        e = np.asarray(e, dtype=np.int64)
+        if len(s) == 0:
+            return cls()
+        order = np.lexsort((e, s))
+        s, e = s[order], e[order]
+        reach = np.maximum.accumulate(e)
+        # 새 구간 시작: 직전까지의 최대 끝보다 뒤에서 시작
+        start = np.ones(len(s), dtype=bool)
+        start[1:] = s[1:] > reach[:-1]
+        first = np.flatnonzero(start)
+        last = np.append(first[1:] - 1, len(s) - 1)
+        return cls(s[first], reach[last])
+
+    # ---------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.s)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.s.tolist(), self.e.tolist())
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, IntervalSet)
+            and np.array_equal(self.s, other.s)
+            and np.array_equal(self.e, other.e)
+        )
+
+    def __repr__(self) -> str:
+        return f"IntervalSet({list(self)})"
+
+    def lengths(self) -> np.ndarray:
+        return np.maximum(0, self.e - self.s)
+
+    def total(self) -> int:
+        """sum_iv"""
+        return int(self.lengths().sum())
+
+    def to_dicts(self) -> List[dict]:
+        """응답 JSON 용 [{"s", "e"}]"""
+        return [{"s": s, "e": e} for s, e in self]
+
+    # ---------------------------------------------------------------
+    def complement(self, total_ms: int) -> "IntervalSet":
+        """complement_iv: [0, total_ms) 에서 self 를 뺀 빈 구간들"""
+        return self._gaps(0, total_ms)
+
+    def _gaps(self, lo: int, hi: int) -> "IntervalSet":
+        """[lo, hi) 에서 self 가 덮지 않는 구간 (lo 부터 끝을 누적하며 sweep)"""
+        reach = np.maximum.accumulate(np.concatenate(([lo], self.e)))
+        gap = self.s > reach[:-1]
+        s = reach[:-1][gap]
+        e = self.s[gap]
+        cur = int(reach[-1])
+        if cur < hi:
+            s = np.append(s, cur)
+            e = np.append(e, hi)
+        return IntervalSet(s.astype(np.int64), e.astype(np.int64))
+
+    def intersect(self, other: "IntervalSet") -> "IntervalSet":
+        """두 정규형 집합의 교집합 (길이가 양수인 조각만)"""
+        a, b = self._positive(), other._positive()
+        if len(a) == 0 or len(b) == 0:
+            return IntervalSet()
+        # a[i] 와 겹칠 수 있는 b 범위 [lo, hi): b.e > a.s 이고 b.s < a.e
+        lo = np.searchsorted(b.e, a.s, side="right")
+        hi = np.searchsorted(b.s, a.e, side="left")
+        cnt = np.maximum(0, hi - lo)
+        if cnt.sum() == 0:
+            return IntervalSet()
+        ai = np.repeat(np.arange(len(a)), cnt)
+        # 각 a 에 대해 lo, lo+1, ..., hi-1
+        offs = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        bi = np.repeat(lo, cnt) + offs
+        s = np.maximum(a.s[ai], b.s[bi])
+        e = np.minimum(a.e[ai], b.e[bi])
+        keep = e > s
+        return IntervalSet(s[keep], e[keep])
+
+    def subtract(self, other: "IntervalSet") -> "IntervalSet":
+        """subtract_iv: self - other"""
+        if len(self) == 0:
+            return IntervalSet()
+        if len(other) == 0:
+            return IntervalSet(self.s.copy(), self.e.copy())
+        lo = int(min(self.s.min(), other.s.min()))
+        hi = int(max(self.e.max(), other.e.max()))
+        out = self.intersect(other._positive()._gaps(lo, hi))
+        zero = self.s == self.e
+        if zero.any():
+            # 길이 0 구간은 subtract_iv 에서 어떤 구간과도 교차하지 않으므로 그대로 남음
+            s = np.concatenate((out.s, self.s[zero]))
+            e = np.concatenate((out.e, self.e[zero]))
+            order = np.lexsort((e, s))
+            out = IntervalSet(s[order], e[order])
+        return out
+
+    def overlap_bins(self, edges: Sequence[int]) -> np.ndarray:
+        """[edges[k], edges[k+1]) 구간마다 self 와 겹치는 총 길이 (ms)"""
+        edges = np.asarray(edges, dtype=np.int64)
+        lo, hi = edges[:-1, None], edges[1:, None]
+        ov = np.minimum(self.e[None, :], hi) - np.maximum(self.s[None, :], lo)
+        return np.maximum(0, ov).sum(axis=1)
+
+    def _positive(self) -> "IntervalSet":
+        pos = self.e > self.s
+        if pos.all():
+            return self
+        return IntervalSet(self.s[pos], self.e[pos])
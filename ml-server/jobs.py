@@ -0,0 +1,204 @@
+"""
+프로세스 내 비동기 분석 작업(job) 관리.
+
+- submit 하면 job_id 를 바로 돌려주고, 실제 분석은 ThreadPoolExecutor 에서 실행
+- 각 job 은 단계별 진행 이벤트를 순서대로 쌓아두고 SSE 로 흘려보낸다
+  (이벤트 형식은 Nest analysis.events.types 와 같은 {type, ...} JSON)
+- 끝난 job 은 JOB_TTL_SEC 동안 / 최대 JOB_MAX_KEEP 개까지만 보관
+
+환경변수
+  JOB_WORKERS    동시에 실행할 job 수 (기본 2)
+  JOB_TTL_SEC    완료된 job 보관 시간 (기본 600)
+  JOB_MAX_KEEP   보관할 최대 job 수 (기본 200)
+  JOB_MAX_QUEUE  대기 + 실행 중인 job 상한. 넘으면 submit 이 JobQueueFull (기본 16)
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SEC = float(os.getenv("JOB_TTL_SEC", "600"))
+JOB_MAX_KEEP = int(os.getenv("JOB_MAX_KEEP", "200"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "16"))
+HEARTBEAT_SEC = 15.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "completed", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """대기 + 실행 중인 job 이 상한에 닿음. 429"""
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = QUEUED
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[dict] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    def emit(self, type_: str, **payload):
+        with self._cond:
+            self.events.append({"type": type_, "job_id": self.id, **payload})
+            self._cond.notify_all()
+
+    def report(self, stage: str, value: float | None = None, **info):
+        """진행 콜백: stage 이름 + 0~1 진행도(선택) + 부가 정보"""
+        self.stage = stage
+        self.progress = {"stage": stage, "value": value, **info}
+        self.emit("progress", stage=stage, value=value, **info)
+
+    def to_dict(self, with_result: bool = True) -> dict:
+        d = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "stage": self.stage,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.state == FAILED:
+            d["error"] = self.error
+        if with_result and self.state == DONE:
+            d["result"] = self.result
+        return d
+
+    def iter_events(self, start: int = 0) -> Iterator[tuple]:
+        """(index, event) 를 순서대로. 새 이벤트가 없으면 heartbeat 용 None"""
+        i = start
+        while True:
+            with self._cond:
+                if i >= len(self.events) and not self.finished:
+                    self._cond.wait(timeout=HEARTBEAT_SEC)
+                pending = self.events[i:]
+                finished = self.finished
+            if not pending:
+                if finished:
+                    return
+                yield i, None
+                continue
+            for ev in pending:
+                yield i, ev
+                i += 1
+
+
+class JobManager:
+    def __init__(self, max_workers: int = JOB_WORKERS, max_queue: int = JOB_MAX_QUEUE):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._active = 0  # 대기 + 실행 중인 job 수
+        # job 은 워커 메모리에만 있으므로 실행기 큐를 무한히 쌓지 않는다
+        self._max_queue = max_queue
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, kind: str, fn: Callable[[Job], Any]) -> Job:
+        """
+        fn(job) 을 워커에서 실행. fn 은 job.report(...) 로 진행 상황을 알린다.
+        대기 + 실행 중인 job 이 max_queue 개면 JobQueueFull
+        """
+        job = Job(kind)
+        with self._lock:
+            if self._active >= self._max_queue:
+                raise JobQueueFull("대기 중인 분석 작업이 너무 많습니다.")
+            self._evict()
+            self._jobs[job.id] = job
+            self._active += 1
+        job.emit("queued")
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def drain(self, timeout: float, tick: Callable[[], None] | None = None) -> int:
+        """
+        대기 / 실행 중인 job 이 모두 끝날 때까지 최대 timeout 초 기다림 (워커 재시작 전).
+        tick: 선택. 기다리는 동안 1초마다 호출 (gunicorn 워커 heartbeat)
+        남은 job 수를 돌려준다 (0 이면 모두 끝남)
+        """
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._active:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._idle.wait(min(1.0, left))
+                if tick is not None:
+                    tick()
+            return self._active
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        try:
+            self._run_job(job, fn)
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def _run_job(self, job: Job, fn: Callable[[Job], Any]):
+        job.state = RUNNING
+        job.started_at = time.time()
+        job.emit("started")
+        try:
+            result = fn(job)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.state = FAILED
+            job.emit("failed", reason=str(e))
+            return
+        job.result = result
+        job.finished_at = time.time()
+        job.state = DONE
+        job.emit("completed")
+
+    def _evict(self):
+        now = time.time()
+        expired = [
+            k
+            for k, j in self._jobs.items()
+            if j.finished and now - (j.finished_at or now) > JOB_TTL_SEC
+        ]
+        for k in expired:
+            del self._jobs[k]
+        # 개수 상한: 오래된 완료 job 부터 제거
+        if len(self._jobs) >= JOB_MAX_KEEP:
+            done = sorted(
+                (j for j in self._jobs.values() if j.finished),
+                key=lambda j: j.finished_at or 0,
+            )
+            for j in done[: len(self._jobs) - JOB_MAX_KEEP + 1]:
+                del self._jobs[j.id]
+
+
+def sse_format(index: int, event: Optional[dict]) -> str:
+    """SSE 한 건. event 가 None 이면 heartbeat"""
+    if event is None:
+        data = {"type": ":heartbeat", "ts": int(time.time() * 1000)}
+        return f"data: {json.dumps(data)}\n\n"
+    return f"id: {index}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
@@ -1,25 +1,46 @@
 import subprocess
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify
 from dotenv import load_dotenv
-import os, tempfile
-from werkzeug.utils import secure_filename
+import os
 from urllib.parse import urljoin
-import requests
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+import hashlib
+import hmac
+import json
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.sansio.multipart import (
+    NEED_DATA,
+    Data,
+    Epilogue,
+    Field,
+    File,
+    MultipartDecoder,
+)
+
+from convert import AudioLimitError, SeekableWebmRemuxer, decode_normalized_pcm16
+import object_store
+import pdf_extract
+import analysis_pool
+import inference_backend
+import model_runtime
+import result_cache
+import metrics
+from metrics import StageTimer
+from model_runtime import load_filler_model
+from jobs import JobManager, JobQueueFull, sse_format
+import stream_session
+from stream_session import StreamManager
+
+# tensorflow / librosa(core_filler) / fitz / pymupdf4llm 은 무거워서 실제로 쓰는
+# 엔드포인트 안에서 import 한다 (변환/텍스트 추출만 하는 워커는 TF 를 올리지 않음)
 
-from io import BytesIO
-from convert import convert_to_seekable_webm, webm_to_wav_bytes
-from core_filler import faster_run_filler_analysis_bytes
-
-from functools import lru_cache
-import tensorflow as tf
-
-import tempfile, os
-import fitz
-import pymupdf4llm
 import traceback
 from pathlib import Path
 
-
 # 최초 환경변수 로드
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
@@ -30,12 +51,7 @@ NEST_URL = os.getenv("NEST_URL", "http://localhost:8000")
 
 # model
 DEFAULT_MODEL = BASE_DIR / "model" / "new_filler_determine_model.h5"
-model_path = str(DEFAULT_MODEL)
-
-
-@lru_cache(maxsize=2)
-def load_filler_model(model_path: str):
-    return tf.keras.models.load_model(model_path)
+model_path = os.getenv("FILLER_MODEL_PATH", str(DEFAULT_MODEL))
 
 
 @app.get("/")
@@ -59,138 +75,904 @@ def health_check():
     return {"status": "ok"}
 
 
-# webm -> seekable webm으로 변환
-@app.post("/convert_seekable")
-def convert_seekable():
-    file = request.files["file"]
+# ---- 지표 ----
+# 라우트별 지연 히스토그램은 url_rule 기준 (/jobs/<job_id> 처럼 id 는 묶어서)
+@app.before_request
+def _start_timer():
+    g.t_start = time.perf_counter()
 
-    if not file:
-        return jsonify({"error": "파일이 없습니다."}), 400
 
-    filename = secure_filename(file.filename)
+@app.after_request
+def _observe_request(response):
+    t0 = g.pop("t_start", None)
+    if t0 is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - t0,
+            route=rule,
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        webm_path = os.path.join(tmpdir, filename)
-        output_path = os.path.join(tmpdir, "converted.webm")
-        file.save(webm_path)
 
-        try:
-            convert_to_seekable_webm(webm_path, output_path)
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
-            with open(output_path, "rb") as f:
-                data = BytesIO(f.read())
 
-            return send_file(data, mimetype="audio/webm", as_attachment=False)
+def _profile_requested() -> bool:
+    """?profile=1 (PROFILE_ALLOW=1 일 때만). 프로파일 요청은 결과 캐시를 거치지 않음"""
+    return metrics.PROFILE_ALLOW and request.args.get("profile") == "1"
 
-        except subprocess.CalledProcessError as e:
-            return jsonify({"error": "변환 실패", "message": str(e)}), 500
-        except Exception as e:
-            return jsonify({"error": "서버 내부 오류", "message": str(e)}), 500
+
+# 모델 로드 + 워밍업까지 끝나야 200 (그 전에는 503)
+# 프로세스 풀이 깨져 있으면 503 을 주고 그 풀은 버림 (분석 풀은 다시 워밍업)
+# INFER_BACKEND=remote 면 추론 사이드카가 ping 에 답해야 200
+@app.get("/ready")
+def readiness_check():
+    pools = {
+        "analysis": analysis_pool.pool_status(),
+        "pdf": pdf_extract.pool_status(),
+    }
+    broken = pools["analysis"]["broken"] or pools["pdf"]["broken"]
+    model_runtime.recover_pool()
+    pdf_extract.discard_broken_pool()
+    st = model_runtime.status()
+    st["pools"] = pools
+    ok = st["state"] == "ready" and not broken
+    if inference_backend.BACKEND == "remote":
+        st["sidecar"] = inference_backend.sidecar_status()
+        ok = ok and st["sidecar"]["ok"]
+    return jsonify(st), (200 if ok else 503)
+
+
+# ---- 업로드 스트리밍 ----
+UPLOAD_CHUNK = 1 << 16
+
+
+class UploadError(ValueError):
+    """업로드 본문 문제 (파일 파트 없음 등). 400"""
+
+
+def _iter_upload(field: str = "file"):
+    """
+    업로드된 파일 바이트를 도착하는 대로 청크 단위로 (request.files 처럼 임시 파일에 모으지 않음)
+    multipart/form-data 면 field 파트만, 아니면 본문 전체 (audio/webm, application/octet-stream 등)
+    """
+    stream = request.stream
+    if request.mimetype != "multipart/form-data":
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+    boundary = request.mimetype_params.get("boundary")
+    if not boundary:
+        raise UploadError("multipart boundary 가 없습니다.")
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    found = in_file = eof = False
+    while True:
+        event = decoder.next_event()
+        if event is NEED_DATA:
+            if eof:
+                break
+            chunk = stream.read(UPLOAD_CHUNK)
+            eof = not chunk
+            decoder.receive_data(chunk or None)
+        elif isinstance(event, File):
+            in_file = event.name == field and not found
+            found = found or in_file
+        elif isinstance(event, Field):
+            in_file = False
+        elif isinstance(event, Data):
+            if in_file and event.data:
+                yield event.data
+            if not event.more_data:
+                in_file = False
+        elif isinstance(event, Epilogue):
+            break
+    if not found:
+        raise UploadError("파일이 없습니다.")
+
+
+# webm -> seekable webm으로 변환
+# 업로드 -> ffmpeg stdin -> 메모리 파일 -> 응답 (디스크에 쓰지 않음, convert.SeekableWebmRemuxer)
+# 요청 스레드가 모두 ffmpeg 를 띄우지 않도록 동시에 도는 변환 수를 제한하고,
+# 자리가 CONVERT_WAIT_SEC 안에 나지 않으면 503
+CONVERT_MAX_PROCS = int(os.getenv("CONVERT_MAX_PROCS", "2"))
+CONVERT_WAIT_SEC = float(os.getenv("CONVERT_WAIT_SEC", "30"))
+_convert_slots = threading.BoundedSemaphore(CONVERT_MAX_PROCS)
+
+
+@app.post("/convert_seekable")
+def convert_seekable():
+    if not _convert_slots.acquire(timeout=CONVERT_WAIT_SEC):
+        return (
+            jsonify({"error": "변환 요청이 많습니다. 잠시 후 다시 시도해 주세요."}),
+            503,
+            {"Retry-After": "5"},
+        )
+    try:
+        remux = SeekableWebmRemuxer()
+        try:
+            for chunk in _iter_upload("file"):
+                remux.write(chunk)
+            out, size = remux.finish()
+        except BaseException:
+            remux.abort()
+            raise
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except subprocess.CalledProcessError as e:
+        return jsonify({"error": "변환 실패", "message": e.stderr or str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "서버 내부 오류", "message": str(e)}), 500
+    finally:
+        _convert_slots.release()
+
+    # ffmpeg 는 끝났으므로 자리를 돌려준 뒤 메모리 파일을 청크로 흘려보냄
+    def stream():
+        with out:
+            while True:
+                chunk = out.read(UPLOAD_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+
+    return Response(
+        stream(),
+        mimetype="audio/webm",
+        headers={"Content-Length": str(size)},
+        direct_passthrough=True,
+    )
 
 
 # pdf에서 텍스트 추출
 @app.post("/extract_text")
 def extract_text():
+    """
+    PDF -> markdown. 같은 PDF 는 내용 해시로 캐시
+    ?fallback=1 이면 페이지별 get_text 결과도 채움 (본 변환 실패 / 빈 결과면 항상)
+    """
     file = request.files.get("file")
     if not file:
         return jsonify({"message": "파일 없음"}), 400
 
     try:
-        raw_data = file.read()
-        pdf = fitz.open(stream=raw_data, filetype="pdf")
-
-        md_text = pymupdf4llm.to_markdown(pdf)
-        print(md_text)
-
-        markdown_text = ""
-        for i, page in enumerate(pdf):
-            try:
-                page_text = page.get_text("markdown")
-            except Exception as e:
-                print(f"[WARN] markdown 추출 실패 - fallback to text: {e}")
-                page_text = page.get_text("text")
-            if page_text:
-                markdown_text += page_text + "\n"
-
-        return jsonify({"result": md_text.strip(), "fallback": markdown_text.strip()})
+        out = pdf_extract.extract(
+            file.read(), want_fallback=request.args.get("fallback") == "1"
+        )
+        return jsonify(out)
+    except pdf_extract.PdfOpenError as e:
+        return jsonify({"message": "PDF 를 열 수 없음", "detail": str(e)}), 400
     except Exception as e:
 
         traceback.print_exc()
         return jsonify({"message": str(e)}), 500
 
 
-@app.post("/analyze")
-def analyze():
-    body = request.get_json()
-    source = body["source"]  # {"type":"url","url":"..."} or {"type":"inline"}
-
-    audio_bytes = None
-    mimetype = None
+@app.post("/extract_text/stream")
+def extract_text_stream():
+    """
+    /extract_text 의 쪽 단위 스트리밍 (NDJSON, 한 줄에 레코드 하나)
+      {"type": "meta", "page_count", "pages": [보낼 쪽 (1-based)]}
+      {"type": "page", "page", "text", "fallback"[, "truncated"]}   쪽마다 끝나는 대로
+      (전 쪽의 text 를 이어 붙여 strip 하면 /extract_text 의 result 와 같음)
+      {"type": "end", "pages_sent", "chars", "truncated", "reason"}
+    ?pages=1-3,7     보낼 쪽 범위 (1-based, 기본 전체)
+    ?max_chars=8000  누적 글자 수가 닿으면 그 쪽을 잘라 보내고 멈춤 (남은 쪽은 변환 안 함)
+    """
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"message": "파일 없음"}), 400
 
+    data = file.read()
+    try:
+        max_chars = int(request.args.get("max_chars", "0"))
+        count = pdf_extract.page_count(data)
+        pages = pdf_extract.parse_page_spec(request.args.get("pages"), count)
+    except pdf_extract.PdfOpenError as e:
+        return jsonify({"message": "PDF 를 열 수 없음", "detail": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    def stream():
+        meta = {"type": "meta", "page_count": count, "pages": [p + 1 for p in pages]}
+        yield json.dumps(meta) + "\n"
+        try:
+            for rec in pdf_extract.iter_pages(data, pages, max_chars):
+                yield json.dumps(rec, ensure_ascii=False) + "\n"
+        except Exception as e:
+            traceback.print_exc()
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return Response(
+        stream(),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sniff_audio_kind(b: bytes):
+    # WAV: RIFF....WAVE
+    if len(b) >= 12 and b[:4] == b"RIFF" and b[8:12] == b"WAVE":
+        return "wav"
+    # WebM: EBML 헤더 + 'webm' DocType 흔적
+    if len(b) >= 4 and b[:4] == bytes([0x1A, 0x45, 0xDF, 0xA3]):
+        if b"webm" in b[:4096].lower():
+            return "webm"
+    return None
+
+
+def _check_audio_kind(head: bytes, mimetype: str):
+    kind = _sniff_audio_kind(head)
+    if kind in ("wav", "webm") or mimetype in (
+        "audio/webm",
+        "video/webm",
+        "application/octet-stream",
+    ):
+        return kind
+    raise ValueError(f"지원하지 않는 오디오 형식: kind={kind}, mimetype={mimetype}")
+
+
+# 분석 입력 한도 (0 = 제한 없음). 디코딩을 끝까지 하기 전에 넘는 순간 멈추고 413
+#   ANALYZE_MAX_MB   인코딩된 원본 크기. Content-Length 가 있으면 본문을 받기 전에 확인
+#   ANALYZE_MAX_SEC  디코딩된 길이. 디코더 출력이 이 길이를 넘으면 ffmpeg 를 종료
+ANALYZE_MAX_BYTES = int(float(os.getenv("ANALYZE_MAX_MB", "256")) * 1024 * 1024)
+ANALYZE_MAX_SEC = float(os.getenv("ANALYZE_MAX_SEC", "1800"))
+# 이보다 긴 녹음은 디코딩한 PCM 을 임시 파일(PCM_SPILL_DIR, 기본 시스템 임시 폴더)에
+# 쓰고 memmap 으로 분석 (0 이면 항상 메모리)
+PCM_SPILL_SEC = float(os.getenv("PCM_SPILL_SEC", "300"))
+PCM_SPILL_DIR = os.getenv("PCM_SPILL_DIR") or None
+
+
+def _too_large(n_bytes: int) -> "AudioTooLargeError":
+    mb = ANALYZE_MAX_BYTES / 1024 / 1024
+    return AudioTooLargeError(
+        f"오디오가 최대 크기({mb:g}MB)를 넘습니다. ({n_bytes} bytes)"
+    )
+
+
+@contextmanager
+def _open_audio_source(source: dict):
+    """
+    source -> (본문 청크 이터레이터, mimetype, validator). url 이면 다운로드를 스트리밍
+    validator: 같은 객체임을 본문 없이 알 수 있는 값 (ETag + 길이), 없으면 None
+    크기를 미리 알 수 있으면(Content-Length / inline) 여기서 ANALYZE_MAX_BYTES 확인
+    """
     if source["type"] == "url":
-        r = requests.get(source["url"], stream=True, timeout=30)
-        r.raise_for_status()
-        audio_bytes = r.content
-        mimetype = r.headers.get("Content-Type", "application/octet-stream")
+        with object_store.open_stream(source["url"]) as r:
+            mimetype = r.headers.get("Content-Type", "application/octet-stream")
+            etag = r.headers.get("ETag")
+            length = r.headers.get("Content-Length")
+            if ANALYZE_MAX_BYTES and length and length.isdigit():
+                if int(length) > ANALYZE_MAX_BYTES:
+                    raise _too_large(int(length))
+            validator = f"etag:{etag}:{length}" if etag and length else None
+            yield object_store.iter_body(r), mimetype, validator
     elif source["type"] == "inline":
         audio_bytes = source.get("audio_bytes")
         mimetype = source.get("mimetype", "application/octet-stream")
+        if ANALYZE_MAX_BYTES and audio_bytes and len(audio_bytes) > ANALYZE_MAX_BYTES:
+            raise _too_large(len(audio_bytes))
+        yield iter([audio_bytes] if audio_bytes else []), mimetype, None
+    else:
+        yield iter([]), None, None
 
-    print(source)
-    print(mimetype)
 
-    if not audio_bytes:
-        return jsonify({"error": "오디오 데이터가 없습니다."}), 400
+def _hashing(chunks, h):
+    for chunk in chunks:
+        h.update(chunk)
+        yield chunk
 
-    def _sniff_audio_kind(b: bytes):
-        # WAV: RIFF....WAVE
-        if len(b) >= 12 and b[:4] == b"RIFF" and b[8:12] == b"WAVE":
-            return "wav"
-        # WebM: EBML 헤더 + 'webm' DocType 흔적
-        if len(b) >= 4 and b[:4] == bytes([0x1A, 0x45, 0xDF, 0xA3]):
-            if b"webm" in b[:4096].lower():
-                return "webm"
-        return None
 
-    kind = _sniff_audio_kind(audio_bytes)
+def _limit_bytes(chunks, max_bytes: int):
+    """길이를 모르는 본문: 누적 크기가 max_bytes 를 넘는 순간 예외 (디코더가 멈춤)"""
+    n = 0
+    for chunk in chunks:
+        n += len(chunk)
+        if max_bytes and n > max_bytes:
+            raise _too_large(n)
+        yield chunk
 
-    try:
-        if kind == "wav":
-            wav_bytes = audio_bytes
-        elif kind == "webm" or mimetype in (
-            "audio/webm",
-            "video/webm",
-            "application/octet-stream",
-        ):
-            wav_bytes = webm_to_wav_bytes(audio_bytes)
-        else:
-            raise ValueError(
-                f"지원하지 않는 오디오 형식: kind={kind}, mimetype={mimetype}"
-            )
-    except Exception as e:
-        app.logger.exception("webm 변환 실패")
-        return jsonify({"error": "webm→wav 변환 실패", "message": str(e)}), 500
 
-    segmentation = request.args.get("segmentation", "adaptive")
-    model = load_filler_model(model_path)
+class DecodedAudio(NamedTuple):
+    pcm: Optional[np.ndarray]
+    gain_db: Optional[float]
+    sha256: str
+    cached: Optional[tuple] = None  # 캐시 적중 시 (결과, tier)
 
-    params = None
-    if request.is_json:
-        body = request.get_json(silent=True) or {}
-        params = body.get("params")
 
-    try:
-        result = faster_run_filler_analysis_bytes(
-            audio_bytes=wav_bytes,
+class AnalysisInputError(ValueError):
+    """요청 쪽 문제(빈 오디오 등). /analyze 는 400 으로 응답"""
+
+
+class AudioTooLargeError(AnalysisInputError):
+    """ANALYZE_MAX_MB / ANALYZE_MAX_SEC 초과. /analyze 는 413 으로 응답"""
+
+
+class AudioDecodeError(RuntimeError):
+    pass
+
+
+def _decode_source(source: dict, progress=None, cache=None, key_of=None, timer=None):
+    """
+    source 다운로드 + 디코딩 -> DecodedAudio(16k/mono int16 PCM, gain dB, 원본 sha256)
+
+    cache / key_of(audio_sha256) 를 주면 결과 캐시를 먼저 찾는다.
+      - ETag 별칭으로 오디오 해시를 이미 알면 본문을 받기 전에
+      - 아니면 다운로드하면서 계산한 해시로 디코딩 직후에
+    적중하면 cached 에 (결과, tier) 를 담아 돌려준다.
+    timer: 선택. download / decode 단계 시간을 여기에 누적
+    """
+    report = progress or (lambda *a, **k: None)
+    timer = timer or StageTimer()
+
+    report("download", 0.0)
+    w0, c0 = time.perf_counter(), time.thread_time()
+    with _open_audio_source(source) as (chunks, mimetype, validator):
+        # 응답 헤더까지 + 이후 본문 청크를 기다린 시간
+        timer.add("download", time.perf_counter() - w0, time.thread_time() - c0)
+        chunks = timer.timed_iter("download", chunks)
+        # presigned URL 은 서명이 들어 있으므로 남기지 않음
+        app.logger.debug("audio source type=%s mimetype=%s", source["type"], mimetype)
+
+        known = None
+        if cache is not None and validator is not None:
+            known = cache.alias_get(validator)
+            if known is not None:
+                result, tier = cache.get(key_of(known))
+                if result is not None:
+                    return DecodedAudio(None, None, known, (result, tier))
+
+        # 포맷 판별용 앞부분만 먼저 받고, 나머지는 도착하는 대로 디코더에 흘려보냄
+        head, chunks = object_store.peek(chunks, 4096)
+        if not head:
+            raise AnalysisInputError("오디오 데이터가 없습니다.")
+
+        h = hashlib.sha256()
+        try:
+            _check_audio_kind(head, mimetype)
+            report("decode", 0.0)
+            # ffmpeg 한 번으로 16k/mono/int16 디코딩 + 피크 노멀라이즈
+            # (원본 바이트 해시는 디코더로 흘려보내면서 같이 계산)
+            with timer.stage("decode"):
+                pcm, gain = decode_normalized_pcm16(
+                    _hashing(_limit_bytes(chunks, ANALYZE_MAX_BYTES), h),
+                    max_samples=int(ANALYZE_MAX_SEC * 16000),
+                    spill_samples=int(PCM_SPILL_SEC * 16000),
+                    spill_dir=PCM_SPILL_DIR,
+                )
+        except AudioTooLargeError:
+            raise
+        except AudioLimitError as e:
+            raise AudioTooLargeError(str(e)) from e
+        except Exception as e:
+            raise AudioDecodeError(str(e)) from e
+    digest = h.hexdigest()
+    report("decode", 1.0, duration_ms=len(pcm) * 1000 // 16000)
+
+    if cache is not None and digest != known:
+        if validator is not None:
+            cache.alias_put(validator, digest)
+        result, tier = cache.get(key_of(digest))
+        if result is not None:
+            return DecodedAudio(pcm, gain, digest, (result, tier))
+    return DecodedAudio(pcm, gain, digest)
+
+
+def _cache_for(segmentation: str, params, use_cache: bool = True):
+    """(캐시, 오디오 해시 -> 캐시 키 함수). 캐시를 안 쓰면 (None, None)"""
+    cache = result_cache.get_cache() if use_cache else None
+    if cache is None:
+        return None, None
+    model_fp = model_runtime.model_fingerprint(model_path)
+    return cache, lambda h: result_cache.make_key(h, segmentation, params, model_fp)
+
+
+def _cache_diag(cache, audio: DecodedAudio) -> dict:
+    if cache is None:
+        return {"enabled": False, "hit": False}
+    return {
+        "enabled": True,
+        "hit": audio.cached is not None,
+        "tier": audio.cached[1] if audio.cached else None,
+        "audio_sha256": audio.sha256,
+    }
+
+
+def _memory_diag(pcm: np.ndarray) -> dict:
+    """디코딩된 PCM 크기 / 임시 파일로 내렸는지 (단계별 최대 RSS 는 diag.timings)"""
+    return {
+        "pcm_mb": round(pcm.nbytes / 2**20, 1),
+        "pcm_spilled": isinstance(pcm, np.memmap),
+    }
+
+
+def _with_timings(result: dict, timer: StageTimer, cached: bool = False) -> dict:
+    """요청 프로세스의 download / decode 시간을 diag.timings 앞에 붙이고 지표에 반영"""
+    diag = result["diag"]
+    # 캐시 결과의 timings 는 처음 계산했을 때 것이므로 이번 요청 것으로 바꿈
+    own = {} if cached else (diag.get("timings") or {})
+    diag["timings"] = {**timer.to_dict(), **own}
+    metrics.observe_analysis(diag, cached=cached)
+    return result
+
+
+def _run_analysis(
+    source: dict,
+    segmentation: str,
+    params,
+    progress=None,
+    use_cache: bool = True,
+    profile: bool = False,
+):
+    """
+    source 다운로드/디코딩 -> 분석. /analyze 와 /jobs/analyze 공용
+    profile: 분석(디코딩 이후) 부분을 cProfile 로 감싸 diag.profile 에 요약을 붙임
+    """
+    timer = StageTimer()
+    cache, key_of = _cache_for(segmentation, params, use_cache and not profile)
+    audio = _decode_source(source, progress, cache, key_of, timer)
+    if audio.cached is not None:
+        result = audio.cached[0]
+        result["diag"]["cache"] = _cache_diag(cache, audio)
+        return _with_timings(result, timer, cached=True)
+
+    pcm, gain = audio.pcm, audio.gain_db
+    if analysis_pool.enabled():
+        # 디코딩은 여기서, 나머지 CPU 작업은 모델이 올라가 있는 풀 워커에서
+        result = analysis_pool.analyze_pcm(
+            model_path,
+            pcm,
+            segmentation,
+            params,
+            gain,
+            progress=progress,
+            profile=profile,
+        )
+    else:
+        from core_filler import faster_run_filler_analysis_pcm
+
+        model = load_filler_model(model_path)
+        run = lambda: faster_run_filler_analysis_pcm(
+            pcm,
             model=model,
             segmentation=segmentation,
             params=params,
+            gain_db=gain,
+            progress=progress,
+        )
+        if profile:
+            result, prof = metrics.profile_call(run)
+            result["diag"]["profile"] = prof
+        else:
+            result = run()
+    if cache is not None:
+        cache.put(key_of(audio.sha256), audio.sha256, result)
+    result["diag"]["cache"] = _cache_diag(cache, audio)
+    result["diag"]["memory"] = _memory_diag(pcm)
+    return _with_timings(result, timer)
+
+
+def _error_body(e: Exception) -> dict:
+    if isinstance(e, AnalysisInputError):
+        return {"error": str(e)}
+    if isinstance(e, AudioDecodeError):
+        return {"error": "오디오 디코딩 실패", "message": str(e)}
+    return {"error": "서버 내부 오류", "message": str(e)}
+
+
+@app.post("/analyze")
+def analyze():
+    body = request.get_json()
+    source = body["source"]  # {"type":"url","url":"..."} or {"type":"inline"}
+    segmentation = request.args.get("segmentation", "adaptive")
+    params = body.get("params")
+
+    use_cache = request.args.get("cache", "1") != "0"
+    profile = _profile_requested()
+
+    try:
+        result = _run_analysis(
+            source, segmentation, params, use_cache=use_cache, profile=profile
         )
         return jsonify(result)
+    except AudioTooLargeError as e:
+        return jsonify(_error_body(e)), 413
+    except AnalysisInputError as e:
+        return jsonify(_error_body(e)), 400
+    except AudioDecodeError as e:
+        app.logger.exception("오디오 디코딩 실패")
+        return jsonify(_error_body(e)), 500
     except Exception as e:
         app.logger.exception("voice_metrics error")
-        return jsonify({"error": "서버 내부 오류", "message": str(e)}), 500
+        return jsonify(_error_body(e)), 500
+
+
+# 한 세션의 여러 답변을 한 번에 분석
+# body: {"items": [{"id": "...", "source": {...}}, ...], "params": {...}}
+# 다운로드/디코딩/후보 필터는 item 별로 동시에, 모델 점수는 모든 item 의 윈도우를 모아서 한 번에
+# (프로세스 풀 모드면 후보 필터는 item 별로 풀 워커에서(analysis_pool.plan_pcm), 공유
+#  배치도 풀 워커들이 나눠 계산(analysis_pool.score_plans). 요청 스레드는 디코딩만)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "32"))
+BATCH_FETCH_WORKERS = int(os.getenv("BATCH_FETCH_WORKERS", "4"))
+
+
+@app.post("/analyze/batch")
+def analyze_batch():
+    body = request.get_json()
+    items = body.get("items") or []
+    segmentation = request.args.get("segmentation", "adaptive")
+    params = body.get("params")
+
+    if not items:
+        return jsonify({"error": "items 가 비어 있습니다."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        msg = f"items 는 최대 {BATCH_MAX_ITEMS}개까지 가능합니다."
+        return jsonify({"error": msg}), 400
+    ids = [str(it.get("id", i)) for i, it in enumerate(items)]
+    if len(set(ids)) != len(ids):
+        return jsonify({"error": "items 의 id 가 중복됩니다."}), 400
+    use_cache = request.args.get("cache", "1") != "0"
+
+    out = {}
+    import func_filler as ff
+    from core_filler import (
+        plan_filler_windows,
+        score_window_plan,
+        score_window_plans,
+        finish_filler_analysis,
+    )
+
+    cache, key_of = _cache_for(segmentation, params, use_cache)
+
+    def _prepare(item):
+        timer = StageTimer()
+        audio = _decode_source(item["source"], cache=cache, key_of=key_of, timer=timer)
+        if audio.cached is not None:
+            return audio, None, timer
+        if analysis_pool.enabled():
+            plan = analysis_pool.plan_pcm(
+                model_path, audio.pcm, segmentation, params, audio.gain_db
+            )
+        else:
+            plan = plan_filler_windows(audio.pcm, segmentation, params, audio.gain_db)
+        return audio, plan, timer
+
+    plans = {}
+    audios = {}
+    timers = {}
+    with ThreadPoolExecutor(max_workers=min(BATCH_FETCH_WORKERS, len(items))) as ex:
+        futures = {i: ex.submit(_prepare, it) for i, it in zip(ids, items)}
+        for i, fut in futures.items():
+            try:
+                audios[i], plan, timers[i] = fut.result()
+                if plan is not None:
+                    plans[i] = plan
+                else:
+                    # 캐시 적중: 모델 점수 계산 없이 바로 결과
+                    result = audios[i].cached[0]
+                    result["diag"]["cache"] = _cache_diag(cache, audios[i])
+                    _with_timings(result, timers[i], cached=True)
+                    out[i] = {"status": "ok", "result": result}
+            except Exception as e:
+                app.logger.exception("batch item 준비 실패: %s", i)
+                out[i] = {"status": "error", **_error_body(e)}
+
+    # 전부 캐시 적중이면 모델을 건드리지 않음. 프로세스 풀 모드면 요청 프로세스에는
+    # 모델을 올리지 않고 풀 워커들이 공유 배치를 나눠 계산
+    pooled = analysis_pool.enabled()
+    model = load_filler_model(model_path) if plans and not pooled else None
+    p = params or {}
+    batch_size = int(p.get("infer_batch_size", ff.INFER_BATCH_SIZE))
+
+    def _score(keys):
+        if pooled:
+            pcms = [audios[i].pcm for i in keys]
+            return analysis_pool.score_plans(
+                model_path, [plans[i] for i in keys], pcms, batch_size
+            )
+        return score_window_plans([plans[i] for i in keys], model, batch_size)
+
+    ready = list(plans)
+    inference = None
+    try:
+        probs, inference = _score(ready)
+        scored = dict(zip(ready, probs))
+        metrics.observe_timings(inference["timings"])
+    except Exception:
+        # 공유 배치가 실패하면 item 별로 따로 계산해서 실패를 격리
+        app.logger.exception("batch 공유 추론 실패 - item 별로 재시도")
+        scored = {}
+
+    for i in ready:
+        try:
+            if i in scored:
+                result = finish_filler_analysis(plans[i], scored[i], inference)
+            elif pooled:
+                pr, inf = _score([i])
+                result = finish_filler_analysis(plans[i], pr[0], inf)
+            else:
+                pr, inf = score_window_plan(plans[i], model)
+                result = finish_filler_analysis(plans[i], pr, inf)
+            if cache is not None:
+                cache.put(key_of(audios[i].sha256), audios[i].sha256, result)
+            result["diag"]["cache"] = _cache_diag(cache, audios[i])
+            result["diag"]["memory"] = _memory_diag(audios[i].pcm)
+            _with_timings(result, timers[i])
+            out[i] = {"status": "ok", "result": result}
+        except Exception as e:
+            app.logger.exception("batch item 분석 실패: %s", i)
+            out[i] = {"status": "error", **_error_body(e)}
+
+    return jsonify(
+        {
+            "items": {i: out[i] for i in ids},
+            "diag": {**_batch_diag(out), "inference": inference},
+        }
+    )
+
+
+def _batch_diag(out: dict) -> dict:
+    return {
+        "count": len(out),
+        "ok": sum(1 for v in out.values() if v["status"] == "ok"),
+        "failed": sum(1 for v in out.values() if v["status"] != "ok"),
+    }
+
+
+# ---- 결과 캐시 조회 / 무효화 ----
+# 무효화(DELETE)는 CACHE_ADMIN_TOKEN 을 설정했을 때만, 같은 값을
+# "Authorization: Bearer <token>" 으로 보낸 요청만 허용 (설정 안 하면 403)
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+
+
+def _cache_admin_allowed() -> bool:
+    if not CACHE_ADMIN_TOKEN:
+        return False
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        token.strip().encode("utf-8"), CACHE_ADMIN_TOKEN.encode("utf-8")
+    )
+
+
+@app.get("/cache")
+def cache_info():
+    cache = result_cache.get_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(cache.info())
+
+
+@app.get("/cache/<key>")
+def cache_entry(key):
+    try:
+        result_cache.check_digest(key)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cache = result_cache.get_cache()
+    tier = cache.contains(key) if cache is not None else None
+    if tier is None:
+        return jsonify({"key": key, "cached": False}), 404
+    return jsonify({"key": key, "cached": True, "tier": tier})
+
+
+# DELETE /cache                    전체
+# DELETE /cache?audio_sha256=...   특정 오디오의 모든 결과
+# DELETE /cache/<key>              항목 하나
+@app.delete("/cache")
+@app.delete("/cache/<key>")
+def cache_invalidate(key=None):
+    if not _cache_admin_allowed():
+        return jsonify({"error": "캐시 무효화 권한이 없습니다."}), 403
+    audio_sha256 = request.args.get("audio_sha256")
+    try:
+        if key is not None:
+            result_cache.check_digest(key)
+        if audio_sha256 is not None:
+            result_cache.check_digest(audio_sha256, "audio_sha256")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cache = result_cache.get_cache()
+    if cache is None:
+        return jsonify({"enabled": False, "removed": 0})
+    removed = cache.invalidate(key=key, audio_sha256=audio_sha256)
+    return jsonify({"removed": removed})
+
+
+# ---- 비동기 분석 작업 ----
+# POST 로 job 을 만들고 바로 202 를 돌려준 뒤, 진행 상황은 SSE 로 구독
+job_manager = JobManager()
+
+
+@app.post("/jobs/analyze")
+def submit_analyze_job():
+    body = request.get_json()
+    source = body["source"]
+    segmentation = request.args.get("segmentation", "adaptive")
+    params = body.get("params")
+    profile = _profile_requested()
+
+    try:
+        job = job_manager.submit(
+            "analyze",
+            lambda job: _run_analysis(
+                source, segmentation, params, progress=job.report, profile=profile
+            ),
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    return (
+        jsonify(
+            {
+                "job_id": job.id,
+                "state": job.state,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            }
+        ),
+        202,
+    )
+
+
+@app.get("/jobs/<job_id>")
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "job 을 찾을 수 없습니다."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.get("/jobs/<job_id>/events")
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "job 을 찾을 수 없습니다."}), 404
+
+    # 재연결 시 Last-Event-ID 다음 이벤트부터 이어서 전송
+    last_id = request.headers.get("Last-Event-ID")
+    start = int(last_id) + 1 if last_id and last_id.isdigit() else 0
+
+    def stream():
+        for i, ev in job.iter_events(start):
+            yield sse_format(i, ev)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---- 스트리밍 분석 세션 ----
+# 녹음 중에 청크를 보내 미리 분석해 두고, close 하면 최종 결과 (stream_session 참고)
+# 입력 한도는 /analyze 와 같음: 청크 하나 / 세션 전체 원본 바이트, 디코딩된 길이 (413)
+# 디코딩된 PCM 과 인덱스는 세션마다 PCM_SPILL_DIR 의 임시 파일에 쌓음
+stream_manager = StreamManager(
+    max_bytes=ANALYZE_MAX_BYTES, max_sec=ANALYZE_MAX_SEC, spool_dir=PCM_SPILL_DIR
+)
+
+
+@app.post("/stream")
+def open_stream():
+    body = request.get_json(silent=True) or {}
+    segmentation = request.args.get("segmentation", "adaptive")
+    try:
+        session = stream_manager.open(
+            model_path, segmentation, body.get("params"), body.get("format", "auto")
+        )
+    except stream_session.StreamInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except stream_session.StreamLimitError as e:
+        return jsonify({"error": str(e)}), 429
+    return (
+        jsonify(
+            {
+                **session.to_dict(),
+                "append_url": f"/stream/{session.id}/append",
+                "close_url": f"/stream/{session.id}/close",
+            }
+        ),
+        201,
+    )
+
+
+@app.get("/stream/<stream_id>")
+def get_stream(stream_id):
+    session = stream_manager.get(stream_id)
+    if session is None:
+        return jsonify({"error": "스트리밍 세션을 찾을 수 없습니다."}), 404
+    return jsonify(session.to_dict())
+
+
+_BODY_READ_CHUNK = 1 << 16
+
+
+def _read_body(max_bytes: int) -> bytes:
+    """
+    요청 본문 전체. max_bytes 를 넘으면 AudioTooLargeError (Content-Length 가 있으면 받기
+    전에, 없으면(chunked) 받으면서 넘는 순간)
+    """
+    length = request.content_length
+    if max_bytes and length is not None and length > max_bytes:
+        raise _too_large(length)
+    buf = bytearray()
+    while True:
+        chunk = request.stream.read(_BODY_READ_CHUNK)
+        if not chunk:
+            return bytes(buf)
+        buf += chunk
+        if max_bytes and len(buf) > max_bytes:
+            raise _too_large(len(buf))
+
+
+# 본문 = 녹음 청크 원본 바이트 (MediaRecorder 조각을 순서대로)
+@app.post("/stream/<stream_id>/append")
+def append_stream(stream_id):
+    session = stream_manager.get(stream_id)
+    if session is None:
+        return jsonify({"error": "스트리밍 세션을 찾을 수 없습니다."}), 404
+    try:
+        session.append(_read_body(ANALYZE_MAX_BYTES))
+    except AudioTooLargeError as e:
+        # 본문을 다 받지 않았으므로 세션도 더 이어 갈 수 없음
+        stream_manager.remove(stream_id)
+        return jsonify(_error_body(e)), 413
+    except stream_session.StreamTooLargeError as e:
+        stream_manager.remove(stream_id)
+        return jsonify({"error": str(e)}), 413
+    except stream_session.StreamStateError as e:
+        return jsonify({"error": str(e)}), 409
+    except stream_session.StreamDecodeError as e:
+        stream_manager.remove(stream_id)
+        return jsonify({"error": "오디오 디코딩 실패", "message": str(e)}), 500
+    return jsonify(session.to_dict())
+
+
+@app.post("/stream/<stream_id>/close")
+def close_stream(stream_id):
+    session = stream_manager.get(stream_id)
+    if session is None:
+        return jsonify({"error": "스트리밍 세션을 찾을 수 없습니다."}), 404
+    use_cache = request.args.get("cache", "1") != "0"
+    cache, key_of = _cache_for(session.segmentation, session.params, use_cache)
+    try:
+        result = session.close()
+    except stream_session.StreamStateError as e:
+        return jsonify({"error": str(e)}), 409
+    except stream_session.StreamTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
+    except stream_session.StreamInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except stream_session.StreamDecodeError as e:
+        return jsonify({"error": "오디오 디코딩 실패", "message": str(e)}), 500
+    except Exception as e:
+        app.logger.exception("stream close error")
+        return jsonify(_error_body(e)), 500
+    finally:
+        if session.state != stream_session.CLOSING:
+            stream_manager.remove(stream_id)
+
+    # 같은 녹음을 나중에 /analyze 로 다시 요청하면 캐시에서 바로 응답
+    audio = DecodedAudio(None, None, session.sha256)
+    if cache is not None:
+        cache.put(key_of(audio.sha256), audio.sha256, result)
+    result["diag"]["cache"] = _cache_diag(cache, audio)
+    metrics.observe_analysis(result["diag"])
+    return jsonify(result)
+
+
+@app.delete("/stream/<stream_id>")
+def abort_stream(stream_id):
+    session = stream_manager.remove(stream_id)
+    if session is None:
+        return jsonify({"error": "스트리밍 세션을 찾을 수 없습니다."}), 404
+    return jsonify({"stream_id": stream_id, "state": session.state})
 
 
 if __name__ == "__main__":
+    model_runtime.start_preload(model_path)
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,505 @@
+"""
+분석 단계별 시간 측정 (diag.timings) + Prometheus 지표 (/metrics) + 요청별 cProfile.
+
+단계 (diag.timings 의 키, 값은 {"wall_ms", "cpu_ms", "peak_rss_mb"})
+  download      오디오 본문을 기다린 시간 (헤더 + 청크 수신 대기)
+  decode        ffmpeg 디코딩 + 피크 노멀라이즈. 다운로드와 겹쳐서 진행되므로
+                download 대기 시간이 일부 포함된다
+  vad           녹음 전체 WebRTC VAD 비트맵
+  segmentation  에너지 인덱스 / 적응형 임계값 / 발화 구간 검출
+  window_filter 슬라이딩 윈도우 + 후보 필터
+  mfcc          후보 윈도우 특징 추출 (배치별로 합산)
+  predict       모델 추론 (배치별로 합산, remote 면 사이드카 왕복 포함)
+  chunks        청크 분할 분석에서 요청 프로세스가 워커들의 청크 점수를 기다린 시간.
+                이때 mfcc / predict 는 워커들이 동시에 쓴 시간의 합이라 이보다 길 수 있음
+  nms           neighbor support / NMS / 인접 병합
+  aggregation   구간 연산 + 지표 집계
+
+cpu_ms 는 time.thread_time (그 단계를 실행한 스레드만). TF 내부 스레드 풀, ffmpeg
+자식 프로세스, 추론 사이드카의 CPU 는 빠지므로 decode / predict 는 wall 기준으로 볼 것.
+peak_rss_mb 는 그 단계가 열려 있는 동안의 프로세스 최대 RSS (_PeakRss 참고). 분석 풀
+워커에서는 워커 하나가 한 번에 한 건만 돌리므로 그 분석의 값이고, 요청 프로세스
+(download / decode, inline 실행)에서는 동시에 도는 다른 요청의 메모리도 포함된다.
+
+지표는 프로세스 메모리에 모은다 (jobs 와 같이 gunicorn 워커 1개 전제).
+분석 풀 워커에서 실행된 단계도 결과의 diag.timings 로 요청 프로세스에서 집계한다.
+prometheus_client 없이 text exposition format(0.0.4)으로 직접 출력한다.
+
+환경변수
+  PROFILE_ALLOW  1이면 ?profile=1 요청에 cProfile 요약을 diag.profile 로 붙임 (기본 0)
+  PROFILE_TOP    diag.profile 에 남길 함수 수, 누적 시간 순 (기본 40)
+  STAGE_MEMORY   1(기본)이면 단계별 peak_rss_mb 측정 | 0
+"""
+
+from __future__ import annotations
+import bisect
+import cProfile
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+PROFILE_ALLOW = os.getenv("PROFILE_ALLOW", "0") == "1"
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "40"))
+STAGE_MEMORY = os.getenv("STAGE_MEMORY", "1") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 초 단위. 단계(수 ms) ~ 긴 녹음 요청(수십 초)까지
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+
+# ---- 단계별 최대 RSS ----------------------------------------------------
+def _vm_hwm() -> int | None:
+    """VmHWM: 이 프로세스의 최대 RSS (bytes). /proc 이 없으면 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _PeakRss:
+    """
+    단계가 열려 있는 동안의 프로세스 최대 RSS.
+
+    단계를 시작할 때 /proc/self/clear_refs 에 5 를 써서 VmHWM 을 현재 RSS 로 되돌리고,
+    끝날 때 VmHWM 을 읽는다. 되돌리기 직전 값은 열려 있는 모든 단계와 lifetime 에
+    먼저 반영하므로 단계가 겹쳐도(중첩 / 다른 요청 스레드) 각 단계의 값이 줄지 않는다.
+    clear_refs 를 쓸 수 없는 환경이면 시작 / 끝 RSS 중 큰 값 (사이의 순간 최대는 놓침).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[int, int] = {}  # 토큰 -> 지금까지의 최대
+        self._next = 0
+        self.resettable = True
+        self.lifetime = 0  # 되돌리기 전 VmHWM 들의 최대 (= 되돌리지 않았을 때의 VmHWM)
+
+    def _fold(self):
+        now = _vm_hwm() if self.resettable else _rss_of("self")
+        if now is None:
+            return
+        for k, v in self._open.items():
+            if now > v:
+                self._open[k] = now
+        self.lifetime = max(self.lifetime, now)
+
+    def begin(self) -> int:
+        with self._lock:
+            self._fold()
+            if self.resettable:
+                try:
+                    with open("/proc/self/clear_refs", "w") as f:
+                        f.write("5")
+                except OSError:
+                    self.resettable = False
+            token = self._next
+            self._next += 1
+            self._open[token] = _rss_of("self") or 0
+            return token
+
+    def end(self, token: int) -> int:
+        with self._lock:
+            self._fold()
+            return self._open.pop(token)
+
+    def process_peak(self) -> int:
+        """프로세스 전체 기간의 최대 RSS (clear_refs 로 되돌린 것과 무관)"""
+        with self._lock:
+            self._fold()
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            return max(self.lifetime, rss)
+
+
+_peak_rss = _PeakRss()
+
+
+# ---- 단계 타이머 ---------------------------------------------------------
+class StageTimer:
+    """
+    단계별 wall / CPU 시간 누적 (같은 이름은 합산: 배치 루프의 mfcc / predict 등)
+    memory=True 면 stage() 구간의 최대 RSS 도 기록 (같은 이름은 최대값)
+    """
+
+    def __init__(self, memory: bool = STAGE_MEMORY):
+        self.memory = memory
+        self._stages: Dict[str, list] = {}  # name -> [wall, cpu, peak_rss | None]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        token = _peak_rss.begin() if self.memory else None
+        w0, c0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - w0, time.thread_time() - c0
+            peak = _peak_rss.end(token) if token is not None else None
+            self.add(name, wall, cpu, peak)
+
+    def add(
+        self,
+        name: str,
+        wall_sec: float,
+        cpu_sec: float = 0.0,
+        peak_rss: int | None = None,
+    ):
+        with self._lock:
+            acc = self._stages.setdefault(name, [0.0, 0.0, None])
+            acc[0] += wall_sec
+            acc[1] += cpu_sec
+            if peak_rss is not None:
+                acc[2] = max(acc[2] or 0, peak_rss)
+
+    def merge(self, timings: Dict[str, Dict[str, float]]):
+        """다른 프로세스가 보낸 to_dict() 결과를 더함 (풀 워커의 mfcc / predict 등)"""
+        for name, t in timings.items():
+            peak = t.get("peak_rss_mb")
+            self.add(
+                name,
+                t["wall_ms"] / 1e3,
+                t["cpu_ms"] / 1e3,
+                int(peak * 2**20) if peak is not None else None,
+            )
+
+    def timed_iter(self, name: str, it: Iterable[bytes]) -> Iterator[bytes]:
+        """이터레이터가 다음 값을 내줄 때까지 기다린 시간을 name 단계로 누적 (다운로드 대기)"""
+        it = iter(it)
+        while True:
+            w0, c0 = time.perf_counter(), time.thread_time()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.add(name, time.perf_counter() - w0, time.thread_time() - c0)
+            yield chunk
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for k, (w, c, peak) in self._stages.items():
+                out[k] = {"wall_ms": round(w * 1e3, 3), "cpu_ms": round(c * 1e3, 3)}
+                if peak is not None:
+                    out[k]["peak_rss_mb"] = round(peak / 2**20, 1)
+            return out
+
+
+# ---- Prometheus 지표 ----------------------------------------------------
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[k]) for k in self.labels)
+
+    def _fmt(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        super().__init__(name, help_, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._fmt(k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """값을 set 하거나, fn 을 주면 수집할 때마다 fn() -> {라벨 튜플: 값} 으로 읽음"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_, labels=(), fn: Callable[[], Dict] | None = None):
+        super().__init__(name, help_, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self._fn is not None:
+            try:
+                values = self._fn()
+            except Exception:
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            f"{self.name}{self._fmt(k)} {_num(v)}"
+            for k, v in sorted(values.items())
+            if v is not None
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 -> [버킷별 개수 (마지막은 +Inf), 합, 개수]
+        self._data: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            d = self._data.get(key)
+            if d is None:
+                d = self._data[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            d[0][i] += 1
+            d[1] += value
+            d[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._data.items())
+        out = []
+        for key, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                out.append(
+                    f"{self.name}_bucket{self._fmt(key, (('le', _num(le)),))} {acc}"
+                )
+            out.append(f"{self.name}_sum{self._fmt(key)} {_num(total)}")
+            out.append(f"{self.name}_count{self._fmt(key)} {n}")
+        return out
+
+
+def render() -> str:
+    lines = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- 프로세스 메모리 ----------------------------------------------------
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_of(pid) -> int | None:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _children_rss() -> int | None:
+    """이 프로세스의 직계 자식(분석 풀 워커, ffmpeg 등) RSS 합. /proc 이 없으면 None"""
+    me = os.getpid()
+    total = 0
+    try:
+        pids = [p for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # pid (comm) state ppid ... comm 에 공백/괄호가 있을 수 있어 마지막 ')' 기준
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == me:
+            total += _rss_of(pid) or 0
+    return total
+
+
+def _memory_values() -> Dict[Tuple[str, ...], float]:
+    rss = _rss_of("self")
+    if rss is None:
+        # /proc 이 없는 환경: 최대 RSS 로 대신 (Linux 는 KB 단위)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {(): rss}
+
+
+# ---- 지표 정의 ----------------------------------------------------------
+HTTP_SECONDS = Histogram(
+    "filler_http_request_duration_seconds",
+    "HTTP request latency by route (time to response headers)",
+    ("route", "method", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "filler_stage_duration_seconds",
+    "Analysis stage wall time (see diag.timings)",
+    ("stage",),
+)
+STAGE_CPU = Counter(
+    "filler_stage_cpu_seconds_total",
+    "Analysis stage CPU time of the executing thread",
+    ("stage",),
+)
+ANALYSES = Counter(
+    "filler_analyses_total",
+    "Analyses served, by whether the result came from the result cache",
+    ("result",),
+)
+WINDOWS_SCORED = Counter(
+    "filler_windows_scored_total", "Candidate windows scored by the model"
+)
+WINDOWS_DROPPED = Counter(
+    "filler_windows_dropped_total",
+    "Windows dropped by candidate filters and the probability threshold",
+    ("reason",),
+)
+
+
+def _model_load_values():
+    import model_runtime
+
+    st = model_runtime.status()
+    return {("load",): st.get("load_sec"), ("warmup",): st.get("warmup_sec")}
+
+
+Gauge(
+    "filler_model_load_seconds",
+    "Model load / warmup time of this worker",
+    ("phase",),
+    fn=_model_load_values,
+)
+Gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of this process",
+    fn=_memory_values,
+)
+Gauge(
+    "filler_process_peak_resident_memory_bytes",
+    "Peak resident memory of this process",
+    fn=lambda: {(): _peak_rss.process_peak()},
+)
+Gauge(
+    "filler_children_resident_memory_bytes",
+    "Resident memory of child processes (analysis pool workers, ffmpeg)",
+    fn=lambda: {(): _children_rss()},
+)
+
+
+def observe_timings(timings: Dict[str, Dict[str, float]]):
+    for stage, t in (timings or {}).items():
+        STAGE_SECONDS.observe(t["wall_ms"] / 1e3, stage=stage)
+        STAGE_CPU.inc(t["cpu_ms"] / 1e3, stage=stage)
+
+
+def observe_analysis(diag: Dict[str, Any], cached: bool = False):
+    """분석 결과 diag 하나를 지표에 반영 (요청 프로세스에서 결과마다 한 번)"""
+    observe_timings(diag.get("timings"))
+    ANALYSES.inc(result="cache_hit" if cached else "analyzed")
+    if cached:
+        return
+    scored = (diag.get("inference") or {}).get("scored")
+    if scored:
+        WINDOWS_SCORED.inc(scored)
+    for reason, n in (diag.get("drops") or {}).items():
+        if n:
+            WINDOWS_DROPPED.inc(n, reason=reason)
+
+
+# ---- cProfile -----------------------------------------------------------
+# Python 3.12+ 의 cProfile 은 인터프리터 전역이라 동시에 하나만 켤 수 있다
+_profile_lock = threading.Lock()
+
+
+def profile_call(fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """fn 을 cProfile 로 감싸 실행 -> (반환값, 요약). 다른 요청이 프로파일 중이면 그냥 실행"""
+    if not _profile_lock.acquire(blocking=False):
+        return fn(*args, **kwargs), {"error": "다른 요청이 프로파일 중입니다."}
+    try:
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            out = fn(*args, **kwargs)
+        finally:
+            prof.disable()
+        return out, profile_summary(prof)
+    finally:
+        _profile_lock.release()
+
+
+def profile_summary(prof: cProfile.Profile, top: int = PROFILE_TOP) -> Dict[str, Any]:
+    """누적 시간 상위 top 개 함수 (JSON 으로 보낼 수 있게 dict 목록)"""
+    import pstats
+
+    st = pstats.Stats(prof)
+    rows = sorted(st.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:top]
+    return {
+        "sort": "cumulative",
+        "total_calls": st.total_calls,
+        "total_ms": round(st.total_tt * 1e3, 3),
+        "top": [
+            {
+                "func": f"{os.path.basename(file)}:{line}({name})",
+                "ncalls": nc,
+                "tottime_ms": round(tt * 1e3, 3),
+                "cumtime_ms": round(ct * 1e3, 3),
+            }
+            for (file, line, name), (cc, nc, tt, ct, _) in rows
+        ],
+    }
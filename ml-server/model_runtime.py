@@ -0,0 +1,157 @@
+"""
+filler 모델 로드 / 워밍업 / 준비 상태.
+
+TensorFlow 는 실제로 모델이 필요할 때만 import 한다 (백엔드는 inference_backend 참고).
+(/convert_seekable, /extract_text 만 처리하는 워커는 TF 를 올리지 않음)
+
+- load_filler_model: 경로별로 한 번만 로드 (lru_cache)
+- warmup: 실제 추론과 같은 배치 크기의 더미 입력으로 predict 를 미리 한 번 돌려
+  첫 요청에서 그래프 트레이싱 비용을 내지 않게 함
+- start_preload: 워커 기동 직후 백그라운드에서 로드 + 워밍업, /ready 가 이 상태를 보고함
+- recover_pool: 프로세스 풀 모드에서 풀 워커가 죽어 풀이 깨졌으면 버리고 다시
+  preload (새 워커들이 모델을 다 올릴 때까지 /ready 는 503)
+
+환경변수
+  MODEL_PRELOAD  1(기본)이면 워커 기동 시 모델을 미리 로드/워밍업
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1"
+
+# 입력 형태: (N, n_mfcc, T, 1)
+INPUT_SHAPE = (20, 40, 1)
+
+_state = {
+    "state": "idle",  # idle | loading | ready | failed
+    "model_path": None,
+    "load_sec": None,
+    "warmup_sec": None,
+    "error": None,
+}
+_state_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2)
+def load_filler_model(model_path: str):
+    """INFER_BACKEND / INFER_QUANT 에 따라 keras / tflite / onnx 백엔드 로드"""
+    import inference_backend
+
+    return inference_backend.load(model_path)
+
+
+_fp_cache: dict = {}
+
+
+def model_fingerprint(model_path: str) -> str:
+    """모델 파일 내용 해시 + 추론 백엔드/양자화 (결과 캐시 키에 사용)"""
+    import inference_backend
+
+    try:
+        st = os.stat(model_path)
+        stamp = (model_path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = (model_path, None, None)
+    digest = _fp_cache.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        try:
+            with open(model_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except OSError:
+            h.update(model_path.encode("utf-8"))
+        digest = _fp_cache[stamp] = h.hexdigest()[:16]
+    backend, quant = inference_backend.BACKEND, inference_backend.QUANT
+    if backend == "remote":
+        # 실제 추론은 사이드카 백엔드가 하므로 그 설정으로 지문을 만든다
+        import inference_server
+
+        backend = inference_server.SIDECAR_BACKEND
+        quant = inference_server.SIDECAR_QUANT
+    return f"{digest}:{backend}:{quant}"
+
+
+def warmup(model, batch_sizes=None):
+    """실제로 쓰는 배치 크기들로 더미 추론 (predict_on_batch 는 입력 shape 별로 트레이싱)"""
+    import func_filler as ff
+
+    if batch_sizes is None:
+        batch_sizes = (ff.INFER_BATCH_SIZE, 1)
+    for n in batch_sizes:
+        ff.predict_filler_probs(
+            model, np.zeros((n, *INPUT_SHAPE), dtype=np.float32), batch_size=n
+        )
+
+
+def preload(model_path: str):
+    """모델 로드 + 워밍업 (프로세스 풀 모드면 풀 워커들까지)"""
+    import analysis_pool
+
+    with _state_lock:
+        if _state["state"] in ("loading", "ready"):
+            return
+        _state.update(state="loading", model_path=model_path, error=None)
+    try:
+        t0 = time.perf_counter()
+        if analysis_pool.enabled():
+            # 요청 프로세스는 모델이 필요 없음. 워커들이 initializer 에서 로드 + 워밍업
+            analysis_pool.warmup(model_path)
+            load_sec, warm_sec = time.perf_counter() - t0, 0.0
+        else:
+            model = load_filler_model(model_path)
+            t1 = time.perf_counter()
+            warmup(model)
+            load_sec, warm_sec = t1 - t0, time.perf_counter() - t1
+        with _state_lock:
+            _state.update(
+                state="ready",
+                load_sec=round(load_sec, 3),
+                warmup_sec=round(warm_sec, 3),
+            )
+    except Exception as e:
+        with _state_lock:
+            _state.update(state="failed", error=str(e))
+        raise
+
+
+def start_preload(model_path: str):
+    """백그라운드 스레드에서 preload (gunicorn post_worker_init 에서 호출)"""
+    if not PRELOAD:
+        return
+    threading.Thread(
+        target=preload, args=(model_path,), name="model-preload", daemon=True
+    ).start()
+
+
+def recover_pool() -> bool:
+    """분석 풀이 깨져 있었으면 버리고 백그라운드에서 다시 preload. 깨져 있었으면 True"""
+    import analysis_pool
+
+    if not analysis_pool.enabled() or not analysis_pool.discard_broken_pool():
+        return False
+    with _state_lock:
+        model_path = _state["model_path"]
+        if _state["state"] == "ready":
+            _state.update(state="idle", error="analysis pool broken; restarting")
+    if model_path:
+        threading.Thread(
+            target=preload, args=(model_path,), name="model-preload", daemon=True
+        ).start()
+    return True
+
+
+def status() -> dict:
+    with _state_lock:
+        return dict(_state)
+
+
+def is_ready() -> bool:
+    return _state["state"] == "ready"
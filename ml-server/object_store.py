@@ -0,0 +1,99 @@
+"""
+Object Storage(presigned URL) 다운로드.
+
+- 프로세스당 하나의 keep-alive 세션(커넥션 풀)을 재사용
+- 연결/5xx 실패는 urllib3 Retry 로 재시도 (본문 스트리밍이 시작된 뒤의 끊김은 재시도하지 않음)
+- 본문은 청크 단위로 흘려보내서 디코더(ffmpeg)가 다운로드와 동시에 돌 수 있게 함
+
+환경변수
+  FETCH_CONNECT_TIMEOUT  연결 타임아웃(초, 기본 5)
+  FETCH_READ_TIMEOUT     청크 사이 읽기 타임아웃(초, 기본 30)
+  FETCH_RETRIES          재시도 횟수 (기본 3)
+  FETCH_BACKOFF          재시도 backoff factor (기본 0.3)
+  FETCH_POOL_SIZE        호스트당 커넥션 풀 크기 (기본 4)
+  FETCH_CHUNK_BYTES      스트리밍 청크 크기 (기본 64KB)
+"""
+
+from __future__ import annotations
+import os
+import threading
+from contextlib import contextmanager
+from itertools import chain
+from typing import Iterator, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "30"))
+RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.3"))
+POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "4"))
+CHUNK_BYTES = int(os.getenv("FETCH_CHUNK_BYTES", str(64 * 1024)))
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry
+    )
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session() -> requests.Session:
+    """프로세스 공용 keep-alive 세션 (gunicorn fork 이후 워커별로 생성됨)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+@contextmanager
+def open_stream(url: str):
+    """
+    GET 요청을 스트리밍 모드로 연다.
+    with 블록이 끝나면 응답을 닫아서 커넥션을 풀로 돌려준다.
+    """
+    r = get_session().get(url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    try:
+        r.raise_for_status()
+        yield r
+    finally:
+        r.close()
+
+
+def iter_body(r: requests.Response, chunk_size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    for chunk in r.iter_content(chunk_size=chunk_size):
+        if chunk:
+            yield chunk
+
+
+def peek(chunks: Iterator[bytes], n: int) -> Tuple[bytes, Iterator[bytes]]:
+    """앞쪽 n 바이트(포맷 판별용)를 미리 읽고, 읽은 부분을 포함한 이터레이터를 돌려줌"""
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= n:
+            break
+    head_bytes = b"".join(head)
+    return head_bytes, chain([head_bytes] if head_bytes else [], chunks)
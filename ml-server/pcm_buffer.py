@@ -0,0 +1,125 @@
+"""
+윈도우 필터 파이프라인용 PCM 버퍼.
+
+pydub AudioSegment 는 슬라이스할 때마다 bytes 를 복사하고 새 객체를 만든다.
+PcmBuffer 는 16k/mono/int16 numpy 배열 하나를 들고 있고, ms 단위 슬라이스는
+복사 없이 같은 배열의 view 를 돌려준다.
+
+AudioSegment 에서 실제로 쓰던 읽기 전용 인터페이스(len, [s:e], raw_data, rms,
+dBFS, max_possible_amplitude, frame_rate ...)를 그대로 제공하므로
+func_filler 의 필터 함수들을 그대로 쓸 수 있다.
+"""
+
+from __future__ import annotations
+import math
+import numpy as np
+
+DEFAULT_SR = 16000
+
+
+def padded_len(n_samples: int, frame_rate: int = DEFAULT_SR) -> int:
+    """
+    n 샘플짜리 PcmBuffer 가 실제로 쓰는 샘플 수: ms 길이(반올림) 만큼.
+    이보다 짧으면 from_pcm16 이 끝을 0 으로 채운 사본을 만든다
+    """
+    len_ms = round(1000 * (n_samples / frame_rate))
+    return max(n_samples, int(len_ms * frame_rate / 1000))
+
+
+class PcmBuffer:
+    __slots__ = ("samples", "frame_rate", "_len_ms")
+
+    channels = 1
+    sample_width = 2
+    frame_width = 2
+    max_possible_amplitude = 32768.0
+
+    def __init__(self, samples: np.ndarray, frame_rate: int = DEFAULT_SR, len_ms=None):
+        if samples.dtype != np.int16 or samples.ndim != 1:
+            raise ValueError("PcmBuffer 는 1차원 int16 배열만 받습니다.")
+        self.samples = samples
+        self.frame_rate = frame_rate
+        # AudioSegment 와 동일한 ms 길이 (반올림)
+        self._len_ms = (
+            round(1000 * (len(samples) / frame_rate)) if len_ms is None else len_ms
+        )
+
+    @classmethod
+    def from_segment(cls, seg) -> "PcmBuffer":
+        """16k/mono/16bit AudioSegment -> PcmBuffer (가능하면 복사 없이)"""
+        if seg.channels != 1 or seg.sample_width != 2:
+            raise ValueError("ensure_format 된 AudioSegment 만 변환할 수 있습니다.")
+        return cls.from_pcm16(seg.raw_data, seg.frame_rate)
+
+    @classmethod
+    def from_pcm16(cls, data, frame_rate: int = DEFAULT_SR) -> "PcmBuffer":
+        samples = np.frombuffer(data, dtype=np.int16)
+        buf = cls(samples, frame_rate)
+        # len(ms)가 반올림으로 실제 샘플보다 길면, AudioSegment 슬라이스처럼
+        # 모자란 끝부분을 0 으로 채워둔다 (최대 1ms 미만, 생성 시 한 번만 복사.
+        # decode_normalized_pcm16 은 미리 채워서 주므로 복사하지 않음)
+        need = buf.ms_to_sample(buf._len_ms)
+        if need > len(samples):
+            padded = np.zeros(need, dtype=np.int16)
+            padded[: len(samples)] = samples
+            buf.samples = padded
+        return buf
+
+    # ---------------------------------------------------------------
+    def ms_to_sample(self, ms) -> int:
+        return int(ms * self.frame_rate / 1000)
+
+    def frame_count(self, ms=None) -> float:
+        if ms is not None:
+            return ms * (self.frame_rate / 1000.0)
+        return float(len(self.samples))
+
+    def __len__(self) -> int:
+        return self._len_ms
+
+    def _pos(self, ms) -> int:
+        if ms < 0:
+            ms = self._len_ms - abs(ms)
+        return self.ms_to_sample(ms)
+
+    def __getitem__(self, ms):
+        if not isinstance(ms, slice) or ms.step:
+            raise TypeError("PcmBuffer 는 [start_ms:end_ms] 슬라이스만 지원합니다.")
+        start = ms.start if ms.start is not None else 0
+        end = ms.stop if ms.stop is not None else self._len_ms
+        start = min(start, self._len_ms)
+        end = min(end, self._len_ms)
+        a, b = self._pos(start), self._pos(end)
+        view = self.samples[a:b] if b > a else self.samples[0:0]
+        return PcmBuffer(view, self.frame_rate)
+
+    def slice_ms(self, s: int, e: int) -> "PcmBuffer":
+        return self[max(0, s) : min(self._len_ms, e)]
+
+    # ---------------------------------------------------------------
+    @property
+    def raw_data(self) -> memoryview:
+        """복사 없는 16bit LE PCM 버퍼 (webrtcvad 에 바로 넘길 수 있음)"""
+        return memoryview(self.samples).cast("B")
+
+    @property
+    def rms(self) -> int:
+        # audioop.rms 와 동일: 정수로 내림한 RMS
+        n = len(self.samples)
+        if n == 0:
+            return 0
+        a = self.samples.astype(np.float64)
+        return int(math.sqrt(float(a @ a) / n))
+
+    @property
+    def dBFS(self) -> float:
+        rms = self.rms
+        if not rms:
+            return -float("infinity")
+        return 20 * math.log(rms / self.max_possible_amplitude, 10)
+
+    def to_float32(self) -> np.ndarray:
+        """[-1, 1) float32 (librosa.load 와 동일한 스케일)"""
+        y = self.samples.astype(np.float32)
+        y /= 32768.0  # 제자리 (같은 크기 임시 배열을 하나 더 만들지 않음)
+        return y
@@ -0,0 +1,328 @@
+"""
+/extract_text 용 PDF -> markdown 추출.
+
+- pymupdf4llm.to_markdown 으로 문서를 한 번만 변환한다
+- fallback(페이지별 page.get_text("markdown")) 은 요청했거나 본 변환이 실패 / 빈
+  결과일 때만 계산
+- PDF_PARALLEL_MIN_PAGES 쪽 이상이면 페이지 범위로 나눠 프로세스 풀에서 변환하고
+  순서대로 이어 붙인다
+    * layout 경로(pymupdf.layout)는 페이지 단위로 변환하므로 이어 붙인 결과가 같다
+    * rag 경로는 헤더 판정(글꼴 크기 통계)이 문서 전체 기준이라, 부모에서
+      IdentifyHeaders 를 한 번 계산해 모든 범위에 넘긴다
+- iter_pages: 한 쪽씩 변환해 끝나는 대로 내보냄 (/extract_text/stream 의 NDJSON).
+  쪽 범위 / 최대 글자 수에 닿으면 남은 쪽은 변환하지 않는다
+- 풀 워커가 죽어 풀이 깨지면(BrokenProcessPool) 새 풀을 만들어 한 번만 다시 변환
+  (analysis_pool.LazyPool). /ready 에 풀 상태가 나옴
+- 결과는 PDF 바이트 sha256 (+ pymupdf4llm 버전 / 경로) 키로 메모리 LRU 캐시
+
+환경변수
+  PDF_PARALLEL_MIN_PAGES  이 쪽수 이상이면 풀로 나눠 변환 (기본 8, 0 이면 항상 요청 스레드에서)
+  PDF_PAGES_PER_TASK      풀 작업 하나가 맡는 쪽수 (기본 4)
+  PDF_POOL_SIZE           풀 워커 수 (기본: CPU quota. ANALYSIS_EXECUTION=process 면 분석
+                          풀 워커 수를 뺀 나머지, 최소 1. 두 풀이 동시에 바빠도 워커 수
+                          합이 CPU quota 를 크게 넘지 않도록)
+  PDF_CACHE_ITEMS         캐시 항목 수 (기본 64, 0 이면 캐시 안 함)
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+
+import analysis_pool
+from analysis_pool import LazyPool, cpu_quota
+from result_cache import ResultCache
+
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PAGES_PER_TASK = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "4")))
+
+
+def _default_pool_size() -> int:
+    """분석 풀을 쓰면 CPU quota 중 분석 풀 워커에 돌아가지 않은 나머지 (최소 1)"""
+    if analysis_pool.enabled():
+        return max(1, cpu_quota() - analysis_pool.POOL_SIZE)
+    return cpu_quota()
+
+
+POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", "0")) or _default_pool_size()
+CACHE_ITEMS = int(os.getenv("PDF_CACHE_ITEMS", "64"))
+
+_cache = ResultCache(max_items=CACHE_ITEMS, disk_dir="") if CACHE_ITEMS > 0 else None
+
+
+class PdfOpenError(ValueError):
+    """PDF 로 열 수 없는 입력"""
+
+
+def _open(data: bytes):
+    import pymupdf
+
+    try:
+        return pymupdf.open(stream=data, filetype="pdf")
+    except Exception as e:
+        raise PdfOpenError(str(e)) from e
+
+
+def _uses_layout() -> bool:
+    import pymupdf4llm
+
+    return bool(getattr(pymupdf4llm, "_use_layout", False))
+
+
+def _init_worker():
+    # layout 모델 로드 등 import 비용을 첫 작업 전에 치름
+    import pymupdf4llm  # noqa: F401
+
+
+def _markdown_pages(data: bytes, pages: Optional[List[int]], hdr_info=None) -> str:
+    """pages(0-based) 범위를 markdown 으로. 풀 워커 / 요청 스레드 공용"""
+    import pymupdf4llm
+
+    kwargs = {"pages": pages, "show_progress": False}
+    if hdr_info is not None:
+        kwargs["hdr_info"] = hdr_info
+    with _open(data) as doc:
+        return pymupdf4llm.to_markdown(doc, **kwargs)
+
+
+# gunicorn 워커(스레드 떠 있음)를 fork 하지 않도록 spawn
+_pool = LazyPool(POOL_SIZE, _init_worker)
+
+
+def pool_status() -> Dict[str, Any]:
+    return _pool.status()
+
+
+def discard_broken_pool() -> bool:
+    return _pool.discard_if_broken()
+
+
+def _page_ranges(page_count: int) -> List[List[int]]:
+    return [
+        list(range(s, min(s + PAGES_PER_TASK, page_count)))
+        for s in range(0, page_count, PAGES_PER_TASK)
+    ]
+
+
+def _header_info(data: bytes):
+    """rag 경로용 문서 전체 헤더 판정 정보 (layout 경로면 None)"""
+    if _uses_layout():
+        return None
+    from pymupdf4llm.helpers.pymupdf_rag import IdentifyHeaders
+
+    with _open(data) as doc:
+        return IdentifyHeaders(doc)
+
+
+def to_markdown(data: bytes, page_count: int) -> str:
+    """문서 전체 markdown. 쪽수가 많으면 페이지 범위별로 풀에서 변환"""
+    if PARALLEL_MIN_PAGES <= 0 or page_count < PARALLEL_MIN_PAGES:
+        return _markdown_pages(data, None)
+
+    hdr_info = _header_info(data)
+
+    def convert(pool) -> str:
+        futs = [
+            pool.submit(_markdown_pages, data, pages, hdr_info)
+            for pages in _page_ranges(page_count)
+        ]
+        return "".join(f.result() for f in futs)
+
+    return _pool.run(convert)
+
+
+def fallback_text(doc) -> str:
+    """페이지별 get_text("markdown") (실패한 페이지는 일반 text)"""
+    parts = []
+    for page in doc:
+        try:
+            page_text = page.get_text("markdown")
+        except Exception:
+            page_text = page.get_text("text")
+        if page_text:
+            parts.append(page_text + "\n")
+    return "".join(parts).strip()
+
+
+def _cache_key(digest: str) -> str:
+    import pymupdf4llm
+
+    mode = "layout" if _uses_layout() else "rag"
+    return f"{digest}:{pymupdf4llm.__version__}:{mode}"
+
+
+def extract(data: bytes, want_fallback: bool = False) -> Dict[str, Any]:
+    """
+    {"result": markdown, "fallback": 페이지별 text, "diag": {...}}
+    fallback 은 want_fallback 이거나 본 변환이 실패 / 빈 결과일 때만 채우고 아니면 ""
+    본 변환이 실패했는데 fallback 도 비어 있으면 RuntimeError
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    key = _cache_key(digest)
+    entry = None
+    if _cache is not None:
+        entry, _ = _cache.get(key)
+    hit = entry is not None
+
+    if entry is None:
+        with _open(data) as doc:
+            page_count = doc.page_count
+        entry = {"result": "", "fallback": None, "pages": page_count, "error": None}
+        try:
+            entry["result"] = to_markdown(data, page_count).strip()
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+
+    need_fallback = want_fallback or entry["error"] is not None or not entry["result"]
+    computed_fallback = False
+    if need_fallback and entry["fallback"] is None:
+        with _open(data) as doc:
+            entry["fallback"] = fallback_text(doc)
+        computed_fallback = True
+    if entry["error"] is not None and not entry["fallback"]:
+        raise RuntimeError(entry["error"])
+
+    if _cache is not None and (not hit or computed_fallback):
+        _cache.put(key, digest, entry)
+
+    return {
+        "result": entry["result"],
+        "fallback": entry["fallback"] or "",
+        "diag": {
+            "pages": entry["pages"],
+            "primary_error": entry["error"],
+            "parallel": PARALLEL_MIN_PAGES > 0 and entry["pages"] >= PARALLEL_MIN_PAGES,
+            "cache": {
+                "enabled": _cache is not None,
+                "hit": hit,
+                "pdf_sha256": digest,
+            },
+        },
+    }
+
+
+def parse_page_spec(spec: Optional[str], page_count: int) -> List[int]:
+    """
+    "1-3,7,10-" 같은 1-based 쪽 범위 -> 0-based 쪽 번호 (순서대로, 중복 제거)
+    문서 밖 쪽은 버림. 비어 있으면 전체
+    """
+    if not spec:
+        return list(range(page_count))
+    picked = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        try:
+            a = int(lo) if lo.strip() else 1
+            b = int(hi) if hi.strip() else page_count
+            if not sep:
+                b = a
+        except ValueError:
+            raise ValueError(f"잘못된 쪽 범위: {part!r}") from None
+        if a < 1 or b < a:
+            raise ValueError(f"잘못된 쪽 범위: {part!r}")
+        picked.update(range(a - 1, min(b, page_count)))
+    return sorted(picked)
+
+
+def page_count(data: bytes) -> int:
+    with _open(data) as doc:
+        return doc.page_count
+
+
+def _page_record(data: bytes, pno: int, text: Optional[str]) -> Dict[str, Any]:
+    """변환에 실패한 쪽(text is None)은 그 쪽만 fallback_text 로"""
+    if text is not None:
+        return {"type": "page", "page": pno + 1, "text": text, "fallback": False}
+    with _open(data) as doc:
+        fb = fallback_text([doc[pno]])
+    return {"type": "page", "page": pno + 1, "text": fb, "fallback": True}
+
+
+def _iter_page_texts(data: bytes, pages: List[int]) -> Iterator[tuple]:
+    """(쪽 번호, markdown 또는 실패 시 None) 을 쪽 순서대로"""
+    hdr_info = _header_info(data)
+    if PARALLEL_MIN_PAGES <= 0 or len(pages) < PARALLEL_MIN_PAGES:
+        for pno in pages:
+            try:
+                yield pno, _markdown_pages(data, [pno], hdr_info)
+            except Exception:
+                yield pno, None
+        return
+
+    # 풀 워커 수 + 1 쪽만 미리 걸어 두고, 앞 쪽이 끝나는 대로 내보냄
+    # (중간에 멈추면 안 걸린 쪽은 변환하지 않음)
+    # 풀이 깨지면 걸어 둔 쪽을 새 풀에 다시 걸어 한 번만 재시도하고, 또 깨지면
+    # 남은 쪽은 쪽별 fallback 으로 (풀은 버려서 다음 요청이 새로 만듦)
+    pool = _pool.get()
+    ahead = POOL_SIZE + 1
+    futs: Dict[int, Any] = {}
+    retries = 1
+    try:
+        for k, pno in enumerate(pages):
+            text = None
+            while pool is not None:
+                try:
+                    for q in pages[k : k + ahead]:
+                        if q not in futs:
+                            futs[q] = pool.submit(_markdown_pages, data, [q], hdr_info)
+                    text = futs[pno].result()
+                except BrokenProcessPool as e:
+                    # 걸어 둔 쪽들도 모두 실패하므로 새 풀에 다시 건다
+                    _pool.discard(pool, e)
+                    futs.clear()
+                    pool = None
+                    if retries > 0:
+                        retries -= 1
+                        pool = _pool.get()
+                        continue
+                except Exception:
+                    pass
+                break
+            futs.pop(pno, None)
+            yield pno, text
+    finally:
+        for fut in futs.values():
+            fut.cancel()
+
+
+def iter_pages(
+    data: bytes, pages: List[int], max_chars: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    쪽마다 {"type": "page", "page": 1-based, "text", "fallback"} 를 변환 끝나는 대로,
+    마지막에 {"type": "end", "pages_sent", "chars", "truncated", "reason"}
+    max_chars > 0 이면 누적 글자 수가 닿는 순간 그 쪽 text 를 잘라 보내고 멈춤
+    text 는 쪽 markdown 그대로라, 전부 이어 붙여 strip 하면 to_markdown 결과와 같다
+    """
+    chars = 0
+    sent = 0
+    cut = False
+    reason = "complete"
+    texts = _iter_page_texts(data, pages)
+    try:
+        for pno, text in texts:
+            rec = _page_record(data, pno, text)
+            if max_chars > 0 and chars + len(rec["text"]) >= max_chars:
+                head = rec["text"][: max_chars - chars]
+                cut = len(head) < len(rec["text"])
+                rec["text"] = head
+                rec["truncated"] = cut
+                reason = "max_chars"
+            chars += len(rec["text"])
+            sent += 1
+            yield rec
+            if reason == "max_chars":
+                break
+    finally:
+        texts.close()
+    yield {
+        "type": "end",
+        "pages_sent": sent,
+        "chars": chars,
+        "truncated": cut or sent < len(pages),
+        "reason": reason,
+    }
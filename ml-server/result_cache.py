@@ -0,0 +1,346 @@
+"""
+/analyze 결과 캐시 (content-addressed).
+
+key = sha256(오디오 바이트 해시 | segmentation | 정규화한 params | 모델/버전 지문)
+
+- 메모리 LRU (RESULT_CACHE_MAX_ITEMS 개)
+- 선택적 디스크 계층 (RESULT_CACHE_DIR 지정 시). 파일 이름은 "<key>.json" 이라 조회는
+  파일 하나만 열고, 크기 / 최근 사용 순서는 메모리 색인으로 관리한다 (시작할 때 디렉터리를
+  한 번만 훑음). 전체 크기가 RESULT_CACHE_DISK_MAX_MB 를 넘으면 가장 오래 안 쓴 파일부터 삭제.
+  같은 디렉터리를 다른 프로세스가 함께 쓰면 그 프로세스가 쓴 파일은 조회될 때 색인에 들어옴
+- 디스크 계층의 key 는 sha256 hex 만 받음 (그 밖의 값은 ValueError)
+- url 소스는 응답 헤더(ETag + Content-Length)를 오디오 해시의 별칭으로 기억해서,
+  같은 객체를 다시 요청하면 본문을 받기 전에 캐시를 찾는다
+
+환경변수
+  RESULT_CACHE               1(기본) | 0
+  RESULT_CACHE_MAX_ITEMS     메모리 계층 최대 항목 수 (기본 256)
+  RESULT_CACHE_DIR           디스크 계층 디렉터리 (기본 없음 = 메모리만)
+  RESULT_CACHE_DISK_MAX_MB   디스크 계층 최대 크기 (기본 512)
+"""
+
+from __future__ import annotations
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+ENABLED = os.getenv("RESULT_CACHE", "1") == "1"
+MAX_ITEMS = int(os.getenv("RESULT_CACHE_MAX_ITEMS", "256"))
+DISK_DIR = os.getenv("RESULT_CACHE_DIR", "")
+DISK_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024)
+
+# 결과 형식/알고리즘이 바뀌면 올려서 이전 캐시를 무효화
+CACHE_VERSION = 1
+
+_ALIAS_MAX = 4096
+_HEX64 = re.compile(r"[0-9a-f]{64}")
+
+
+def check_digest(value: str, name: str = "key") -> str:
+    """sha256 hex 가 아니면 ValueError (파일 이름 / 조회에 그대로 쓰므로)"""
+    if not isinstance(value, str) or not _HEX64.fullmatch(value):
+        raise ValueError(f"{name} 는 sha256 hex(64자) 여야 합니다.")
+    return value
+
+
+def params_fingerprint(params: Optional[Dict[str, Any]]) -> str:
+    """키 순서 / 공백에 상관없는 params 정규화"""
+    return json.dumps(params or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def config_fingerprint() -> str:
+    """func_filler 의 분석 상수(THR, 윈도우 길이 등) 지문. 상수가 바뀌면 키도 바뀜"""
+    import func_filler as ff
+
+    consts = {
+        k: v
+        for k, v in vars(ff).items()
+        if k.isupper() and isinstance(v, (bool, int, float, str))
+    }
+    return hashlib.sha256(
+        json.dumps(consts, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def make_key(audio_sha256: str, segmentation: str, params, model_fp: str) -> str:
+    h = hashlib.sha256()
+    for part in (
+        f"v{CACHE_VERSION}",
+        audio_sha256,
+        segmentation,
+        params_fingerprint(params),
+        model_fp,
+        config_fingerprint(),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_items: int = MAX_ITEMS,
+        disk_dir: str = DISK_DIR,
+        disk_max_bytes: int = DISK_MAX_BYTES,
+    ):
+        self.max_items = max_items
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._mem: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+        self._alias: "OrderedDict[str, str]" = OrderedDict()
+        # 디스크 색인: key -> (audio_sha256, 파일 크기), 오래 안 쓴 것부터
+        self._disk: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "puts": 0,
+            "evictions_memory": 0,
+            "evictions_disk": 0,
+        }
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_scan()
+
+    # ---- 오디오 별칭 (ETag 등) ----------------------------------------
+    def alias_get(self, validator: str) -> Optional[str]:
+        with self._lock:
+            h = self._alias.get(validator)
+            if h is not None:
+                self._alias.move_to_end(validator)
+            return h
+
+    def alias_put(self, validator: str, audio_sha256: str):
+        with self._lock:
+            self._alias[validator] = audio_sha256
+            self._alias.move_to_end(validator)
+            while len(self._alias) > _ALIAS_MAX:
+                self._alias.popitem(last=False)
+
+    # ---- 결과 ----------------------------------------------------------
+    def get(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """(결과 사본, "memory" | "disk") 또는 (None, None)"""
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+                self.stats["hits_memory"] += 1
+                return copy.deepcopy(hit[1]), "memory"
+
+        path = self._disk_path(key)
+        if path is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)  # 재시작 후 색인을 다시 만들 때의 LRU 순서
+            except (OSError, ValueError):
+                entry = None
+                self._disk_forget(key)
+            if entry is not None:
+                self._disk_touch(key, entry["audio_sha256"], path)
+                self._mem_put(
+                    key, entry["audio_sha256"], copy.deepcopy(entry["result"])
+                )
+                with self._lock:
+                    self.stats["hits_disk"] += 1
+                return entry["result"], "disk"
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def put(self, key: str, audio_sha256: str, result: dict):
+        result = copy.deepcopy(result)
+        self._mem_put(key, audio_sha256, result)
+        with self._lock:
+            self.stats["puts"] += 1
+        if self.disk_dir is not None:
+            self._disk_put(key, audio_sha256, result)
+
+    def contains(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._mem:
+                return "memory"
+        path = self._disk_path(key)
+        return "disk" if path is not None and path.exists() else None
+
+    def invalidate(self, key: str | None = None, audio_sha256: str | None = None):
+        """key 하나 / 특정 오디오의 모든 결과 / (둘 다 없으면) 전체 삭제. 삭제 개수 반환"""
+        removed = 0
+        with self._lock:
+            for k in list(self._mem):
+                if (key is None or k == key) and (
+                    audio_sha256 is None or self._mem[k][0] == audio_sha256
+                ):
+                    del self._mem[k]
+                    removed += 1
+            if key is None and audio_sha256 is None:
+                self._alias.clear()
+            elif audio_sha256 is not None:
+                for v in [v for v, h in self._alias.items() if h == audio_sha256]:
+                    del self._alias[v]
+        if self.disk_dir is not None:
+            if key is None and audio_sha256 is None:
+                # 전체 삭제는 다른 프로세스가 쓴 파일까지 디렉터리에서 지움
+                self._disk_scan()
+            with self._lock:
+                keys = [
+                    k
+                    for k, (a, _) in self._disk.items()
+                    if (key is None or k == key)
+                    and (audio_sha256 is None or a == audio_sha256)
+                ]
+            if key is not None and not keys and self._disk_path(key).exists():
+                keys = [key]
+            for k in keys:
+                try:
+                    self._disk_path(k).unlink()
+                    removed += 1
+                except OSError:
+                    pass
+                self._disk_forget(k)
+        return removed
+
+    def info(self) -> dict:
+        with self._lock:
+            d = {
+                "enabled": True,
+                "memory_items": len(self._mem),
+                "memory_max_items": self.max_items,
+                "aliases": len(self._alias),
+                **self.stats,
+            }
+            if self.disk_dir is not None:
+                d.update(
+                    disk_dir=str(self.disk_dir),
+                    disk_items=len(self._disk),
+                    disk_bytes=self._disk_bytes,
+                    disk_max_bytes=self.disk_max_bytes,
+                )
+        return d
+
+    # ---------------------------------------------------------------
+    def _mem_put(self, key: str, audio_sha256: str, result: dict):
+        with self._lock:
+            self._mem[key] = (audio_sha256, result)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+                self.stats["evictions_memory"] += 1
+
+    def _disk_scan(self):
+        """디렉터리를 한 번 훑어 색인을 다시 만듦 (이전 형식 "<audio>-<key>.json" 은 이름만 바꿈)"""
+        found = []
+        for p in self.disk_dir.glob("*.json"):
+            stem = p.stem
+            if "-" in stem:
+                audio, _, key = stem.partition("-")
+                if not (_HEX64.fullmatch(audio) and _HEX64.fullmatch(key)):
+                    continue
+                try:
+                    p = p.replace(self.disk_dir / f"{key}.json")
+                except OSError:
+                    continue
+                stem = key
+            elif not _HEX64.fullmatch(stem):
+                continue
+            try:
+                st = p.stat()
+                with open(p, "r", encoding="utf-8") as f:
+                    audio = json.load(f)["audio_sha256"]
+            except (OSError, ValueError, KeyError):
+                continue
+            found.append((st.st_mtime, stem, audio, st.st_size))
+        with self._lock:
+            self._disk.clear()
+            for _, key, audio, size in sorted(found):
+                self._disk[key] = (audio, size)
+            self._disk_bytes = sum(size for _, size in self._disk.values())
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / f"{check_digest(key)}.json"
+
+    def _disk_touch(self, key: str, audio_sha256: str, path: Path):
+        """색인에서 key 를 가장 최근으로 (다른 프로세스가 쓴 파일이면 새로 넣음)"""
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                return
+            size = _size(path)
+            self._disk[key] = (audio_sha256, size)
+            self._disk_bytes += size
+
+    def _disk_forget(self, key: str):
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old[1]
+
+    def _disk_put(self, key: str, audio_sha256: str, result: dict):
+        data = json.dumps(
+            {"audio_sha256": audio_sha256, "result": result}, ensure_ascii=False
+        ).encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_forget(key)
+        with self._lock:
+            self._disk[key] = (audio_sha256, len(data))
+            self._disk_bytes += len(data)
+        self._disk_evict()
+
+    def _disk_evict(self):
+        # 가장 오래 안 쓴 항목부터 삭제 (색인만 보고 고름)
+        while True:
+            with self._lock:
+                if self._disk_bytes <= self.disk_max_bytes or not self._disk:
+                    return
+                key, (_, size) = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.stats["evictions_disk"] += 1
+            try:
+                self._disk_path(key).unlink()
+            except OSError:
+                pass
+
+
+def _size(p: Path) -> int:
+    try:
+        return p.stat().st_size
+    except OSError:
+        return 0
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResultCache]:
+    """프로세스 공용 캐시 (RESULT_CACHE=0 이면 None)"""
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
@@ -0,0 +1,727 @@
+"""
+스트리밍 분석 세션: 지원자가 답변하는 동안 녹음 청크를 받아 미리 분석해 둔다.
+
+  POST   /stream               세션 열기
+  POST   /stream/<id>/append   녹음 청크(webm 등 / 16k mono s16le) 추가
+  POST   /stream/<id>/close    입력 끝 -> 최종 결과 (/analyze 와 같은 형식)
+
+- 청크는 도착하는 즉시 ffmpeg(StreamingPcmDecoder) 로 흘려보내 증분 디코딩한다.
+  인코딩된 원본은 디코더에 넘긴 뒤 버리고 sha256 만 누적한다 (결과 캐시 키).
+- 새 오디오가 STREAM_STEP_MS 이상 쌓이면 백그라운드 체크포인트:
+  디코더에 쌓인 PCM 을 가져가 세션의 임시 파일(spool_dir)로 옮기고, 새로 들어온 부분만
+  노멀라이즈해서 녹음 전체 인덱스(노멀라이즈된 PCM 파일 / ms 별 에너지 누적합 / VAD
+  비트맵, _RecordingIndex)에 이어 붙인다. 그다음
+  녹음 끝부분(앞 체크포인트가 끝낸 위치 근처부터)만 발화 구간 / 후보 필터를 돌리고,
+  끝에서 STREAM_LOOKBACK_MS 보다 앞에서 끝나는 새 후보 윈도우의 점수를 미리 계산해
+  {(ws, we): 확률} 로 저장한다. 체크포인트 하나의 일은 새로 들어온 오디오 길이에 비례한다
+  (녹음 앞부분을 매번 다시 계획하지 않음).
+- close 하면 마지막 체크포인트 이후 부분만 인덱스에 더하고, 그 인덱스로 평소와 같은
+  계획을 돌린다 (PCM 으로 에너지 / VAD 인덱스를 다시 만들지 않음. 남은 일은 프레임 /
+  윈도우 단위 배열 연산). 미리 계산한 점수 중 (ws, we) 가 같은 것은 재사용하고
+  나머지(대부분 마지막 몇 초)만 노멀라이즈된 PCM 파일에서 읽어 계산한다.
+  메모리에는 체크포인트 사이에 디코딩된 부분과 체크포인트 구간만 올라간다 (녹음 전체는
+  파일 + 페이지 캐시). 단 segmentation="vad" 의 윈도우별 VAD 필터(vad_bitmap 끔)는 close
+  때 모든 윈도우에 다시 돌므로 녹음 길이에 비례한다 (30분에 ~0.3초).
+- ANALYSIS_EXECUTION=process 면 체크포인트와 close 의 점수 계산(MFCC + 모델)은
+  분석 풀 워커에서 한다 (analysis_pool.score_windows). 계획(분할 / 필터)만 요청 프로세스.
+
+결과가 faster_run_filler_analysis_bytes(전체 바이트) 와 같은 이유
+  인덱스는 녹음 전체를 decode_normalized_pcm16 처럼 노멀라이즈한 것과 같은 값이고
+  (gain 은 원본 피크로 정함), 적응형 임계값은 close 때 그 인덱스로 녹음 전체 기준으로
+  계산한다. 윈도우 특징은 윈도우 안 (노멀라이즈된) 샘플에만 의존하므로, 체크포인트 때의
+  gain 이 최종 gain 과 같으면 점수도 같다. 피크가 더 큰 샘플이 나중에 들어오면 gain 이
+  바뀌므로 인덱스는 원본 PCM 파일로 처음부터 다시 만들고(diag.stream.index_rebuilds)
+  그때까지의 점수는 버린다(memo_resets). 그 윈도우들은 다음 체크포인트들이 새 gain 으로
+  체크포인트마다 STREAM_RESCORE_MAX 개씩 다시 계산한다. 그래서 원본 PCM 은 파일로 끝까지
+  남겨 둔다. (마지막 체크포인트 뒤에 피크가 바뀌면 close 가 다시 만들므로 그때는 녹음
+  길이에 비례)
+
+체크포인트가 끝부분만 계획해도 close 의 윈도우와 (ws, we) 가 맞도록
+  - 적응형 임계값은 지금까지의 녹음 전체 기준, 에너지 / VAD 인덱스는 녹음 전체 것에서
+    잘라 씀 (구간에서 새로 만들면 VAD 상태가 달라짐)
+  - 계획 시작 위치는 앞 체크포인트 끝에 걸쳐 있던 발화 구간의 시작(분할 / VAD 프레임 경계)
+    에서 문맥용으로 조금 앞. 윈도우는 발화 구간 시작부터 HOP 간격이라 구간 시작이 같으면
+    윈도우 위치도 같다
+  어긋나는 경우(임계값이 나중에 바뀜 등)는 미리 계산한 점수를 못 쓸 뿐 결과는 같다.
+
+세션은 프로세스 메모리에 있으므로 jobs 와 마찬가지로 gunicorn 워커 1개를 전제로 한다.
+
+환경변수
+  STREAM_STEP_MS       체크포인트 간격, 새로 디코딩된 오디오 기준 (기본 2000)
+  STREAM_LOOKBACK_MS   체크포인트에서 점수를 보류할 끝부분 길이 (기본 1000)
+  STREAM_RESCORE_MAX   gain 이 바뀌어 버린 점수를 체크포인트마다 다시 계산할 최대 윈도우
+                       수 (기본 512)
+  STREAM_TTL_SEC       마지막 append 이후 세션 보관 시간 (기본 300)
+  STREAM_MAX_SESSIONS  동시에 열 수 있는 세션 수 (기본 32)
+  STREAM_WORKERS       체크포인트를 실행할 스레드 수 (기본 2)
+입력 한도는 /analyze 와 같은 ANALYZE_MAX_MB / ANALYZE_MAX_SEC 를 세션 전체에 적용한다
+(main 이 StreamManager 에 넘김. 넘으면 세션을 실패로 닫고 413). 임시 파일은 PCM_SPILL_DIR
+에 만들고 세션이 끝나면(close / abort / 실패) 지운다.
+"""
+
+from __future__ import annotations
+import hashlib
+import math
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import analysis_pool
+from convert import (
+    PCM_SR,
+    AudioLimitError,
+    StreamingPcmDecoder,
+    apply_gain_inplace,
+    peak_gain_db,
+)
+from metrics import StageTimer
+from model_runtime import load_filler_model
+from pcm_buffer import padded_len
+
+STREAM_STEP_MS = int(os.getenv("STREAM_STEP_MS", "2000"))
+STREAM_LOOKBACK_MS = int(os.getenv("STREAM_LOOKBACK_MS", "1000"))
+STREAM_TTL_SEC = float(os.getenv("STREAM_TTL_SEC", "300"))
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "32"))
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "2"))
+STREAM_RESCORE_MAX = int(os.getenv("STREAM_RESCORE_MAX", "512"))
+
+# 체크포인트 계획 구간: 재개 위치보다 문맥(앞뒤 무음 / 에너지 필터)용으로 이만큼 앞에서 시작,
+# 발화 구간이 아주 길어도 앞 체크포인트 끝에서 이보다 더 앞으로는 가지 않음
+_REGION_PAD_MS = 1000
+_REGION_MAX_MS = 10_000
+# 인덱스를 이어서 만들 때 한 번에 읽는 원본 길이 (임시 메모리 상한, gain 이 바뀐 뒤 다시 만들 때)
+_SYNC_MS = 60_000
+
+FORMATS = ("auto", "pcm_s16le")
+
+OPEN, CLOSING, CLOSED, ABORTED, FAILED = (
+    "open",
+    "closing",
+    "closed",
+    "aborted",
+    "failed",
+)
+
+
+class StreamInputError(ValueError):
+    """요청 쪽 문제 (빈 오디오, 잘못된 format 등). 400"""
+
+
+class StreamTooLargeError(StreamInputError):
+    """세션 입력이 한도(원본 바이트 수 / 디코딩된 길이)를 넘음. 413"""
+
+
+class StreamStateError(RuntimeError):
+    """이미 닫힌 세션에 append / close. 409"""
+
+
+class StreamDecodeError(RuntimeError):
+    pass
+
+
+class _Spool:
+    """
+    임시 파일에 이어 쓰는 1차원 배열 (dtype 고정). 읽을 때는 파일 전체를 np.memmap 으로
+    매핑하므로 녹음이 길어져도 힙에 올라가지 않고, 풀 워커에는 파일 위치만 넘어간다
+    (convert.spilled_pcm). rewind 는 파일을 자르지 않고 처음부터 덮어쓴다 (이미 만든
+    memmap 이 잘린 영역을 읽는 일이 없도록)
+    """
+
+    def __init__(self, dtype, spool_dir: Optional[str] = None, prefix: str = "stream-"):
+        self.dtype = np.dtype(dtype)
+        self._file = tempfile.NamedTemporaryFile(
+            dir=spool_dir, prefix=prefix, suffix=".bin", delete=False
+        )
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=self.dtype)
+        self._file.write(memoryview(x).cast("B"))
+        self._n += len(x)
+
+    def rewind(self):
+        self._file.seek(0)
+        self._n = 0
+
+    def array(self) -> np.ndarray:
+        """지금까지 쓴 [0, len) 전체 (읽기 전용 np.memmap)"""
+        if self._n == 0:
+            return np.zeros(0, dtype=self.dtype)
+        self._file.flush()
+        return np.memmap(self._file.name, dtype=self.dtype, mode="r", shape=(self._n,))
+
+    def close(self):
+        self._file.close()
+        try:
+            os.unlink(self._file.name)
+        except OSError:
+            pass
+
+
+class _RecordingIndex:
+    """
+    지금까지 디코딩된 녹음 전체를 현재 gain 으로 노멀라이즈한 PCM / ms 별 에너지 누적합 /
+    VAD 비트맵. 체크포인트마다 새로 들어온 부분만 이어서 만든다 (PCM 과 누적합은 _Spool).
+    plan_filler_windows(energy=, vad_index=) 에 넘기면 녹음으로 인덱스를 다시 만든 것과 같다:
+      - 누적합은 EnergyIndex 와 같은 int64 정수 누적
+      - VAD 는 Vad 객체 하나로 녹음 시작부터 프레임을 차례로 돌림 (VadIndex 와 같음)
+    gain 이 바뀌면 원본 PCM 으로 처음부터 다시 만든다 (rebuilds)
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        import func_filler as ff
+
+        self.per_ms = PCM_SR // 1000
+        self.frame_ms = ff.VAD_FRAME_MS
+        self.aggr = ff.VAD_AGGR
+        self.norm = _Spool(np.int16, spool_dir, "stream-pcm-")
+        self.csum = _Spool(np.int64, spool_dir, "stream-energy-")
+        self.gain: Optional[float] = None
+        self.len_ms = 0
+        self.rebuilds = 0
+
+    def close(self):
+        self.norm.close()
+        self.csum.close()
+
+    def invalidate(self):
+        """다음 sync 에서 처음부터 다시 만들게 함 (체크포인트가 중간에 실패한 경우)"""
+        self.gain = None
+
+    def _reset(self, gain: float):
+        import webrtcvad
+
+        if self.gain is not None:
+            self.rebuilds += 1
+        self.gain = gain
+        self.len_ms = 0
+        self.norm.rewind()
+        self.csum.rewind()
+        self.csum.append(np.zeros(1, dtype=np.int64))
+        self._total = 0
+        self._vad = webrtcvad.Vad(self.aggr)
+        self._voiced = np.zeros(0, dtype=np.bool_)
+        self._n_frames = 0
+        self._pending = np.zeros(0, dtype=np.int16)  # 프레임이 덜 찬 노멀라이즈 샘플
+
+    def sync(self, raw: np.ndarray, n_ms: int, gain: float):
+        """원본 PCM raw 의 [0, n_ms) 까지 gain 으로 반영 (gain 이 바뀌었으면 처음부터)"""
+        if gain != self.gain:
+            self._reset(gain)
+        per_ms = self.per_ms
+        for s in range(self.len_ms, n_ms, _SYNC_MS):
+            e = min(n_ms, s + _SYNC_MS)
+            x = np.array(raw[s * per_ms : e * per_ms])
+            apply_gain_inplace(x, gain)
+            self.norm.append(x)
+            sq = x.astype(np.int64)
+            c = np.cumsum((sq * sq).reshape(e - s, per_ms).sum(axis=1))
+            c += self._total
+            self._total = int(c[-1])
+            self.csum.append(c)
+            self.len_ms = e
+            self._vad_frames(x)
+
+    def finish(self, tail: np.ndarray):
+        """ms 를 못 채운 마지막 원본 샘플: PCM / VAD 에만 반영 (EnergyIndex 도 ms 단위)"""
+        x = np.array(tail)
+        apply_gain_inplace(x, self.gain)
+        self.norm.append(x)
+        self._vad_frames(x)
+
+    def _vad_frames(self, x: np.ndarray):
+        spf = PCM_SR * self.frame_ms // 1000
+        buf = np.concatenate([self._pending, x])
+        n = len(buf) // spf
+        if self._n_frames + n > len(self._voiced):
+            voiced = np.zeros(max(self._n_frames + n, 2 * len(self._voiced)), np.bool_)
+            voiced[: self._n_frames] = self._voiced[: self._n_frames]
+            self._voiced = voiced
+        raw = memoryview(buf).cast("B")
+        step = spf * 2
+        for k in range(n):
+            try:
+                self._voiced[self._n_frames + k] = self._vad.is_speech(
+                    raw[k * step : (k + 1) * step], PCM_SR
+                )
+            except Exception:
+                # 잘못된 프레임은 무성으로 처리 (VadIndex 와 같음)
+                pass
+        self._n_frames += n
+        self._pending = buf[n * spf :]
+
+    def energy(self, start_ms: int = 0, threshold_source=None):
+        """[start_ms, len_ms) 구간의 EnergyIndex (구간 기준 ms)"""
+        from audio_index import EnergyIndex
+
+        csum = self.csum.array()[: self.len_ms + 1]
+        if start_ms:
+            csum = csum[start_ms:] - csum[start_ms]
+        return EnergyIndex.from_csum(csum, self.per_ms, threshold_source)
+
+    def vad_index(self, start_ms: int = 0):
+        """[start_ms, ...) 구간의 VadIndex. start_ms 는 VAD 프레임 경계여야 함"""
+        from audio_index import VadIndex
+
+        k0 = start_ms // self.frame_ms
+        voiced = self._voiced[k0 : self._n_frames]
+        return VadIndex.from_voiced(voiced, self.frame_ms, self.aggr, PCM_SR)
+
+
+class StreamSession:
+    def __init__(
+        self,
+        model_path: str,
+        segmentation: str = "adaptive",
+        params: Dict[str, Any] | None = None,
+        fmt: str = "auto",
+        pool: ThreadPoolExecutor | None = None,
+        max_bytes: int = 0,
+        max_sec: float = 0.0,
+        spool_dir: Optional[str] = None,
+    ):
+        """
+        max_bytes / max_sec: 세션 전체 원본 바이트 수 / 디코딩된 길이 한도 (0 = 제한 없음)
+        spool_dir: 디코딩된 PCM 과 인덱스를 쌓을 임시 파일 폴더 (기본 시스템 임시 폴더)
+        """
+        if fmt not in FORMATS:
+            raise StreamInputError(f"지원하지 않는 format: {fmt}")
+        self.id = uuid.uuid4().hex
+        self.model_path = model_path
+        self.segmentation = segmentation
+        self.params = params or {}
+        self.format = fmt
+        self.state = OPEN
+        self.created_at = time.time()
+        self.touched_at = self.created_at
+        self.bytes = 0
+        self.chunks = 0
+
+        self.max_bytes = max_bytes
+        self._decoder = StreamingPcmDecoder(
+            raw_pcm=(fmt == "pcm_s16le"), max_samples=int(max_sec * PCM_SR)
+        )
+        self._sha = hashlib.sha256()
+        self._pool = pool
+        self._lock = threading.Lock()  # append / close 직렬화
+        self._memo_lock = threading.Lock()
+        self._memo: Dict[Tuple[int, int], float] = {}
+        self._memo_gain: Optional[float] = None
+        self._ckpt: Optional[Future] = None
+        self._ckpt_ms = 0
+        # 체크포인트 진행 상태 (체크포인트는 한 번에 하나만 돌고 close 는 그 끝을 기다림)
+        self._raw = _Spool(np.int16, spool_dir, "stream-raw-")  # 노멀라이즈 전 원본
+        self._index = _RecordingIndex(spool_dir)
+        self._peak = 0
+        self._done_ms = 0  # 여기까지 끝나는 윈도우는 앞 체크포인트들이 처리함
+        self._resume_ms = 0  # 다음 체크포인트의 계획 시작 기준
+        self._stale: Set[Tuple[int, int]] = set()  # gain 이 바뀌어 다시 계산할 윈도우
+        self.stats = {
+            "checkpoints": 0,
+            "checkpoint_sec": 0.0,
+            "speculated": 0,
+            "memo_resets": 0,
+            "max_region_ms": 0,
+            "checkpoint_error": None,
+        }
+
+    # ---------------------------------------------------------------
+    def decoded_ms(self) -> int:
+        return self._decoder.samples() * 1000 // PCM_SR
+
+    def append(self, chunk: bytes):
+        with self._lock:
+            if self.state != OPEN:
+                raise StreamStateError(f"세션이 열려 있지 않습니다: {self.state}")
+            self.touched_at = time.time()
+            if not chunk:
+                return
+            if self.max_bytes and self.bytes + len(chunk) > self.max_bytes:
+                self._fail()
+                mb = self.max_bytes / 1024 / 1024
+                raise StreamTooLargeError(f"오디오가 최대 크기({mb:g}MB)를 넘습니다.")
+            self._sha.update(chunk)
+            self.bytes += len(chunk)
+            self.chunks += 1
+            try:
+                self._decoder.write(chunk)
+            except AudioLimitError as e:
+                self._fail()
+                raise StreamTooLargeError(str(e)) from e
+            except subprocess.CalledProcessError as e:
+                self.state = FAILED
+                raise StreamDecodeError(e.stderr or str(e)) from e
+            self._maybe_checkpoint()
+
+    def _fail(self):
+        """한도 초과: 더 받지 않고 디코더(ffmpeg)와 쌓인 PCM 을 바로 놓음"""
+        self.state = FAILED
+        self._release()
+
+    def _release(self):
+        self._decoder.abort()
+        self._raw.close()
+        self._index.close()
+
+    def _maybe_checkpoint(self):
+        if self._pool is None:
+            return
+        if self._ckpt is not None and not self._ckpt.done():
+            return
+        if self.decoded_ms() - self._ckpt_ms < STREAM_STEP_MS:
+            return
+        self._ckpt = self._pool.submit(self._checkpoint)
+
+    def _take(self, pcm: np.ndarray):
+        """디코더에서 가져온 원본 샘플을 파일로 옮기고 피크에 반영"""
+        if pcm.size:
+            self._peak = max(self._peak, int(pcm.max()), -int(pcm.min()))
+            self._raw.append(pcm)
+
+    def _frame_align(self) -> int:
+        """계획 시작 위치가 맞춰야 할 ms 경계 (적응형 / VAD 프레임 그리드)"""
+        import func_filler as ff
+
+        p = self.params
+        return math.lcm(
+            30,
+            int(p.get("adaptive_frame_ms", 30)),
+            int(p.get("vad_frame_ms", 20)),
+            ff.VAD_FRAME_MS,
+        )
+
+    def _score(self, pcm: np.ndarray, offset_ms: int, items: List[tuple]):
+        """
+        녹음의 [offset_ms, ...) 구간 pcm(노멀라이즈됨) 에서 items(녹음 기준 ms) 의 점수.
+        process 모드면 분석 풀 워커에서 계산
+        """
+        if not items:
+            return np.zeros((0,), dtype=np.float32)
+        if analysis_pool.enabled():
+            probs, _ = analysis_pool.score_windows(
+                self.model_path,
+                pcm,
+                items,
+                [(0, len(items))],
+                self.params,
+                offset_ms=offset_ms,
+            )
+            return probs
+        from core_filler import score_window_chunk
+
+        model = load_filler_model(self.model_path)
+        return score_window_chunk(pcm, offset_ms, items, model, self.params)["probs"]
+
+    def _checkpoint(self):
+        """
+        녹음 끝부분만 계획해서, 앞 체크포인트 이후 끝난 윈도우의 점수를 미리 계산.
+        gain 이 바뀌어 버린 점수도 STREAM_RESCORE_MAX 개까지 새 gain 으로 다시 계산
+        """
+        from core_filler import plan_filler_windows
+
+        t0 = time.perf_counter()
+        try:
+            self._take(self._decoder.take())
+            n_ms = len(self._raw) // (PCM_SR // 1000)
+            gain = peak_gain_db(self._peak)
+            self._index.sync(self._raw.array(), n_ms, gain)
+            with self._memo_lock:
+                if gain != self._memo_gain:
+                    if self._memo:
+                        self.stats["memo_resets"] += 1
+                    # 윈도우 위치는 gain 과 무관하므로 점수만 다시 계산하면 된다
+                    self._stale.update(self._memo)
+                    self._memo, self._memo_gain = {}, gain
+                known = set(self._memo)
+
+            # 1. 새로 끝난 윈도우: [start, n_ms) 만 계획 (녹음 전체 기준 임계값,
+            #    인덱스는 녹음 전체 것에서 잘라 씀)
+            safe_end = n_ms - STREAM_LOOKBACK_MS
+            align = self._frame_align()
+            start = max(
+                0,
+                self._resume_ms - _REGION_PAD_MS,
+                self._done_ms - _REGION_MAX_MS,
+            )
+            start -= start % align
+            per_ms = PCM_SR // 1000
+            pcm = self._index.norm.array()
+            region = pcm[start * per_ms : n_ms * per_ms]
+            plan = plan_filler_windows(
+                region,
+                self.segmentation,
+                self.params,
+                gain,
+                energy=self._index.energy(start, self._index.energy()),
+                vad_index=self._index.vad_index(start),
+            )
+            fresh = []
+            for ws, we, d in plan.candidates:
+                ws, we = ws + start, we + start
+                if self._done_ms < we <= safe_end and (ws, we) not in known:
+                    fresh.append((ws, we, d))
+            # 다음 재개 위치: safe_end 에 걸친 발화 구간의 시작 (없으면 safe_end)
+            resume = safe_end
+            for s0, e0 in zip(plan.speech_iv.s.tolist(), plan.speech_iv.e.tolist()):
+                if e0 + start > safe_end:
+                    resume = min(resume, s0 + start)
+
+            # 2. gain 이 바뀌어 버린 점수: 시작 순으로 STREAM_RESCORE_MAX 개까지
+            #    (노멀라이즈된 녹음 파일에서 그 윈도우들만 읽음)
+            fresh_keys = {(ws, we) for ws, we, _ in fresh}
+            stale = sorted(self._stale - fresh_keys)[: max(0, STREAM_RESCORE_MAX)]
+            stale_items = [(ws, we, we - ws) for ws, we in stale]
+
+            probs = self._score(region, start, fresh).tolist()
+            probs += self._score(pcm, 0, stale_items).tolist()
+
+            with self._memo_lock:
+                if self._memo_gain == gain:
+                    for (ws, we, _), p0 in zip(fresh + stale_items, probs):
+                        self._memo[(ws, we)] = float(p0)
+                    self._stale -= fresh_keys | set(stale)
+                    self.stats["speculated"] += len(probs)
+            self._done_ms = max(self._done_ms, safe_end)
+            self._resume_ms = max(self._resume_ms, resume)
+            self._ckpt_ms = n_ms
+            self.stats["checkpoints"] += 1
+            self.stats["max_region_ms"] = max(self.stats["max_region_ms"], n_ms - start)
+        except Exception as e:
+            # 미리 계산은 최적화일 뿐이므로 실패해도 close 에서 전부 계산하면 된다
+            traceback.print_exc()
+            self.stats["checkpoint_error"] = str(e)
+            self._index.invalidate()
+        finally:
+            self.stats["checkpoint_sec"] = round(
+                self.stats["checkpoint_sec"] + time.perf_counter() - t0, 3
+            )
+
+    # ---------------------------------------------------------------
+    def close(self, progress=None) -> Dict[str, Any]:
+        """입력 끝. 전체 녹음 기준 최종 결과 (체크포인트가 쌓아 둔 인덱스 / 점수 재사용)"""
+        from core_filler import (
+            finish_filler_analysis,
+            plan_filler_windows,
+            score_window_plan,
+        )
+
+        with self._lock:
+            if self.state != OPEN:
+                raise StreamStateError(f"세션이 열려 있지 않습니다: {self.state}")
+            self.state = CLOSING
+        t0 = time.perf_counter()
+        timer = StageTimer()  # 남은 디코딩 + 인덱스 (대부분은 체크포인트 때 끝남)
+        try:
+            if self.bytes == 0:
+                raise StreamInputError("오디오 데이터가 없습니다.")
+            # 진행 중인 체크포인트가 끝나야 원본 / 인덱스 파일을 이어 쓸 수 있다
+            ckpt = self._ckpt
+            if ckpt is not None:
+                ckpt.result()
+            try:
+                with timer.stage("decode"):
+                    self._take(self._decoder.finish())
+            except AudioLimitError as e:
+                raise StreamTooLargeError(str(e)) from e
+            except subprocess.CalledProcessError as e:
+                raise StreamDecodeError(e.stderr or str(e)) from e
+            n = len(self._raw)
+            if n == 0:
+                raise StreamInputError("오디오 데이터가 없습니다.")
+
+            with timer.stage("decode"):
+                # decode_normalized_pcm16 처럼 PcmBuffer 의 ms 길이만큼 0 으로 채움
+                total = padded_len(n, PCM_SR)
+                self._raw.append(np.zeros(total - n, dtype=np.int16))
+                per_ms = PCM_SR // 1000
+                len_ms = total // per_ms
+                gain = peak_gain_db(self._peak)
+                raw = self._raw.array()
+                self._index.sync(raw, len_ms, gain)
+                self._index.finish(raw[len_ms * per_ms :])
+                pcm = self._index.norm.array()
+            plan = plan_filler_windows(
+                pcm,
+                self.segmentation,
+                self.params,
+                gain,
+                progress,
+                energy=self._index.energy(),
+                vad_index=self._index.vad_index(),
+            )
+            with self._memo_lock:
+                known = dict(self._memo) if self._memo_gain == gain else {}
+            if analysis_pool.enabled():
+                probs, inference = _score_remaining(
+                    self.model_path, plan, pcm, known, progress
+                )
+            else:
+                model = load_filler_model(self.model_path)
+                probs, inference = score_window_plan(plan, model, progress, known=known)
+            result = finish_filler_analysis(plan, probs, inference, progress)
+        except Exception:
+            self.state = FAILED
+            self._release()
+            raise
+        self.state = CLOSED
+        self.stats["index_rebuilds"] = self._index.rebuilds
+        self._release()
+        result["diag"]["timings"] = {**timer.to_dict(), **result["diag"]["timings"]}
+        result["diag"]["stream"] = {
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "duration_ms": n * 1000 // PCM_SR,
+            **{k: v for k, v in self.stats.items() if v is not None},
+            "reused": inference.get("reused", 0),
+            "rescored": len(plan.candidates) - inference.get("reused", 0),
+            "close_sec": round(time.perf_counter() - t0, 3),
+        }
+        return result
+
+    def abort(self):
+        with self._lock:
+            if self.state in (OPEN, CLOSING):
+                self.state = ABORTED
+        self._release()
+
+    @property
+    def sha256(self) -> str:
+        return self._sha.hexdigest()
+
+    def to_dict(self) -> dict:
+        return {
+            "stream_id": self.id,
+            "state": self.state,
+            "format": self.format,
+            "segmentation": self.segmentation,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "decoded_ms": self.decoded_ms(),
+            "checkpoints": self.stats["checkpoints"],
+            "speculated": self.stats["speculated"],
+            "created_at": self.created_at,
+            "touched_at": self.touched_at,
+        }
+
+
+def _score_remaining(
+    model_path: str,
+    plan,
+    pcm: np.ndarray,
+    known: Dict[Tuple[int, int], float],
+    progress=None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    score_window_plan(plan, known=known) 의 풀 버전: 재사용하지 못한 윈도우만 고른 크기로
+    나눠 분석 풀 워커들이 점수 계산 (split_candidates)
+    """
+    from core_filler import split_candidates
+
+    items = plan.candidates
+    probs = np.zeros((len(items),), dtype=np.float32)
+    todo = []
+    for i, (ws, we, _) in enumerate(items):
+        if (ws, we) in known:
+            probs[i] = known[(ws, we)]
+        else:
+            todo.append(i)
+    reused = len(items) - len(todo)
+    report = progress or (lambda *a, **k: None)
+
+    def relay(stage, value, scored, total):
+        done = reused + scored
+        report(
+            stage, done / len(items) if items else value, scored=done, total=len(items)
+        )
+
+    with plan.timer.stage("chunks"):
+        part, inference = analysis_pool.score_windows(
+            model_path,
+            pcm,
+            [items[i] for i in todo],
+            split_candidates(len(todo), analysis_pool.MAX_CHUNKS),
+            plan.params,
+            plan,
+            progress=relay,
+        )
+    probs[todo] = part
+    if items and not todo:
+        report("windows", 1.0, scored=len(items), total=len(items))
+    inference["reused"] = reused
+    return probs, inference
+
+
+class StreamLimitError(RuntimeError):
+    """동시 세션 수 초과. 429"""
+
+
+class StreamManager:
+    def __init__(
+        self,
+        max_workers: int = STREAM_WORKERS,
+        max_bytes: int = 0,
+        max_sec: float = 0.0,
+        spool_dir: Optional[str] = None,
+    ):
+        """max_bytes / max_sec / spool_dir: 세션마다 넘기는 값 (StreamSession 참고)"""
+        self.max_bytes = max_bytes
+        self.max_sec = max_sec
+        self.spool_dir = spool_dir
+        self._sessions: Dict[str, StreamSession] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="stream"
+        )
+
+    def open(
+        self, model_path: str, segmentation: str, params, fmt: str = "auto"
+    ) -> StreamSession:
+        with self._lock:
+            self._evict()
+            if len(self._sessions) >= STREAM_MAX_SESSIONS:
+                raise StreamLimitError("열린 스트리밍 세션이 너무 많습니다.")
+            session = StreamSession(
+                model_path,
+                segmentation,
+                params,
+                fmt,
+                pool=self._pool,
+                max_bytes=self.max_bytes,
+                max_sec=self.max_sec,
+                spool_dir=self.spool_dir,
+            )
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, stream_id: str) -> Optional[StreamSession]:
+        with self._lock:
+            self._evict()
+            return self._sessions.get(stream_id)
+
+    def remove(self, stream_id: str) -> Optional[StreamSession]:
+        with self._lock:
+            session = self._sessions.pop(stream_id, None)
+        if session is not None:
+            session.abort()
+        return session
+
+    def _evict(self):
+        now = time.time()
+        expired = [
+            k
+            for k, s in self._sessions.items()
+            if s.state != CLOSING and now - s.touched_at > STREAM_TTL_SEC
+        ]
+        for k in expired:
+            self._sessions.pop(k).abort()
@@ -0,0 +1,111 @@
+"""
+ml-server 테스트 공용 fixture.
+
+- 모듈은 ml-server 에 평평하게 있으므로 sys.path 에 추가해서 import
+- 모델은 TF 없이 도는 결정적 numpy 대역(FakeModel). 윈도우(행)마다 독립적인 값을
+  내므로 배치 구성이 달라도 같은 윈도우는 같은 확률이 나온다
+- 오디오는 잡음 + 하모닉 "발화" 를 무작위로 배치한 합성 wav
+- 분석 풀(analysis_pool)은 프로세스 대신 같은 프로세스의 스레드로 (inline_pool)
+"""
+
+import io
+import os
+import sys
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeModel:
+    """(N, 20, 40, 1) -> (N, 2) softmax 비슷한 출력. filler 확률은 0~1 에 고르게 퍼짐"""
+
+    backend_name = "fake"
+
+    def __init__(self):
+        self.calls = []  # 호출마다 배치 크기
+
+    def predict_on_batch(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        self.calls.append(len(x))
+        # 행마다 따로 계산 (배치 크기와 무관한 값)
+        p = np.array([0.5 + 0.5 * np.sin(float(row.sum()) * 0.01) for row in x])
+        return np.stack([p, 1.0 - p], axis=1).astype(np.float32)
+
+    def predict(self, x, verbose=0):
+        return self.predict_on_batch(x)
+
+
+def synth_wav(seconds: float = 20, seed: int = 0, sr: int = 16000) -> bytes:
+    """잡음 바닥 + 길이가 제각각인 하모닉 발화 구간 (16k/mono/16bit wav)"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    y = rng.normal(0, 0.003, n)
+    t = 0
+    while t < n:
+        t += int(rng.uniform(0.1, 1.8) * sr)  # 쉼
+        short = rng.random() < 0.5
+        L = int((rng.uniform(0.15, 0.45) if short else rng.uniform(0.5, 1.5)) * sr)
+        if t + L > n:
+            break
+        tt = np.arange(L) / sr
+        f0 = rng.uniform(90, 220)
+        sig = sum(
+            (1 / k) * np.sin(2 * np.pi * f0 * k * tt + rng.uniform(0, 6))
+            for k in range(1, 8)
+        )
+        env = np.sin(np.pi * np.arange(L) / L) ** 0.5 * (
+            0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(2, 6) * tt)
+        )
+        y[t : t + L] += 0.2 * sig * env * rng.uniform(0.3, 1.0)
+        t += L
+    pcm = (np.clip(y, -1, 1) * 20000).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+class InlinePool:
+    """analysis_pool.LazyPool 대역: run(call) 을 스레드 풀로"""
+
+    def run(self, call, *initargs):
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            return call(ex)
+
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
+
+
+@pytest.fixture
+def inline_pool(monkeypatch, fake_model):
+    """process 모드 analysis_pool: 워커는 스레드, 워커 모델은 fake_model, 청크 최대 3개"""
+    import analysis_pool
+
+    monkeypatch.setattr(analysis_pool, "EXECUTION", "process")
+    monkeypatch.setattr(analysis_pool, "_pool", InlinePool())
+    monkeypatch.setattr(analysis_pool, "_worker_model", fake_model)
+    monkeypatch.setattr(analysis_pool, "MAX_CHUNKS", 3)
+
+
+@pytest.fixture(scope="session")
+def wav_30s():
+    return synth_wav(30, seed=1)
+
+
+def strip_diag(result: dict, *keys: str) -> dict:
+    """결과 비교용: diag 에서 실행마다 달라지는 항목(timings 등)을 뺀 사본"""
+    import copy
+
+    out = copy.deepcopy(result)
+    for k in ("timings",) + keys:
+        out["diag"].pop(k, None)
+    return out
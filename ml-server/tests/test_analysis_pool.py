@@ -0,0 +1,158 @@
+"""
+analysis_pool 의 분할 / 재조립. 워커는 프로세스 대신 같은 프로세스의 스레드로
+돌리고(conftest.inline_pool) 워커 모델은 FakeModel
+"""
+
+import functools
+import os
+import time
+
+import numpy as np
+import pytest
+
+import analysis_pool
+from conftest import strip_diag, synth_wav
+from convert import decode_normalized_pcm16
+from core_filler import (
+    faster_run_filler_analysis_pcm,
+    finish_filler_analysis,
+    plan_filler_windows,
+    score_window_plan,
+    score_window_plans,
+    split_candidates,
+    split_window_plan,
+)
+
+
+@pytest.fixture(scope="module")
+def recordings():
+    out = []
+    for seconds, seed in ((12, 2), (30, 1), (7, 3)):
+        pcm, gain = decode_normalized_pcm16(synth_wav(seconds, seed=seed))
+        out.append((pcm, gain))
+    return out
+
+
+def _plans(recordings):
+    return [
+        plan_filler_windows(pcm, "adaptive", None, gain) for pcm, gain in recordings
+    ]
+
+
+@pytest.mark.parametrize("batch_size", [256, 16, 5])
+def test_score_plans_matches_shared_batch(
+    inline_pool, fake_model, recordings, batch_size
+):
+    ref_plans = _plans(recordings)
+    ref, ref_inf = score_window_plans(ref_plans, fake_model, batch_size)
+    calls = list(fake_model.calls)
+    fake_model.calls.clear()
+
+    plans = _plans(recordings)
+    pcms = [pcm for pcm, _ in recordings]
+    probs, inf = analysis_pool.score_plans("unused", plans, pcms, batch_size)
+
+    for a, b in zip(probs, ref):
+        np.testing.assert_array_equal(a, b)
+    # 청크 경계가 배치 경계에 있으므로 모델이 받는 배치 구성도 같음
+    assert sorted(fake_model.calls) == sorted(calls)
+    assert inf["calls"] == ref_inf["calls"]
+    assert inf["windows"] == ref_inf["windows"] == sum(len(p.candidates) for p in plans)
+    assert sum(c["windows"] for c in inf["chunks"]) == inf["windows"]
+    assert len(inf["chunks"]) <= 3
+    for plan, ref_plan in zip(plans, ref_plans):
+        assert plan.engine.frames_computed >= ref_plan.engine.frames_computed
+        assert "mfcc" in plan.timer.to_dict()
+
+
+@pytest.mark.parametrize("params", [None, {"mfcc_engine": False}])
+def test_plan_pcm_matches_request_process_plan(
+    inline_pool, fake_model, recordings, params
+):
+    # /analyze/batch 프로세스 모드: 분할 / 필터는 워커에서, 결과는 요청 프로세스와 같음
+    pcm, gain = recordings[1]
+    ref = plan_filler_windows(pcm, "adaptive", params, gain)
+    plan = analysis_pool.plan_pcm("unused", pcm, "adaptive", params, gain)
+    assert plan.candidates == ref.candidates
+    assert list(plan.speech_iv) == list(ref.speech_iv)
+    assert plan.drop == ref.drop and plan.total_windows == ref.total_windows
+    assert plan.full.samples is not None and len(plan.full) == len(ref.full)
+    assert (plan.engine is None) == (ref.engine is None)
+    assert {"segmentation", "window_filter"} <= set(plan.timer.to_dict())
+
+    ref_probs, ref_inf = score_window_plans([ref], fake_model, 256)
+    probs, inf = analysis_pool.score_plans("unused", [plan], [pcm], 256)
+    keys = ("inference", "features")
+    assert strip_diag(finish_filler_analysis(plan, probs[0], inf), *keys) == strip_diag(
+        finish_filler_analysis(ref, ref_probs[0], ref_inf), *keys
+    )
+
+
+def test_score_plans_without_candidates(inline_pool, recordings):
+    pcm, gain = recordings[0]
+    plan = plan_filler_windows(pcm, "adaptive", None, gain)
+    plan.candidates = []
+    probs, inf = analysis_pool.score_plans("unused", [plan], [pcm], 256)
+    assert len(probs[0]) == 0
+    assert inf["calls"] == 0 and inf["chunks"] == []
+
+
+def test_split_candidates_follows_pool_size():
+    # 경계를 모델 배치(256)에 맞추지 않으므로 후보가 배치 하나보다 적어도 워커 수만큼
+    ranges = split_candidates(367, 4)
+    assert [j - i for i, j in ranges] == [91, 92, 92, 92]
+    assert ranges[0][0] == 0 and ranges[-1][1] == 367
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert split_candidates(2, 4) == [(0, 1), (1, 2)]
+    assert split_candidates(0, 4) == []
+
+
+@pytest.mark.parametrize("params", [None, {"infer_batch_size": 16}])
+def test_chunked_matches_single_pass_per_row(
+    inline_pool, fake_model, recordings, params
+):
+    pcm, gain = recordings[1]
+    plan = plan_filler_windows(pcm, "adaptive", params, gain)
+    ref, _ = score_window_plan(plan, fake_model)
+
+    plan = plan_filler_windows(pcm, "adaptive", params, gain)
+    ranges = split_window_plan(plan, analysis_pool.MAX_CHUNKS)
+    probs, inf = analysis_pool.score_windows(
+        "unused", pcm, plan.candidates, ranges, params, plan
+    )
+    # 청크마다 배치 구성이 달라도 윈도우(행)별 확률은 같음
+    np.testing.assert_allclose(probs, ref, rtol=0, atol=1e-6)
+    assert len(inf["chunks"]) == 3 and len(plan.candidates) < 256
+    assert all(c["worker_ms"] >= 0 for c in inf["chunks"])
+
+    single = faster_run_filler_analysis_pcm(pcm, fake_model, "adaptive", params, gain)
+    chunked = analysis_pool.analyze_pcm_chunked("unused", pcm, "adaptive", params, gain)
+    keys = ("inference", "features")
+    assert strip_diag(chunked, *keys) == strip_diag(single, *keys)
+
+
+def _staggered_init(marker: str, model_path: str):
+    # 처음 뜬 워커만 바로 준비되고 나머지는 모델 로드가 느린 것처럼
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        time.sleep(1.5)
+    analysis_pool._worker_model = object()
+
+
+def test_warmup_waits_for_every_worker(monkeypatch, tmp_path):
+    marker = str(tmp_path / "first")
+    lazy = analysis_pool.LazyPool(2, functools.partial(_staggered_init, marker))
+    monkeypatch.setattr(analysis_pool, "_pool", lazy)
+    monkeypatch.setattr(analysis_pool, "POOL_SIZE", 2)
+    t0 = time.monotonic()
+    try:
+        assert analysis_pool.warmup("unused") == 2
+        assert time.monotonic() - t0 >= 1.5
+        pids = {
+            f.result()
+            for f in [lazy.get().submit(analysis_pool._ping, 0.2) for _ in range(2)]
+        }
+        assert len(pids) == 2
+    finally:
+        lazy.get().shutdown()
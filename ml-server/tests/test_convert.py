@@ -0,0 +1,106 @@
+"""
+convert 의 ffmpeg 디코딩: 깨진 입력이 stderr 를 파이프 버퍼(64KB) 이상 쏟아내도
+멈추지 않는지 (stderr 를 끝에서 한 번에 읽으면 ffmpeg 가 막혀 stdout 읽기도 멈춤)
+"""
+
+import random
+import subprocess
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import synth_wav
+from convert import (
+    AudioLimitError,
+    StreamingPcmDecoder,
+    decode_to_pcm16,
+    spilled_pcm,
+)
+
+STDERR_PIPE = 1 << 16
+
+
+@pytest.fixture(scope="module")
+def noisy_mp3():
+    """프레임마다 에러를 찍도록 바이트를 군데군데 깨뜨린 mp3 (stderr 가 파이프보다 큼)"""
+    wav = synth_wav(240, seed=1)
+    cmd = ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-b:a", "32k"]
+    mp3 = bytearray(
+        subprocess.run(
+            [*cmd, "-f", "mp3", "pipe:1"], input=wav, capture_output=True, check=True
+        ).stdout
+    )
+    rng = random.Random(0)
+    for i in range(2000, len(mp3), 50):
+        mp3[i] = rng.randrange(256)
+    data = bytes(mp3)
+    probe = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0"]
+        + ["-ac", "1", "-ar", "16000", "-f", "s16le", "pipe:1"],
+        input=data,
+        capture_output=True,
+    )
+    assert len(probe.stderr) > STDERR_PIPE
+    return data, np.frombuffer(probe.stdout, dtype=np.int16)
+
+
+def _within(seconds: float, fn):
+    """fn() 을 스레드에서 실행해 seconds 안에 끝나야 함 (막히면 테스트 실패)"""
+    out = []
+    t = threading.Thread(target=lambda: out.append(fn()), daemon=True)
+    t.start()
+    t.join(seconds)
+    assert not t.is_alive(), "ffmpeg 디코딩이 stderr 파이프에서 멈춤"
+    return out[0]
+
+
+def test_decode_survives_heavy_stderr(noisy_mp3, tmp_path):
+    data, ref = noisy_mp3
+    np.testing.assert_array_equal(_within(30, lambda: decode_to_pcm16(data)), ref)
+
+    # 청크 입력 + 임시 파일 spill 경로도 같은 결과
+    chunks = [data[i : i + 8192] for i in range(0, len(data), 8192)]
+    pcm = _within(
+        30,
+        lambda: decode_to_pcm16(
+            iter(chunks), spill_samples=16000, spill_dir=str(tmp_path)
+        ),
+    )
+    assert spilled_pcm(pcm) is not None
+    np.testing.assert_array_equal(pcm, ref)
+
+
+def test_decode_limit_stops_noisy_input(noisy_mp3):
+    data, _ = noisy_mp3
+
+    def run():
+        with pytest.raises(AudioLimitError):
+            decode_to_pcm16(data, max_samples=16000 * 10)
+
+    _within(30, run)
+
+
+def test_streaming_decoder_survives_heavy_stderr(noisy_mp3):
+    data, ref = noisy_mp3
+
+    def run():
+        dec = StreamingPcmDecoder()
+        for i in range(0, len(data), 8192):
+            dec.write(data[i : i + 8192])
+        return dec.finish()
+
+    np.testing.assert_array_equal(_within(30, run), ref)
+
+
+def test_streaming_decoder_take_leaves_only_the_rest():
+    wav = synth_wav(20, seed=3)
+    ref = decode_to_pcm16(wav)
+    dec = StreamingPcmDecoder()
+    parts = []
+    for i in range(0, len(wav), 8191):
+        dec.write(wav[i : i + 8191])
+        parts.append(dec.take())
+    parts.append(dec.finish())
+    np.testing.assert_array_equal(np.concatenate(parts), ref)
+    assert dec.samples() == len(ref)
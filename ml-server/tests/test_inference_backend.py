@@ -0,0 +1,143 @@
+"""
+inference_backend: 양자화 변환본의 parity 통과 기록 확인, remote 클라이언트의
+요청 제한 시간 / 사이드카 재시작 뒤 재연결 / 상태 확인
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import inference_backend as ib
+from conftest import FakeModel
+
+
+@pytest.fixture
+def converted(tmp_path):
+    path = tmp_path / "model.int8.onnx"
+    path.write_bytes(b"onnx")
+    return path
+
+
+def _write(path, **rec):
+    report = ib.parity_report_path(path)
+    report.write_text(json.dumps(rec))
+    return report
+
+
+def test_missing_report_is_rejected(converted):
+    with pytest.raises(ValueError, match="--backends onnx:int8 --write-report"):
+        ib.check_parity_report(converted, "onnx", "int8")
+
+
+def test_failed_report_is_rejected(converted):
+    _write(converted, passed=False, threshold_flips=3, max_abs=0.045)
+    with pytest.raises(ValueError, match="threshold_flips=3"):
+        ib.check_parity_report(converted, "onnx", "int8")
+
+
+def test_report_older_than_converted_file_is_rejected(converted):
+    report = _write(converted, passed=True)
+    st = converted.stat()
+    os.utime(report, (st.st_atime - 10, st.st_mtime - 10))
+    with pytest.raises(ValueError, match="오래됐습니다"):
+        ib.check_parity_report(converted, "onnx", "int8")
+
+
+def test_passed_report_is_accepted(converted):
+    _write(converted, passed=True, threshold_flips=0, max_abs=4e-4)
+    ib.check_parity_report(converted, "onnx", "int8")
+
+
+class _Sidecar:
+    """tmp 소켓에서 _serve_conn + MicroBatcher 로 도는 사이드카 (model 은 FakeModel 계열)"""
+
+    def __init__(self, path, model):
+        import inference_server
+
+        self.path = str(path)
+        self.batcher = inference_server.MicroBatcher(model, max_wait_ms=1)
+        self.srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.srv.bind(self.path)
+        self.srv.listen(8)
+        self.conns = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        import inference_server
+
+        while True:
+            try:
+                conn, _ = self.srv.accept()
+            except OSError:
+                return
+            self.conns.append(conn)
+            threading.Thread(
+                target=inference_server._serve_conn,
+                args=(conn, self.batcher, {"backend": "fake"}),
+                daemon=True,
+            ).start()
+
+    def stop(self):
+        self.srv.close()
+        for c in self.conns:
+            c.shutdown(socket.SHUT_RDWR)
+        os.unlink(self.path)
+
+
+class _HangModel(FakeModel):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def predict_on_batch(self, x):
+        self.release.wait(10)
+        return super().predict_on_batch(x)
+
+
+@pytest.fixture
+def sock_path(tmp_path, monkeypatch):
+    import inference_server
+
+    path = tmp_path / "infer.sock"
+    monkeypatch.setattr(inference_server, "SOCKET_PATH", str(path))
+    monkeypatch.setattr(ib, "REQUEST_TIMEOUT", 1.0)
+    return path
+
+
+def _xs(n):
+    return np.ones((n, 20, 40, 1), dtype=np.float32)
+
+
+def test_hung_sidecar_times_out(sock_path):
+    model = _HangModel()
+    sidecar = _Sidecar(sock_path, model)
+    client = ib.RemoteBackend(timeout=5)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.predict_on_batch(_xs(2))
+    assert time.monotonic() - t0 < 5
+    model.release.set()
+    sidecar.stop()
+
+
+def test_client_reconnects_to_restarted_sidecar(sock_path, monkeypatch):
+    monkeypatch.setattr(ib, "REQUEST_TIMEOUT", 5.0)
+    first = _Sidecar(sock_path, FakeModel())
+    client = ib.RemoteBackend(timeout=5)
+    assert client.predict_on_batch(_xs(2)).shape == (2, 2)
+    first.stop()
+    threading.Timer(0.5, lambda: _Sidecar(sock_path, FakeModel())).start()
+    assert client.predict_on_batch(_xs(3)).shape == (3, 2)
+
+
+def test_sidecar_status(sock_path):
+    down = ib.sidecar_status(timeout=0.5)
+    assert not down["ok"] and "error" in down
+    sidecar = _Sidecar(sock_path, FakeModel())
+    assert ib.sidecar_status(timeout=0.5) == {"ok": True, "backend": "fake"}
+    sidecar.stop()
@@ -0,0 +1,79 @@
+"""MicroBatcher: 여러 배치로 나뉜 요청의 일부 배치가 실패했을 때"""
+
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import FakeModel
+from inference_server import MicroBatcher, _serve_conn, recv_frame, send_frame
+
+
+class FlakyModel(FakeModel):
+    """fail_on 번째(1부터) 호출에서 예외"""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = set(fail_on)
+
+    def predict_on_batch(self, x):
+        if len(self.calls) + 1 in self.fail_on:
+            self.calls.append(len(x))
+            raise RuntimeError("boom")
+        return super().predict_on_batch(x)
+
+
+def _xs(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 20, 40, 1)).astype(np.float32)
+
+
+@pytest.fixture
+def conn_to():
+    """batcher 에 붙은 _serve_conn 으로 predict 요청 하나 보내고 응답 헤더 / 출력 반환"""
+    socks = []
+
+    def call(batcher, xs):
+        a, b = socket.socketpair()
+        socks.append(a)
+        threading.Thread(target=_serve_conn, args=(b, batcher, {}), daemon=True).start()
+        send_frame(a, {"op": "predict", "shape": list(xs.shape)}, xs.tobytes())
+        header, payload = recv_frame(a)
+        return header, payload
+
+    yield call
+    for s in socks:
+        s.close()
+
+
+def test_failed_later_slice_fails_the_request(conn_to):
+    model = FlakyModel(fail_on={2})
+    batcher = MicroBatcher(model, max_batch=4, max_wait_ms=1)
+    header, payload = conn_to(batcher, _xs(6))
+    assert header == {"ok": False, "error": "RuntimeError: boom", "nbytes": 0}
+    assert payload == b""
+
+
+def test_remaining_slices_are_dropped_after_failure(conn_to):
+    model = FlakyModel(fail_on={2})
+    batcher = MicroBatcher(model, max_batch=4, max_wait_ms=1)
+    header, _ = conn_to(batcher, _xs(16))
+    assert not header["ok"]
+    # 실패한 뒤 남은 두 배치는 추론하지 않음
+    assert model.calls == [4, 4]
+
+    # 실패가 다음 요청에 번지지 않음 (공유 error 상태 없음)
+    xs = _xs(6, seed=1)
+    header, payload = conn_to(batcher, xs)
+    assert header["ok"] and header["batches"] == [4, 2]
+    out = np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+    np.testing.assert_array_equal(out, FakeModel().predict_on_batch(xs))
+
+
+def test_failure_fails_every_request_in_the_batch():
+    model = FlakyModel(fail_on={1})
+    batcher = MicroBatcher(model, max_batch=8, max_wait_ms=200)
+    a, b = batcher.submit(_xs(3)), batcher.submit(_xs(2, seed=2))
+    assert a.done.wait(5) and b.done.wait(5)
+    assert a.error == b.error == "RuntimeError: boom"
+    assert model.calls == [5]
@@ -0,0 +1,86 @@
+import os
+import runpy
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import pytest
+
+from jobs import DONE, FAILED, JobManager, JobQueueFull
+
+CONF = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+
+
+def test_drain_waits_for_running_jobs():
+    jobs = JobManager(max_workers=1)
+    release = threading.Event()
+    running = jobs.submit("t", lambda job: release.wait(5) and "ok")
+    queued = jobs.submit("t", lambda job: "second")
+    ticks = []
+    assert jobs.drain(0.3, tick=lambda: ticks.append(1)) == 2
+
+    release.set()
+    assert jobs.drain(5) == 0
+    assert running.state == DONE and running.result == "ok"
+    assert queued.state == DONE and queued.result == "second"
+
+
+def test_drain_counts_failed_jobs_as_finished():
+    jobs = JobManager(max_workers=1)
+
+    def boom(job):
+        raise RuntimeError("x")
+
+    job = jobs.submit("t", boom)
+    assert jobs.drain(5) == 0
+    assert job.state == FAILED and job.error == "x"
+
+
+def test_submit_rejects_past_queue_depth():
+    jobs = JobManager(max_workers=1, max_queue=2)
+    release = threading.Event()
+    jobs.submit("t", lambda job: release.wait(5))
+    jobs.submit("t", lambda job: "queued")
+    with pytest.raises(JobQueueFull):
+        jobs.submit("t", lambda job: "rejected")
+    release.set()
+    assert jobs.drain(5) == 0
+    assert jobs.submit("t", lambda job: "again").id
+
+
+class _Worker:
+    """gunicorn 워커 흉내: worker_exit 전에 arbiter 가 tmp 를 닫은 상태"""
+
+    def __init__(self):
+        self.tmp = tempfile.TemporaryFile()
+        self.tmp.close()
+        self.log = types.SimpleNamespace(warning=lambda *a: self.warnings.append(a))
+        self.warnings = []
+
+    def notify(self):
+        # gunicorn WorkerTmp.notify 와 같이 닫힌 파일이면 ValueError
+        os.utime(self.tmp.fileno())
+
+
+def test_worker_exit_drains_with_closed_worker_tmp(monkeypatch):
+    hooks = runpy.run_path(CONF)
+    jobs = JobManager(max_workers=1)
+    monkeypatch.setitem(sys.modules, "main", types.SimpleNamespace(job_manager=jobs))
+    server = types.SimpleNamespace(cfg=types.SimpleNamespace(graceful_timeout=30))
+    worker = _Worker()
+
+    done = jobs.submit("t", lambda job: time.sleep(1.2) or "ok")
+    hooks["worker_exit"](server, worker)
+    assert done.state == DONE and worker.warnings == []
+
+    # 기다림은 graceful-timeout 을 넘지 않고, 남은 job 수를 로그로 남김
+    release = threading.Event()
+    jobs.submit("t", lambda job: release.wait(5))
+    server.cfg.graceful_timeout = 0.3
+    t0 = time.monotonic()
+    hooks["worker_exit"](server, worker)
+    assert time.monotonic() - t0 < 1.0
+    assert worker.warnings and worker.warnings[0][1] == 1
+    release.set()
@@ -0,0 +1,162 @@
+"""object_store 스트리밍 다운로드 / 재시도 + URL 소스 디코딩 (로컬 HTTP 서버 상대로)"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+
+import object_store
+from conftest import synth_wav
+
+
+class _Server:
+    """경로별 응답 스크립트를 가진 로컬 HTTP 서버. hits 에 경로별 요청 수"""
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                n = server.hits.get(self.path, 0)
+                server.hits[self.path] = n + 1
+                server.routes[self.path](self, n)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _send(h, status: int, body: bytes = b"", ctype="application/octet-stream"):
+    h.send_response(status)
+    h.send_header("Content-Type", ctype)
+    h.send_header("Content-Length", str(len(body)))
+    h.end_headers()
+    h.wfile.write(body)
+
+
+def _send_chunked(h, body: bytes, size: int, ctype="audio/wav"):
+    """Content-Length 없이 Transfer-Encoding: chunked 로 size 바이트씩"""
+    h.send_response(200)
+    h.send_header("Content-Type", ctype)
+    h.send_header("Transfer-Encoding", "chunked")
+    h.end_headers()
+    for i in range(0, len(body), size):
+        part = body[i : i + size]
+        h.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+        h.wfile.flush()
+    h.wfile.write(b"0\r\n\r\n")
+
+
+@pytest.fixture
+def server():
+    s = _Server()
+    yield s
+    s.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_session(monkeypatch):
+    # backoff 없이 재시도하는 새 세션 (모듈 세션은 테스트마다 다시 만듦)
+    monkeypatch.setattr(object_store, "BACKOFF", 0.0)
+    monkeypatch.setattr(object_store, "_session", None)
+    yield
+    object_store._session = None
+
+
+def _fetch(url: str, chunk_size: int = 1024) -> bytes:
+    with object_store.open_stream(url) as r:
+        return b"".join(object_store.iter_body(r, chunk_size=chunk_size))
+
+
+def test_iter_body_streams_whole_body(server):
+    body = bytes(range(256)) * 100
+    server.routes["/a"] = lambda h, n: _send(h, 200, body)
+    with object_store.open_stream(server.url("/a")) as r:
+        chunks = list(object_store.iter_body(r, chunk_size=1000))
+    assert b"".join(chunks) == body
+    assert len(chunks) > 1 and all(chunks)
+
+
+def test_open_stream_retries_5xx_then_succeeds(server):
+    body = b"x" * 5000
+    server.routes["/flaky"] = lambda h, n: (
+        _send(h, 503, b"busy") if n < 2 else _send(h, 200, body)
+    )
+    assert _fetch(server.url("/flaky")) == body
+    assert server.hits["/flaky"] == 3
+
+
+def test_open_stream_gives_up_after_retries(server):
+    server.routes["/down"] = lambda h, n: _send(h, 503, b"busy")
+    with pytest.raises(requests.HTTPError):
+        _fetch(server.url("/down"))
+    assert server.hits["/down"] == object_store.RETRIES + 1
+
+
+def test_open_stream_does_not_retry_4xx(server):
+    server.routes["/gone"] = lambda h, n: _send(h, 404, b"nope")
+    with pytest.raises(requests.HTTPError):
+        _fetch(server.url("/gone"))
+    assert server.hits["/gone"] == 1
+
+
+def test_open_stream_connection_refused(server):
+    url = server.url("/x")
+    server.close()
+    with pytest.raises(requests.ConnectionError):
+        _fetch(url)
+
+
+def test_peek_keeps_head_in_stream():
+    chunks = iter([b"ab", b"cd", b"ef", b"gh"])
+    head, rest = object_store.peek(chunks, 3)
+    assert head == b"abcd"
+    assert b"".join(rest) == b"abcdefgh"
+
+
+def test_chunked_download_decodes_like_whole_body(server):
+    from convert import decode_normalized_pcm16
+
+    wav = synth_wav(5, seed=3)
+    server.routes["/rec.wav"] = lambda h, n: _send_chunked(h, wav, 3001)
+    with object_store.open_stream(server.url("/rec.wav")) as r:
+        assert "Content-Length" not in r.headers
+        streamed, gain_s = decode_normalized_pcm16(object_store.iter_body(r, 4096))
+    whole, gain_w = decode_normalized_pcm16(wav)
+    assert gain_s == gain_w
+    np.testing.assert_array_equal(np.asarray(streamed), np.asarray(whole))
+
+
+def test_decode_source_url_matches_inline(server):
+    import hashlib
+
+    import main
+
+    wav = synth_wav(5, seed=4)
+    server.routes["/rec.wav"] = lambda h, n: (
+        _send(h, 502) if n == 0 else _send_chunked(h, wav, 5000)
+    )
+    url_audio = main._decode_source({"type": "url", "url": server.url("/rec.wav")})
+    inline = main._decode_source(
+        {"type": "inline", "audio_bytes": wav, "mimetype": "audio/wav"}
+    )
+    assert url_audio.sha256 == inline.sha256 == hashlib.sha256(wav).hexdigest()
+    assert url_audio.gain_db == inline.gain_db
+    np.testing.assert_array_equal(np.asarray(url_audio.pcm), np.asarray(inline.pcm))
+    assert server.hits["/rec.wav"] == 2
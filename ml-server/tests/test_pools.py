@@ -0,0 +1,95 @@
+"""
+풀 워커가 죽었을 때(BrokenProcessPool) LazyPool / pdf_extract 가 새 풀로 다시 실행하는지
+"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import pdf_extract
+from analysis_pool import LazyPool
+
+
+def _break(pool):
+    """워커 하나를 죽여 pool 을 깨진 상태로 만듦"""
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+
+def test_run_retries_once_on_new_pool():
+    lazy = LazyPool(1)
+    first = lazy.get()
+    _break(first)
+    assert lazy.status()["broken"]
+
+    pid = lazy.run(lambda pool: pool.submit(os.getpid).result())
+    assert isinstance(pid, int) and pid != os.getpid()
+    st = lazy.status()
+    assert st["restarts"] == 1 and not st["broken"]
+    assert lazy.get() is not first
+    lazy.get().shutdown()
+
+
+def test_run_gives_up_after_second_break():
+    lazy = LazyPool(1)
+    calls = []
+
+    def always_break(pool):
+        calls.append(pool)
+        return pool.submit(os._exit, 1).result()
+
+    with pytest.raises(BrokenProcessPool):
+        lazy.run(always_break)
+    assert len(calls) == 2 and calls[0] is not calls[1]
+    assert lazy.discard_if_broken()
+    assert lazy.status() == {
+        "started": False,
+        "broken": False,
+        "restarts": 2,
+        "last_error": "broken",
+    }
+
+
+def _pdf(pages: int) -> bytes:
+    import pymupdf
+
+    doc = pymupdf.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1} body text")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pdf_stream_recovers_from_broken_pool(monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_extract, "_pool", LazyPool(1, pdf_extract._init_worker))
+    data = _pdf(3)
+    _break(pdf_extract._pool.get())
+
+    recs = list(pdf_extract.iter_pages(data, [0, 1, 2]))
+    pages = [r for r in recs if r["type"] == "page"]
+    assert [r["fallback"] for r in pages] == [False, False, False]
+    assert "Page 2" in pages[1]["text"]
+    assert pdf_extract.pool_status()["restarts"] == 1
+
+    _break(pdf_extract._pool.get())
+    assert "Page 3" in pdf_extract.to_markdown(data, 3)
+    assert pdf_extract.pool_status()["restarts"] == 2
+    pdf_extract._pool.get().shutdown()
+
+
+@pytest.mark.parametrize(
+    "execution, analysis_size, expected",
+    [("inline", 8, 8), ("process", 6, 2), ("process", 8, 1)],
+)
+def test_pdf_pool_shares_cpu_with_analysis_pool(
+    monkeypatch, execution, analysis_size, expected
+):
+    import analysis_pool
+
+    monkeypatch.setattr(analysis_pool, "EXECUTION", execution)
+    monkeypatch.setattr(analysis_pool, "POOL_SIZE", analysis_size)
+    monkeypatch.setattr(pdf_extract, "cpu_quota", lambda: 8)
+    assert pdf_extract._default_pool_size() == expected
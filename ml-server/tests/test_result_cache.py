@@ -0,0 +1,113 @@
+"""result_cache 디스크 계층 (key 이름 파일 + 메모리 색인) 과 /cache 라우트"""
+
+import hashlib
+import json
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+
+def _h(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def _result(n: int = 0) -> dict:
+    return {"filler_ms": n, "pad": "x" * 200, "diag": {}}
+
+
+def test_disk_files_are_named_by_key(tmp_path):
+    cache = ResultCache(max_items=1, disk_dir=str(tmp_path))
+    cache.put(_h("k1"), _h("a1"), _result(1))
+    assert [p.name for p in tmp_path.iterdir()] == [f"{_h('k1')}.json"]
+
+    cache.put(_h("k2"), _h("a1"), _result(2))  # 메모리에서 k1 밀어냄
+    got, tier = cache.get(_h("k1"))
+    assert (got["filler_ms"], tier) == (1, "disk")
+    assert cache.contains(_h("k1")) == "memory"  # 디스크 적중은 메모리로 올림
+    assert cache.contains(_h("k2")) == "disk"
+    info = cache.info()
+    assert info["disk_items"] == 2
+    assert info["disk_bytes"] == sum(p.stat().st_size for p in tmp_path.iterdir())
+
+
+def test_disk_eviction_uses_index_lru(tmp_path):
+    size = len(
+        json.dumps({"audio_sha256": _h("a"), "result": _result()}).encode("utf-8")
+    )
+    cache = ResultCache(max_items=1, disk_dir=str(tmp_path), disk_max_bytes=size * 2)
+    cache.put(_h("k1"), _h("a"), _result())
+    cache.put(_h("k2"), _h("a"), _result())
+    cache.get(_h("k1"))  # k1 을 최근으로
+    cache.put(_h("k3"), _h("a"), _result())
+    names = sorted(p.stem for p in tmp_path.iterdir())
+    assert names == sorted([_h("k1"), _h("k3")])
+    assert cache.info()["disk_bytes"] <= size * 2
+    assert cache.stats["evictions_disk"] == 1
+
+
+def test_index_is_rebuilt_and_old_names_migrated(tmp_path):
+    entry = {"audio_sha256": _h("a"), "result": _result(5)}
+    (tmp_path / f"{_h('a')}-{_h('old')}.json").write_text(json.dumps(entry))
+    (tmp_path / "stray.json").write_text("{}")
+    cache = ResultCache(max_items=4, disk_dir=str(tmp_path))
+    assert cache.info()["disk_items"] == 1
+    got, tier = cache.get(_h("old"))
+    assert (got["filler_ms"], tier) == (5, "disk")
+    assert (tmp_path / f"{_h('old')}.json").exists()
+
+
+def test_other_process_files_are_found_and_invalidated(tmp_path):
+    writer = ResultCache(max_items=4, disk_dir=str(tmp_path))
+    reader = ResultCache(max_items=4, disk_dir=str(tmp_path))
+    writer.put(_h("k1"), _h("a1"), _result(1))
+    writer.put(_h("k2"), _h("a2"), _result(2))
+    assert reader.get(_h("k1"))[1] == "disk"
+    assert reader.invalidate(audio_sha256=_h("a1")) == 2  # 메모리 + 디스크
+    assert not (tmp_path / f"{_h('k1')}.json").exists()
+    assert reader.invalidate() == 1  # 색인에 없던 k2 도 전체 삭제에서 지움
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_non_hex_key_never_touches_disk(tmp_path):
+    cache = ResultCache(max_items=4, disk_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.get("*")
+    # 메모리 계층만 쓰는 캐시(pdf_extract)는 키 형식 제한 없음
+    mem = ResultCache(max_items=4, disk_dir="")
+    mem.put("digest:1.0:rag", "digest", {"x": 1})
+    assert mem.get("digest:1.0:rag")[1] == "memory"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    import main
+
+    cache = ResultCache(max_items=4, disk_dir=str(tmp_path))
+    monkeypatch.setattr(result_cache, "get_cache", lambda: cache)
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", "s3cret")
+    cache.put(_h("k1"), _h("a1"), _result(1))
+    return main.app.test_client()
+
+
+def test_cache_entry_rejects_patterns(client):
+    assert client.get("/cache/*").status_code == 400
+    assert client.get(f"/cache/{_h('k1')}").get_json()["cached"]
+    assert client.get(f"/cache/{_h('nope')}").status_code == 404
+
+
+def test_cache_delete_requires_token(client, monkeypatch):
+    import main
+
+    assert client.delete("/cache").status_code == 403
+    bad = {"Authorization": "Bearer nope"}
+    assert client.delete("/cache", headers=bad).status_code == 403
+    ok = {"Authorization": "Bearer s3cret"}
+    assert client.delete("/cache?audio_sha256=x", headers=ok).status_code == 400
+    r = client.delete(f"/cache/{_h('k1')}", headers=ok)
+    assert r.get_json() == {"removed": 2}
+
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", "")
+    assert client.delete("/cache", headers=ok).status_code == 403
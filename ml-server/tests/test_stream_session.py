@@ -0,0 +1,168 @@
+"""
+스트리밍 세션: 녹음 중 체크포인트로 미리 계산한 점수를 써도 close 결과가
+faster_run_filler_analysis_bytes(전체 바이트) 와 같은지, 체크포인트가 끝부분만 계획하는지.
+체크포인트는 백그라운드 스레드 대신 append 사이에 직접 호출한다 (결정적으로)
+"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+import analysis_pool
+import audio_index
+import stream_session
+from conftest import strip_diag, synth_wav
+from core_filler import faster_run_filler_analysis_bytes
+
+STEP_MS = 2000
+
+
+def _pcm(wav: bytes) -> bytes:
+    with wave.open(io.BytesIO(wav)) as w:
+        return w.readframes(w.getnframes())
+
+
+def _wav(pcm: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+@pytest.fixture
+def session_model(monkeypatch, fake_model):
+    monkeypatch.setattr(stream_session, "load_filler_model", lambda path: fake_model)
+    return fake_model
+
+
+def _stream(wav: bytes, **kw) -> stream_session.StreamSession:
+    s = stream_session.StreamSession("unused", fmt="pcm_s16le", **kw)
+    raw = _pcm(wav)
+    step = STEP_MS * 32  # 16k mono s16le = 32 bytes/ms
+    for i in range(0, len(raw), step // 4):
+        s.append(raw[i : i + step // 4])
+        if s.decoded_ms() - s._ckpt_ms >= STEP_MS:
+            s._checkpoint()
+    return s
+
+
+def _same(result: dict, ref: dict):
+    keys = ("inference", "stream", "features")
+    assert strip_diag(result, *keys) == strip_diag(ref, *keys)
+
+
+@pytest.mark.parametrize("execution", ["inline", "process"])
+def test_close_matches_full_analysis(request, session_model, execution):
+    if execution == "process":
+        request.getfixturevalue("inline_pool")
+    wav = synth_wav(60, seed=4)
+    ref = faster_run_filler_analysis_bytes(wav, session_model)
+
+    s = _stream(wav)
+    result = s.close()
+    _same(result, ref)
+    st = result["diag"]["stream"]
+    assert "checkpoint_error" not in st
+    assert st["checkpoints"] >= 25
+    assert st["rescored"] < st["reused"]
+    # 체크포인트는 녹음 전체가 아니라 끝부분만 계획
+    assert st["max_region_ms"] < 15_000
+    if execution == "process":
+        # close 도 풀 워커에서 점수 계산 (score_windows 의 청크 기록)
+        assert "chunks" in result["diag"]["inference"]
+
+
+def test_checkpoints_run_scoring_in_pool(monkeypatch, session_model, inline_pool):
+    calls = []
+    score_windows = analysis_pool.score_windows
+
+    def spy(*a, **k):
+        calls.append(len(a[2]))
+        return score_windows(*a, **k)
+
+    monkeypatch.setattr(analysis_pool, "score_windows", spy)
+    # 요청 프로세스에서는 모델을 쓰지 않음
+    monkeypatch.setattr(stream_session, "load_filler_model", None)
+    s = _stream(synth_wav(20, seed=2))
+    assert calls and s.stats["speculated"] == sum(calls)
+    s.close()
+
+
+def test_gain_change_rescores_discarded_windows(session_model):
+    # 앞 절반은 작게, 뒤에서 피크가 커지면 gain 이 바뀌어 그때까지의 점수를 버림
+    pcm = np.frombuffer(_pcm(synth_wav(40, seed=5)), dtype=np.int16).copy()
+    half = len(pcm) // 2
+    pcm[:half] = (pcm[:half] * 0.3).astype(np.int16)
+    wav = _wav(pcm)
+    ref = faster_run_filler_analysis_bytes(wav, session_model)
+
+    s = _stream(wav)
+    assert s.stats["memo_resets"] >= 1
+    assert s._index.rebuilds >= 1
+    # 버린 윈도우는 다음 체크포인트들이 새 gain 으로 다시 계산해 둠
+    assert not s._stale
+    result = s.close()
+    _same(result, ref)
+    st = result["diag"]["stream"]
+    assert st["rescored"] < st["reused"]
+
+
+def test_close_finishes_from_checkpoint_index(monkeypatch, session_model, tmp_path):
+    wav = synth_wav(60, seed=4)
+    ref = faster_run_filler_analysis_bytes(wav, session_model)
+
+    s = _stream(wav, spool_dir=str(tmp_path))
+    # 디코더에는 마지막 체크포인트 이후 부분만 남고, 녹음 전체는 임시 파일에 있음
+    assert len(s._decoder._out) <= STEP_MS * 32
+    assert len(list(tmp_path.iterdir())) == 3
+
+    # close 는 PCM 으로 에너지 / VAD 인덱스를 다시 만들지 않음
+    def rebuilt(*a, **k):
+        raise AssertionError("close 가 녹음 전체로 인덱스를 다시 만듦")
+
+    monkeypatch.setattr(audio_index.EnergyIndex, "__init__", rebuilt)
+    monkeypatch.setattr(audio_index.VadIndex, "__init__", rebuilt)
+    result = s.close()
+    _same(result, ref)
+    assert "vad" not in result["diag"]["timings"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_session_limits(session_model):
+    raw = _pcm(synth_wav(6, seed=1))
+    s = stream_session.StreamSession("unused", fmt="pcm_s16le", max_bytes=len(raw))
+    s.append(raw)
+    with pytest.raises(stream_session.StreamTooLargeError):
+        s.append(b"\0\0")
+    assert s.state == stream_session.FAILED
+
+    # 디코딩된 길이 한도 (인코딩된 입력이 작아도 풀린 PCM 길이로)
+    s = stream_session.StreamSession("unused", max_sec=2)
+    with pytest.raises(stream_session.StreamTooLargeError):
+        s.append(synth_wav(6, seed=1))
+        s.close()
+    assert s.state == stream_session.FAILED
+
+
+def test_append_rejects_oversized_chunk(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "ANALYZE_MAX_BYTES", 1000)
+    client = main.app.test_client()
+    sid = client.post("/stream", json={"format": "pcm_s16le"}).get_json()["stream_id"]
+    assert client.post(f"/stream/{sid}/append", data=b"\0" * 800).status_code == 200
+    # Content-Length 없이(chunked) 보내도 받으면서 끊음
+    r = client.post(
+        f"/stream/{sid}/append",
+        input_stream=io.BytesIO(b"\0" * 1200),
+        headers={"Transfer-Encoding": "chunked"},
+        # gunicorn 과 같이 서버가 chunked 본문의 끝을 알려 줌
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+    assert r.status_code == 413
+    assert client.get(f"/stream/{sid}").status_code == 404
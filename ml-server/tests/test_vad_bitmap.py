@@ -0,0 +1,46 @@
+import pytest
+
+from convert import decode_normalized_pcm16
+from core_filler import faster_run_filler_analysis_pcm, plan_filler_windows
+from conftest import strip_diag
+
+
+@pytest.fixture(scope="module")
+def pcm(wav_30s):
+    return decode_normalized_pcm16(wav_30s)
+
+
+def _plan(pcm, segmentation, params=None):
+    samples, gain = pcm
+    return plan_filler_windows(samples, segmentation, params, gain)
+
+
+def test_vad_segmentation_defaults_to_per_window_vad(pcm):
+    # vad 분할의 윈도우 필터는 기본으로 윈도우별 VAD (기존 결과 그대로)
+    default = _plan(pcm, "vad")
+    per_window = _plan(pcm, "vad", {"vad_bitmap": False})
+    assert default.candidates == per_window.candidates
+    assert default.drop == per_window.drop
+
+
+def test_vad_bitmap_opt_in_changes_vad_filter(pcm):
+    # 비트맵은 params.vad_bitmap=true 로만 켜지고, 켜면 구간 경계 윈도우 판정이 달라짐
+    per_window = _plan(pcm, "vad", {"vad_bitmap": False})
+    bitmap = _plan(pcm, "vad", {"vad_bitmap": True})
+    assert bitmap.speech_iv.s.tolist() == per_window.speech_iv.s.tolist()
+    assert bitmap.speech_iv.e.tolist() == per_window.speech_iv.e.tolist()
+    assert bitmap.drop["vad"] != per_window.drop["vad"]
+
+
+def test_vad_segmentation_result_matches_per_window_vad(pcm, fake_model):
+    samples, gain = pcm
+    default = faster_run_filler_analysis_pcm(samples, fake_model, "vad", None, gain)
+    per_window = faster_run_filler_analysis_pcm(
+        samples, fake_model, "vad", {"vad_bitmap": False}, gain
+    )
+    assert strip_diag(default) == strip_diag(per_window)
+
+
+def test_adaptive_segmentation_keeps_bitmap(pcm):
+    plan = _plan(pcm, "adaptive")
+    assert "vad" in plan.timer.to_dict()
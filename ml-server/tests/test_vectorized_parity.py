@@ -0,0 +1,198 @@
+"""
+배열화한 구현이 이전(리스트 / dict) 구현과 같은 결과를 내는지 무작위 입력으로 비교.
+
+- IntervalSet            vs merge_iv / subtract_iv / complement_iv / sum_iv
+- _neighbor_support + _nms_order + _merge_kept  vs 이전 finish_filler_analysis 의 dict 구현
+- ff.sliding_window_table vs ff.sliding_windows
+- score_window_chunk(녹음 일부 구간) vs score_window_plan(녹음 전체)
+(스트리밍 close vs faster_run_filler_analysis_bytes 는 test_stream_session)
+"""
+
+import numpy as np
+import pytest
+
+import func_filler as ff
+from convert import decode_normalized_pcm16
+from core_filler import (
+    _merge_kept,
+    _neighbor_support,
+    _nms_order,
+    complement_iv,
+    merge_iv,
+    plan_filler_windows,
+    score_window_chunk,
+    score_window_plan,
+    subtract_iv,
+    sum_iv,
+)
+from interval_set import IntervalSet
+
+SEEDS = range(40)
+
+
+def _pairs(rng, n: int, total: int = 20_000):
+    """겹치고 맞닿고 길이 0 인 것까지 섞인 (s, e) 목록"""
+    s = rng.integers(0, total, n)
+    e = s + rng.choice([0, 1, 5, 80, 300, 2000], n)
+    e = np.minimum(e, total)
+    return list(zip(s.tolist(), e.tolist()))
+
+
+def _tuples(ivs):
+    return [(i.s, i.e) for i in ivs]
+
+
+# ---------------------------------------------------------------------------
+# IntervalSet
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_interval_set_matches_list_algebra(seed):
+    rng = np.random.default_rng(seed)
+    total = 20_000
+    a_pairs = _pairs(rng, int(rng.integers(0, 40)), total)
+    b_pairs = _pairs(rng, int(rng.integers(0, 40)), total)
+    A, B = merge_iv(a_pairs), merge_iv(b_pairs)
+    a, b = IntervalSet.from_pairs(a_pairs), IntervalSet.from_pairs(b_pairs)
+
+    assert list(a) == _tuples(A)
+    assert a.total() == sum_iv(A)
+    assert list(a.subtract(b)) == _tuples(subtract_iv(A, B))
+    assert a.subtract(b).total() == sum_iv(subtract_iv(A, B))
+    assert list(a.complement(total)) == _tuples(complement_iv(A, total))
+
+
+def test_interval_set_empty_operands():
+    a = IntervalSet.from_pairs([(10, 20), (30, 30)])
+    empty = IntervalSet.from_pairs([])
+    assert list(a.subtract(empty)) == _tuples(
+        subtract_iv(merge_iv([(10, 20), (30, 30)]), [])
+    )
+    assert list(empty.subtract(a)) == []
+    assert list(empty.complement(50)) == _tuples(complement_iv([], 50))
+
+
+# ---------------------------------------------------------------------------
+# neighbor support / NMS / kept-merge
+
+
+def _legacy_kept(cs, ce, cp):
+    """이전 finish_filler_analysis 의 3. neighbor merge (dict 행 + 이중 루프)"""
+    rows = [
+        {"s": s, "e": e, "dur_ms": e - s, "p": p}
+        for s, e, p in zip(cs.tolist(), ce.tolist(), cp.tolist())
+    ]
+
+    def _has_support(c, pool) -> bool:
+        for d in pool:
+            if d is c:
+                continue
+            if (
+                ff.iou((c["s"], c["e"]), (d["s"], d["e"])) >= ff.NEIGHBOR_IOU_MIN
+                and d["p"] >= ff.NEIGHBOR_SUPPORT_THR
+            ):
+                return True
+        return False
+
+    cands = [c for c in rows if c["p"] >= ff.STRICT_PASS or _has_support(c, rows)]
+    cands = sorted(cands, key=lambda r: r["p"], reverse=True)
+    kept = []
+    for c in cands:
+        if all(ff.iou((c["s"], c["e"]), (k["s"], k["e"])) < ff.NMS_IOU for k in kept):
+            kept.append(c)
+    if not kept:
+        return []
+    kept = sorted(kept, key=lambda r: (r["s"], r["e"]))
+    out = [dict(kept[0])]
+    for c in kept[1:]:
+        last = out[-1]
+        if c["s"] <= last["e"] + 80:
+            last["e"] = max(last["e"], c["e"])
+        else:
+            out.append(dict(c))
+    return [(r["s"], r["e"]) for r in out]
+
+
+def _vectorized_kept(cs, ce, cp):
+    keep = (cp >= ff.STRICT_PASS) | _neighbor_support(cs, ce, cp)
+    cs, ce, cp = cs[keep], ce[keep], cp[keep]
+    order = _nms_order(cs, ce, cp, ff.NMS_IOU)
+    s, e = _merge_kept(cs[order], ce[order], max_gap=80)
+    return list(zip(s.tolist(), e.tolist()))
+
+
+def _candidates(rng, n: int):
+    """윈도우 그리드 위 후보 + 동률이 많은 확률 (NMS 의 동률 순서까지 비교)"""
+    s = rng.integers(0, 400, n) * ff.HOP_MS // 4
+    e = s + rng.integers(ff.MIN_MS, ff.WIN_MS + 1, n)
+    p = rng.choice([0.72, 0.75, 0.8, 0.85, 0.9, 0.95], n)
+    return s.astype(np.int64), e.astype(np.int64), p.astype(np.float64)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_nms_and_merge_match_dict_implementation(seed):
+    rng = np.random.default_rng(seed)
+    cs, ce, cp = _candidates(rng, int(rng.integers(0, 80)))
+    assert _vectorized_kept(cs, ce, cp) == _legacy_kept(cs, ce, cp)
+
+
+@pytest.mark.parametrize(
+    "neighbor_iou, nms_iou", [(0.0, 0.55), (0.25, 0.0), (0.25, 1.0), (0.5, 0.3)]
+)
+def test_nms_and_merge_match_at_threshold_edges(monkeypatch, neighbor_iou, nms_iou):
+    monkeypatch.setattr(ff, "NEIGHBOR_IOU_MIN", neighbor_iou)
+    monkeypatch.setattr(ff, "NMS_IOU", nms_iou)
+    for seed in range(10):
+        rng = np.random.default_rng(seed)
+        cs, ce, cp = _candidates(rng, 60)
+        assert _vectorized_kept(cs, ce, cp) == _legacy_kept(cs, ce, cp)
+
+
+# ---------------------------------------------------------------------------
+# sliding windows
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sliding_window_table_matches_generator(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 30))
+    starts = rng.integers(0, 60_000, n)
+    # 빈 구간 / 윈도우보다 짧은 구간 / 홉 배수에 딱 맞는 구간 포함
+    spans = rng.choice([-10, 0, 1, 100, ff.WIN_MS, ff.WIN_MS + ff.HOP_MS, 5000], n)
+    ends = starts + spans + rng.integers(0, 3, n)
+    ref = [
+        w
+        for s, e in zip(starts.tolist(), ends.tolist())
+        for w in ff.sliding_windows(s, e)
+    ]
+    ws, we = ff.sliding_window_table(starts, ends)
+    assert list(zip(ws.tolist(), we.tolist())) == ref
+
+
+# ---------------------------------------------------------------------------
+# 청크 점수
+
+
+@pytest.fixture(scope="module")
+def recording(wav_30s):
+    return decode_normalized_pcm16(wav_30s)
+
+
+@pytest.mark.parametrize(
+    "params", [None, {"mfcc_engine": False}, {"batch_infer": False}]
+)
+def test_score_window_chunk_matches_full_plan(recording, fake_model, params):
+    pcm, gain = recording
+    plan = plan_filler_windows(pcm, "adaptive", params, gain)
+    ref, _ = score_window_plan(plan, fake_model)
+    items = plan.candidates
+    n = len(items)
+    assert n > 20
+    # 앞 / 가운데 / 녹음 끝까지 (끝 클램프) 구간
+    for i, j in ((0, n // 3), (n // 3, 2 * n // 3), (2 * n // 3, n)):
+        lo_ms = max(0, min(ws for ws, _, _ in items[i:j]))
+        hi_ms = len(pcm) // 16 if j == n else max(we for _, we, _ in items[i:j])
+        part = pcm[lo_ms * 16 : hi_ms * 16]
+        out = score_window_chunk(part, lo_ms, items[i:j], fake_model, params)
+        np.testing.assert_array_equal(out["probs"], ref[i:j])
+        assert out["inference"]["scored"] == j - i